@@ -15,10 +15,10 @@ from kombu import Connection, Consumer, Exchange, Producer, Queue
 from kombu.common import entry_to_queue
 from kombu.pools import ProducerPool
 from kombu.utils import cached_property, uuid
-from kombu.utils.encoding import safe_repr
 
 from celery import signals
 from celery.five import items, string_t
+from celery.utils.saferepr import saferepr
 from celery.utils.text import indent as textindent
 
 from . import app_or_default
@@ -30,6 +30,14 @@ QUEUE_FORMAT = """
 key={0.routing_key}
 """
 
+#: Name of the message header containing the task envelope fields,
+#: see :setting:`CELERYD_POOL_RAW_MESSAGES`.
+ENVELOPE_HEADER = 'celery-envelope'
+
+#: Fields of the task message body included in the envelope header.
+ENVELOPE_FIELDS = ('task', 'id', 'retries', 'eta', 'expires', 'utc',
+                   'timeouts')
+
 
 class Queues(dict):
     """Queue name⇒ declaration mapping.
@@ -172,6 +180,8 @@ class TaskProducer(Producer):
     utc = True
     event_dispatcher = None
     send_sent_event = False
+    repr_maxlen = None
+    envelope_headers = False
 
     def __init__(self, channel=None, exchange=None, *args, **kwargs):
         self.retry = kwargs.pop('retry', self.retry)
@@ -179,6 +189,7 @@ class TaskProducer(Producer):
                                        self.retry_policy or {})
         self.send_sent_event = kwargs.pop('send_sent_event',
                                           self.send_sent_event)
+        self.repr_maxlen = kwargs.pop('repr_maxlen', self.repr_maxlen)
         exchange = exchange or self.exchange
         self.queues = self.app.amqp.queues  # shortcut
         self.default_queue = self.app.amqp.default_queue
@@ -193,8 +204,15 @@ class TaskProducer(Producer):
                      callbacks=None, errbacks=None, routing_key=None,
                      serializer=None, delivery_mode=None, compression=None,
                      reply_to=None, timeout=None, soft_timeout=None,
-                     timeouts=None, declare=None, **kwargs):
-        """Send task message."""
+                     timeouts=None, declare=None, repr_maxlen=None, **kwargs):
+        """Send task message.
+
+        ``repr_maxlen`` is the max length of the arguments included
+        in the :event:`task-sent` event (the task's
+        :attr:`~celery.app.task.Task.repr_maxlen`), defaults to
+        :attr:`repr_maxlen`.
+
+        """
         retry = self.retry if retry is None else retry
 
         qname = queue
@@ -245,10 +263,17 @@ class TaskProducer(Producer):
             'taskset': group_id or taskset_id,
             'chord': chord,
         }
+        headers = kwargs.pop('headers', None)
+        if self.envelope_headers:
+            # the worker can reserve the task without decoding the body
+            # (see the CELERYD_POOL_RAW_MESSAGES setting).
+            headers = dict(headers or {}, **{
+                ENVELOPE_HEADER: self.envelope(body),
+            })
 
         self.publish(
             body,
-            exchange=exchange, routing_key=routing_key,
+            exchange=exchange, routing_key=routing_key, headers=headers,
             serializer=serializer or self.serializer,
             compression=compression or self.compression,
             retry=retry, retry_policy=_rp,
@@ -262,25 +287,37 @@ class TaskProducer(Producer):
             exname = exchange or self.exchange
             if isinstance(exname, Exchange):
                 exname = exname.name
+            fields = {
+                'uuid': task_id,
+                'name': task_name,
+                'retries': retries,
+                'eta': eta,
+                'expires': expires,
+                'queue': qname,
+                'exchange': exname,
+                'routing_key': routing_key,
+            }
+            if repr_maxlen is None:
+                repr_maxlen = self.repr_maxlen
+            if repr_maxlen != 0:
+                fields['args'] = saferepr(task_args, repr_maxlen)
+                fields['kwargs'] = saferepr(task_kwargs, repr_maxlen)
             evd.publish(
-                'task-sent',
-                {
-                    'uuid': task_id,
-                    'name': task_name,
-                    'args': safe_repr(task_args),
-                    'kwargs': safe_repr(task_kwargs),
-                    'retries': retries,
-                    'eta': eta,
-                    'expires': expires,
-                    'queue': qname,
-                    'exchange': exname,
-                    'routing_key': routing_key,
-                },
+                'task-sent', fields,
                 self, retry=retry, retry_policy=retry_policy,
             )
         return task_id
     delay_task = publish_task   # XXX Compat
 
+    def envelope(self, body):
+        """Return the envelope fields of a task message body,
+        leaving out the fields that are not set."""
+        envelope = dict((key, body[key]) for key in ENVELOPE_FIELDS
+                        if body[key] is not None)
+        if not any(body['timeouts']):
+            envelope.pop('timeouts')
+        return envelope
+
     @cached_property
     def event_dispatcher(self):
         # We call Dispatcher.publish with a custom producer
@@ -388,6 +425,8 @@ class AMQP(object):
             retry=conf.CELERY_TASK_PUBLISH_RETRY,
             retry_policy=conf.CELERY_TASK_PUBLISH_RETRY_POLICY,
             send_sent_event=conf.CELERY_SEND_TASK_SENT_EVENT,
+            repr_maxlen=conf.CELERY_TASK_REPR_MAXLEN,
+            envelope_headers=conf.CELERYD_POOL_RAW_MESSAGES,
             utc=conf.CELERY_ENABLE_UTC,
         )
     TaskPublisher = TaskProducer  # compat
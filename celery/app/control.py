@@ -104,8 +104,9 @@ class Inspect(object):
     def conf(self):
         return self._request('dump_conf')
 
-    def hello(self):
-        return self._request('hello')
+    def hello(self, from_node=None, revoked_since=None, summary=False):
+        return self._request('hello', from_node=from_node,
+                             revoked_since=revoked_since, summary=summary)
 
     def memsample(self):
         return self._request('memsample')
@@ -279,6 +280,17 @@ class Control(object):
         """
         return self.broadcast('pool_shrink', {'n': n}, destination, **kwargs)
 
+    def pool_max_memory(self, limit, destination=None, **kwargs):
+        """Tell all (or specific) workers to replace pool processes
+        using more than ``limit`` kilobytes of resident memory,
+        the limit is disabled if ``limit`` is 0.
+
+        Supports the same arguments as :meth:`broadcast`.
+
+        """
+        return self.broadcast('pool_max_memory', {'limit': limit},
+                              destination, **kwargs)
+
     def broadcast(self, command, arguments=None, destination=None,
                   connection=None, reply=False, timeout=1, limit=None,
                   callback=None, channel=None, **extra_kwargs):
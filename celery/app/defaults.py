@@ -111,6 +111,8 @@ NAMESPACES = {
         'DEFAULT_DELIVERY_MODE': Option(2, type='string'),
         'EAGER_PROPAGATES_EXCEPTIONS': Option(False, type='bool'),
         'ENABLE_UTC': Option(True, type='bool'),
+        'EVENT_BATCH_INTERVAL': Option(1.0, type='float'),
+        'EVENT_BATCH_SIZE': Option(0, type='int'),
         'EVENT_SERIALIZER': Option('json'),
         'IMPORTS': Option((), type='tuple'),
         'INCLUDE': Option((), type='tuple'),
@@ -144,6 +146,7 @@ NAMESPACES = {
             'interval_max': 1,
             'interval_step': 0.2}, type='dict'),
         'TASK_RESULT_EXPIRES': Option(timedelta(days=1), type='float'),
+        'TASK_REPR_MAXLEN': Option(1024, type='int'),
         'TASK_SERIALIZER': Option('pickle'),
         'TIMEZONE': Option(type='string'),
         'TRACK_STARTED': Option(False, type='bool'),
@@ -159,10 +162,16 @@ NAMESPACES = {
     'CELERYD': {
         'AGENT': Option(None, type='string'),
         'AUTOSCALER': Option('celery.worker.autoscale:Autoscaler'),
+        'AUTOSCALER_POLICY': Option(
+            'celery.worker.autoscale:PredictivePolicy', type='string',
+        ),
         'AUTORELOADER': Option('celery.worker.autoreload:Autoreloader'),
         'CONCURRENCY': Option(0, type='int'),
+        'ETA_SPILL_DB': Option(type='string'),
+        'ETA_SPILL_HORIZON': Option(type='float'),
         'TIMER': Option(type='string'),
         'TIMER_PRECISION': Option(1.0, type='float'),
+        'TIMER_SCHEDULE': Option('heap', type='string'),
         'FORCE_EXECV': Option(False, type='bool'),
         'HIJACK_ROOT_LOGGER': Option(True, type='bool'),
         'CONSUMER': Option('celery.worker.consumer:Consumer', type='string'),
@@ -173,11 +182,20 @@ NAMESPACES = {
         'LOG_FILE': Option(deprecate_by='2.4', remove_by='4.0',
                            alt='--logfile argument'),
         'MAX_TASKS_PER_CHILD': Option(type='int'),
+        'MAX_MEMORY_PER_CHILD': Option(type='int'),
         'POOL': Option(DEFAULT_POOL),
         'POOL_PUTLOCKS': Option(True, type='bool'),
         'POOL_RESTARTS': Option(False, type='bool'),
+        'POOL_RING_SIZE': Option(type='int'),
+        'POOL_RAW_MESSAGES': Option(False, type='bool'),
+        'POOL_SPAWNER': Option(False, type='bool'),
+        'POOL_CPU_AFFINITY': Option(None, type='string'),
+        'POOL_RESERVED_CPUS': Option(0, type='int'),
         'PREFETCH_MULTIPLIER': Option(4, type='int'),
+        'PREFETCH_BUFFER_TIME': Option(type='float'),
         'STATE_DB': Option(),
+        'STATE_DB_FORMAT': Option('shelve'),
+        'TASK_BATCHING': Option(False, type='bool'),
         'TASK_LOG_FORMAT': Option(DEFAULT_TASK_LOG_FMT),
         'TASK_SOFT_TIME_LIMIT': Option(type='float'),
         'TASK_TIME_LIMIT': Option(type='float'),
@@ -255,6 +255,14 @@ class Task(object):
     #: :setting:`CELERY_ACKS_LATE` setting.
     acks_late = None
 
+    #: Max number of characters used to represent the arguments and
+    #: return value of this task in events and logs.  Set to 0 to
+    #: not include them in events at all, or -1 for no limit.
+    #:
+    #: The application default can be overridden with the
+    #: :setting:`CELERY_TASK_REPR_MAXLEN` setting.
+    repr_maxlen = None
+
     #: Default task expiry time.
     expires = None
 
@@ -270,6 +278,7 @@ class Task(object):
         ('rate_limit', 'CELERY_DEFAULT_RATE_LIMIT'),
         ('track_started', 'CELERY_TRACK_STARTED'),
         ('acks_late', 'CELERY_ACKS_LATE'),
+        ('repr_maxlen', 'CELERY_TASK_REPR_MAXLEN'),
         ('ignore_result', 'CELERY_IGNORE_RESULT'),
         ('store_errors_even_if_ignored',
             'CELERY_STORE_ERRORS_EVEN_IF_IGNORED'),
@@ -486,6 +495,7 @@ class Task(object):
                               link=link, link_error=link_error, **options)
         options = dict(extract_exec_options(self), **options)
         options = router.route(options, self.name, args, kwargs)
+        options.setdefault('repr_maxlen', self.repr_maxlen)
 
         if connection:
             producer = app.amqp.TaskProducer(connection)
@@ -399,6 +399,8 @@ class control(_RemoteControl):
         'autoscale': (1.0, 'change autoscale settings'),
         'pool_grow': (1.0, 'start more pool processes'),
         'pool_shrink': (1.0, 'use less pool processes'),
+        'pool_max_memory': (
+            1.0, 'set max memory (KiB) of pool processes, 0 disables'),
     }
 
     def call(self, method, *args, **options):
@@ -412,6 +414,10 @@ class control(_RemoteControl):
         """[N=1]"""
         return self.call(method, n, **kwargs)
 
+    def pool_max_memory(self, method, limit, **kwargs):
+        """<limit_kilobytes>"""
+        return self.call(method, int(limit), **kwargs)
+
     def autoscale(self, method, max=None, min=None, **kwargs):
         """[max] [min]"""
         return self.call(method, max, min, **kwargs)
@@ -13,6 +13,24 @@ The :program:`celery events` command.
 
     Dump events to stdout.
 
+.. cmdoption:: --record
+
+    Record events to this file, see :mod:`celery.events.recorder`.
+
+.. cmdoption:: --compression
+
+    Record: Compress the recording using this method (e.g. zlib, bzip2).
+
+.. cmdoption:: --replay
+
+    Replay events recorded to this file using :option:`--record`,
+    to the camera if one is set.
+
+.. cmdoption:: --speed
+
+    Replay: Replay the events this many times faster than they were
+    recorded.  Default is as fast as possible.
+
 .. cmdoption:: -c, --camera
 
     Take snapshots of events using this camera.
@@ -54,6 +72,10 @@ class events(Command):
             start graphical monitor (requires curses)
         celery events -d --app=proj
             dump events to screen.
+        celery events --record=events.rec [--compression=zlib]
+            record events to file.
+        celery events --replay=events.rec [-c <camera>] [--speed=N]
+            replay recorded events.
         celery events -b amqp://
         celery events -C <camera> [options]
             run snapshot camera.
@@ -70,11 +92,17 @@ class events(Command):
     def run(self, dump=False, camera=None, frequency=1.0, maxrate=None,
             loglevel='INFO', logfile=None, prog_name='celery events',
             pidfile=None, uid=None, gid=None, umask=None,
-            working_directory=None, detach=False, **kwargs):
+            working_directory=None, detach=False, record=None,
+            compression=None, replay=None, speed=None, **kwargs):
         self.prog_name = prog_name
 
         if dump:
             return self.run_evdump()
+        if record:
+            return self.run_evrecord(record, compression=compression)
+        if replay:
+            return self.run_evreplay(replay, camera=camera, freq=frequency,
+                                     maxrate=maxrate, speed=speed)
         if camera:
             return self.run_evcam(camera, freq=frequency, maxrate=maxrate,
                                   loglevel=loglevel, logfile=logfile,
@@ -89,6 +117,16 @@ class events(Command):
         self.set_process_status('dump')
         return evdump(app=self.app)
 
+    def run_evrecord(self, filename, compression=None):
+        from celery.events.recorder import evrecord
+        self.set_process_status('record')
+        return evrecord(filename, compression=compression, app=self.app)
+
+    def run_evreplay(self, filename, **kwargs):
+        from celery.events.recorder import evreplay
+        self.set_process_status('replay')
+        evreplay(filename, app=self.app, **kwargs)
+
     def run_evtop(self):
         from celery.events.cursesmon import evtop
         self.set_process_status('top')
@@ -119,6 +157,10 @@ class events(Command):
         return (
             (Option('-d', '--dump', action='store_true'),
              Option('-c', '--camera'),
+             Option('--record'),
+             Option('--compression'),
+             Option('--replay'),
+             Option('--speed', type='float'),
              Option('--detach', action='store_true'),
              Option('-F', '--frequency', '--freq',
                     type='float', default=1.0),
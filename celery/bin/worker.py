@@ -89,6 +89,12 @@ The :program:`celery worker` command (previously known as ``celeryd``)
     Maximum number of tasks a pool worker can execute before it's
     terminated and replaced by a new worker.
 
+.. cmdoption:: --maxmemperchild
+
+    Maximum amount of resident memory (in kilobytes) a pool worker
+    can use before it's replaced by a new worker.  Checked after a task
+    completes, so the task is never interrupted.
+
 .. cmdoption:: --pidfile
 
     Optional file used to store the workers pid.
@@ -211,6 +217,8 @@ class worker(Command):
                    default=conf.CELERYD_TASK_SOFT_TIME_LIMIT, type='float'),
             Option('--maxtasksperchild', dest='max_tasks_per_child',
                    default=conf.CELERYD_MAX_TASKS_PER_CHILD, type='int'),
+            Option('--maxmemperchild', dest='max_memory_per_child',
+                   default=conf.CELERYD_MAX_MEMORY_PER_CHILD, type='int'),
             Option('--queues', '-Q', default=[]),
             Option('--include', '-I', default=[]),
             Option('--autoscale'),
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.concurrency.affinity
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    CPU placement of the worker and its pool processes.
+
+"""
+from __future__ import absolute_import
+
+import os
+
+from itertools import groupby
+
+from kombu.utils import cached_property
+
+from celery.five import range
+from celery.local import try_import
+from celery.utils.log import get_logger
+
+psutil = try_import('psutil')
+
+__all__ = ['Placement', 'Topology', 'get_affinity', 'set_affinity']
+
+logger = get_logger(__name__)
+warning = logger.warning
+
+#: Path to the sysfs directory describing the CPU topology (Linux).
+SYSFS = '/sys/devices/system'
+
+#: Placement policies, see :class:`Placement`.
+POLICIES = ('round-robin', 'cores', 'numa')
+
+
+def get_affinity(pid=0):
+    """Return the set of CPUs process ``pid`` can run on,
+    or :const:`None` if not supported by this platform."""
+    if hasattr(os, 'sched_getaffinity'):
+        return set(os.sched_getaffinity(pid))
+    if psutil is not None:
+        process = psutil.Process(pid or os.getpid())
+        if hasattr(process, 'cpu_affinity'):
+            return set(process.cpu_affinity())
+
+
+def set_affinity(cpus, pid=0):
+    """Restrict process ``pid`` to the set of ``cpus``."""
+    if hasattr(os, 'sched_setaffinity'):
+        return os.sched_setaffinity(pid, cpus)
+    if psutil is not None:
+        process = psutil.Process(pid or os.getpid())
+        if hasattr(process, 'cpu_affinity'):
+            return process.cpu_affinity(sorted(cpus))
+    raise NotImplementedError('CPU affinity not supported by this platform')
+
+
+def parse_cpulist(s):
+    """Parse a Linux CPU list, e.g. ``"0-3,8,10-11"``."""
+    cpus = set()
+    for part in s.strip().split(','):
+        if part:
+            start, _, stop = part.partition('-')
+            cpus.update(range(int(start), int(stop or start) + 1))
+    return cpus
+
+
+class Topology(object):
+    """Physical cores and NUMA nodes of a set of CPUs, as described by
+    sysfs.  If the topology cannot be read, every CPU is considered
+    to be a separate core in the same node.
+
+    :param cpus: Set of CPUs to include.
+    :keyword root: Path to the sysfs system directory.
+
+    """
+
+    def __init__(self, cpus, root=SYSFS):
+        self.cpus = set(cpus)
+        self.root = root
+        #: Mapping of CPU to ``(node, package, core)`` tuple.
+        self.cores = dict((cpu, self._core(cpu)) for cpu in self.cpus)
+
+    def _read(self, *path):
+        try:
+            with open(os.path.join(self.root, *path)) as fh:
+                return fh.read().strip()
+        except (IOError, OSError):
+            pass
+
+    def _core(self, cpu):
+        topology = ('cpu', 'cpu{0}'.format(cpu), 'topology')
+        package = self._read(*topology + ('physical_package_id', ))
+        core = self._read(*topology + ('core_id', ))
+        if core is None:
+            return (self.node(cpu), 0, cpu)
+        return (self.node(cpu), int(package or 0), int(core))
+
+    def nodes(self):
+        """Return mapping of NUMA node number to set of CPUs."""
+        nodes = {}
+        for name in self._listdir('node'):
+            if name.startswith('node') and name[4:].isdigit():
+                cpulist = self._read('node', name, 'cpulist')
+                if cpulist is not None:
+                    nodes[int(name[4:])] = parse_cpulist(cpulist)
+        return nodes
+
+    def node(self, cpu):
+        for node, cpus in self._nodes.items():
+            if cpu in cpus:
+                return node
+        return 0
+
+    @cached_property
+    def _nodes(self):
+        return self.nodes()
+
+    def _listdir(self, *path):
+        try:
+            return os.listdir(os.path.join(self.root, *path))
+        except (IOError, OSError):
+            return []
+
+    def core_groups(self):
+        """Return list of the CPUs of every physical core
+        (the core's siblings), ordered by node, package and core."""
+        return [sorted(cpus) for _, cpus in groupby(
+            sorted(self.cpus, key=lambda cpu: (self.cores[cpu], cpu)),
+            key=self.cores.__getitem__)]
+
+    def by_core(self):
+        """Return CPUs ordered so that every physical core is used
+        once before any of their siblings (hyperthreads) are."""
+        cores = self.core_groups()
+        ordered = []
+        for i in range(max(len(cpus) for cpus in cores) if cores else 0):
+            ordered.extend(cpus[i] for cpus in cores if len(cpus) > i)
+        return ordered
+
+    def by_node(self):
+        """Return list of CPU sets, one for every NUMA node."""
+        nodes = {}
+        for cpu in self.cpus:
+            nodes.setdefault(self.cores[cpu][0], set()).add(cpu)
+        return [nodes[node] for node in sorted(nodes)]
+
+
+class Placement(object):
+    """Decides the CPUs the worker main process and the pool processes
+    are allowed to run on.
+
+    Policies:
+
+    * ``round-robin``: every pool process gets a single CPU,
+      in CPU number order.
+    * ``cores``: every pool process gets a single CPU, using every
+      physical core before using any of their siblings (hyperthreads).
+      CPUs are reserved for the main process in whole cores,
+      so the main process never shares a core with a pool process.
+    * ``numa``: every pool process gets all the CPUs of a NUMA node,
+      the nodes being used in turn.
+
+    :param policy: Name of the policy to use.
+    :keyword reserved: Number of CPUs reserved for the main process,
+        which are not used by the pool processes.
+    :keyword cpus: CPUs available, by default the CPUs the current
+        process can run on.
+    :keyword topology: :class:`Topology` instance to use.
+
+    """
+    Topology = Topology
+
+    def __init__(self, policy, reserved=0, cpus=None, topology=None):
+        if policy not in POLICIES:
+            raise ValueError('Unknown CPU placement policy: {0!r}'.format(
+                policy))
+        if cpus is None:
+            cpus = get_affinity()
+            if cpus is None:
+                raise NotImplementedError(
+                    'CPU affinity not supported by this platform')
+        self.policy = policy
+        topology = topology or self.Topology(cpus)
+        if policy == 'cores':
+            parent = self._reserve_cores(topology, reserved)
+            available = [cpu for cpu in topology.by_core()
+                         if cpu not in parent]
+        else:
+            ordered = sorted(topology.cpus)
+            parent, available = set(ordered[:reserved]), ordered[reserved:]
+        if not available:
+            raise ValueError(
+                'Cannot reserve {0} of {1} CPUs for the main process'.format(
+                    reserved, len(topology.cpus)))
+        #: CPUs the main process runs on, or :const:`None` if not pinned.
+        self.parent = parent or None
+        if policy == 'numa':
+            self.sets = [cpus for cpus in (
+                node - (self.parent or set()) for node in topology.by_node())
+                if cpus]
+        else:
+            self.sets = [set([cpu]) for cpu in available]
+
+    def _reserve_cores(self, topology, reserved):
+        # the siblings of a reserved CPU are also reserved.
+        parent = set()
+        for cpus in topology.core_groups():
+            if len(parent) >= reserved:
+                break
+            parent.update(cpus)
+        return parent
+
+    def for_process(self, index):
+        """Return the CPUs for the pool process with ``index``."""
+        return self.sets[index % len(self.sets)]
+
+    def apply_parent(self):
+        if self.parent is not None:
+            self._apply(self.parent, 0)
+
+    def apply(self, pid, index):
+        self._apply(self.for_process(index), pid)
+
+    def _apply(self, cpus, pid):
+        try:
+            set_affinity(cpus, pid)
+        except (OSError, NotImplementedError) as exc:
+            warning('Cannot set CPU affinity of process %r to %r: %r',
+                    pid or os.getpid(), sorted(cpus), exc)
+
+    def info(self, processes=()):
+        """Return placement description for the stats of the worker,
+        ``processes`` is a list of ``(pid, index)`` tuples."""
+        return {
+            'policy': self.policy,
+            'parent': sorted(self.parent) if self.parent else 'N/A',
+            'processes': dict((pid, sorted(self.for_process(index)))
+                              for pid, index in processes),
+        }
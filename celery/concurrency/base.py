@@ -100,6 +100,10 @@ class BasePool(object):
         raise NotImplementedError(
             '{0} does not implement restart'.format(type(self)))
 
+    def set_max_memory_per_child(self, limit):
+        raise NotImplementedError(
+            '{0} does not implement memory limits'.format(type(self)))
+
     def stop(self):
         self.on_stop()
         self._state = self.TERMINATE
@@ -16,8 +16,10 @@ import os
 import select
 import socket
 import struct
+import sys
 
 from collections import deque, namedtuple
+from functools import partial
 from pickle import HIGHEST_PROTOCOL
 from time import sleep, time
 from weakref import ref
@@ -38,7 +40,10 @@ from kombu.utils.eventio import SELECT_BAD_FD
 from celery import platforms
 from celery import signals
 from celery._state import set_default_app
+from celery.concurrency.affinity import Placement
 from celery.concurrency.base import BasePool
+from celery.concurrency.shm import RingBuffer, SharedInt
+from celery.concurrency.spawner import Spawner
 from celery.five import Counter, items, values
 from celery.task import trace
 from celery.utils.log import get_logger
@@ -64,6 +69,28 @@ MAXTASKS_NO_BILLIARD = """\
 #: Constant sent by child process when started (ready to accept work)
 WORKER_UP = 15
 
+#: Constant sent instead of a message that was written to the shared
+#: memory ring buffer of the queue, with the position in the buffer.
+RING = 16
+
+#: Messages smaller than this are sent over the pipe even if
+#: ring buffers are enabled.
+RING_MIN_SIZE = 4096
+
+#: Max number of jobs written to a process in a single write.
+MAX_JOBS_PER_WRITE = 32
+
+#: Only jobs smaller than this are combined into a single write.
+MAX_COMBINED_JOB_SIZE = 4096
+
+#: ``ru_maxrss`` is in bytes on OS X, and in kilobytes elsewhere.
+MAXRSS_UNIT = 1024 if sys.platform == 'darwin' else 1
+
+#: File with the memory usage of the current process (Linux).
+PROC_STATM = '/proc/self/statm'
+
+W_MEMORY_LIMIT_LOW = """Max memory per child (%s KiB) is lower than the memory used by the worker (%s KiB): pool processes will be replaced after every task!"""
+
 logger = get_logger(__name__)
 warning, debug = logger.warning, logger.debug
 
@@ -75,8 +102,70 @@ def gen_not_started(gen):
     return gen.gi_frame and gen.gi_frame.f_lasti == -1
 
 
+def ring_message(queue, message):
+    """Read message from the ring buffer of the queue
+    if the message was transferred using the ring buffer."""
+    if message and message[0] == RING:
+        return queue._ring.read(*message[1])
+    return message
+
+
+def maxrss():
+    """Return the max resident set size of the current process
+    in kilobytes."""
+    rss = platforms.resource.getrusage(
+        platforms.resource.RUSAGE_SELF).ru_maxrss
+    return rss // MAXRSS_UNIT
+
+
+def rss():
+    """Return the current resident set size of the current process
+    in kilobytes.
+
+    Read from :file:`/proc/self/statm`, or using :mod:`psutil` if
+    installed, with :func:`maxrss` used when neither is available.
+
+    """
+    try:
+        with open(PROC_STATM) as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (AttributeError, IndexError, IOError, OSError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return maxrss()
+    process = psutil.Process(os.getpid())
+    info = getattr(process, 'memory_info', None) or \
+        process.get_memory_info  # psutil < 2.0
+    return info().rss // 1024
+
+
+def memory_limit(limit):
+    """Convert max memory per child option to int (KiB),
+    where 0 means no limit."""
+    try:
+        limit = int(limit or 0)
+    except (TypeError, ValueError):
+        raise ValueError(
+            'max memory per child must be an integer (KiB): {0!r}'.format(
+                limit))
+    if limit < 0:
+        raise ValueError(
+            'max memory per child cannot be negative: {0!r}'.format(limit))
+    return limit
+
+
 def process_initializer(app, hostname):
     """Pool child process initializer."""
+    process_template_initializer(app, hostname)
+    process_spawned_initializer(app, hostname)
+
+
+def process_template_initializer(app, hostname):
+    """Initializes the parts of a pool process that are inherited
+    by processes forked from it (see :class:`Spawner`)."""
     platforms.signals.reset(*WORKER_SIGRESET)
     platforms.signals.ignore(*WORKER_SIGIGNORE)
     platforms.set_mp_process_title('celeryd', hostname=hostname)
@@ -84,7 +173,6 @@ def process_initializer(app, hostname):
     # fork(). Note that init_worker makes sure it's only
     # run once per process.
     app.loader.init_worker()
-    app.loader.init_worker_process()
     app.log.setup(int(os.environ.get('CELERY_LOG_LEVEL', 0) or 0),
                   os.environ.get('CELERY_LOG_FILE') or None,
                   bool(os.environ.get('CELERY_LOG_REDIRECT', False)),
@@ -100,6 +188,12 @@ def process_initializer(app, hostname):
     from celery.task.trace import build_tracer
     for name, task in items(app.tasks):
         task.__trace__ = build_tracer(name, task, app.loader, hostname)
+
+
+def process_spawned_initializer(app, hostname):
+    """Initializes what must be done in every pool process."""
+    platforms.set_mp_process_title('celeryd', hostname=hostname)
+    app.loader.init_worker_process()
     signals.worker_process_init.send(sender=None)
 
 
@@ -132,9 +226,69 @@ def _select(readers=None, writers=None, err=None, timeout=0):
 
 class Worker(_pool.Worker):
 
+    def __init__(self, *args, **kwargs):
+        spawner = kwargs.pop('spawner', None)
+        self.max_memory_per_child = kwargs.pop('max_memory_per_child', None)
+        super(Worker, self).__init__(*args, **kwargs)
+        if spawner is not None:
+            self._Popen = spawner.Popen
+
     def on_loop_start(self, pid):
         self.outq.put((WORKER_UP, (pid, )))
 
+    def _make_child_methods(self, *args, **kwargs):
+        super(Worker, self)._make_child_methods(*args, **kwargs)
+        if getattr(self.inq, '_ring', None) is not None:
+            self.wait_for_job = self._make_ring_receive(self.wait_for_job)
+        if getattr(self.outq, '_ring', None) is not None:
+            self.outq.put = self._make_ring_put(self.outq)
+        if self.max_memory_per_child is not None and platforms.resource:
+            self.wait_for_job = self._make_memory_check(self.wait_for_job)
+
+    def _make_memory_check(self, receive):
+        limit = self.max_memory_per_child
+        worked = [False]
+
+        def wait_for_job():
+            # checked before receiving the next job, so that the process
+            # exits between jobs, and only after it executed a job
+            # (or a limit lower than the size of a new process would
+            # make it exit forever).  The current size is used, as the
+            # peak size can include memory used before the fork.
+            if worked[0] and limit.value and rss() > limit.value:
+                debug('worker exceeded max memory (%s KiB) -- exiting',
+                      limit.value)
+                # sys.exit is patched by Worker.run to keep the exit code.
+                sys.exit(EX_RECYCLE)
+            req = receive()
+            if req:
+                worked[0] = True
+            return req
+        return wait_for_job
+
+    def _make_ring_receive(self, receive):
+        inq = self.inq
+
+        def wait_for_job():
+            return ring_message(inq, receive())
+        return wait_for_job
+
+    def _make_ring_put(self, outq, dumps=_pickle.dumps,
+                       protocol=HIGHEST_PROTOCOL):
+        ring_write = outq._ring.write
+        send, send_bytes = outq._writer.send, outq._writer.send_bytes
+
+        def put(obj):
+            # large results are written to the ring buffer,
+            # with only the position sent over the pipe.
+            body = dumps(obj, protocol=protocol)
+            if len(body) >= RING_MIN_SIZE:
+                position = ring_write(body)
+                if position is not None:
+                    return send((RING, position))
+            send_bytes(body)
+        return put
+
 
 class ResultHandler(_pool.ResultHandler):
 
@@ -174,7 +328,7 @@ class ResultHandler(_pool.ResultHandler):
                 if task is None:
                     debug('result handler got sentinel -- exiting')
                     raise CoroStop()
-                on_state_change(task)
+                on_state_change(ring_message(proc.outq, task))
 
     def handle_event(self, fileno=None, event=None):
         if self._state == RUN:
@@ -217,7 +371,7 @@ class ResultHandler(_pool.ResultHandler):
                     break
                 else:
                     if task:
-                        on_state_change(task)
+                        on_state_change(ring_message(proc.outq, task))
                 try:
                     join_exited_workers(shutdown=True)
                 except WorkersJoined:
@@ -229,9 +383,24 @@ class AsynPool(_pool.Pool):
     ResultHandler = ResultHandler
     Worker = Worker
 
-    def __init__(self, processes=None, synack=False, *args, **kwargs):
+    def __init__(self, processes=None, synack=False, ring_size=None,
+                 spawner=None, max_memory_per_child=None, placement=None,
+                 *args, **kwargs):
         processes = self.cpu_count() if processes is None else processes
         self.synack = synack
+        self.ring_size = ring_size
+        self.spawner = spawner
+        self.placement = placement
+        if max_memory_per_child is not None:
+            self.Worker = partial(
+                self.Worker, max_memory_per_child=max_memory_per_child,
+            )
+        if spawner is not None:
+            # started before any queues are created,
+            # so that the template process does not inherit them.
+            spawner.start()
+            self.ring_size = None
+            self.Worker = partial(self.Worker, spawner=spawner)
         self._queues = dict((self.create_process_queues(), None)
                             for _ in range(processes))
         self._fileno_to_inq = {}
@@ -249,6 +418,24 @@ class AsynPool(_pool.Pool):
         orig = super(AsynPool, self)._finalize_args()
         return (self._fileno_to_inq, orig)
 
+    def _create_worker_process(self, i):
+        w = super(AsynPool, self)._create_worker_process(i)
+        if self.placement is not None:
+            self.placement.apply(w.pid, i)
+        return w
+
+    def terminate(self):
+        super(AsynPool, self).terminate()
+        self._stop_spawner()
+
+    def join(self):
+        super(AsynPool, self).join()
+        self._stop_spawner()
+
+    def _stop_spawner(self):
+        if self.spawner is not None:
+            self.spawner.stop()
+
     def get_process_queues(self):
         return next(q for q, owner in items(self._queues)
                     if owner is None)
@@ -269,6 +456,10 @@ class AsynPool(_pool.Pool):
         if self.synack:
             synq = _SimpleQueue()
             synq._writer.setblocking(0)
+        inq._ring = outq._ring = None
+        if self.ring_size:
+            inq._ring = RingBuffer(self.ring_size)
+            outq._ring = RingBuffer(self.ring_size)
         return inq, outq, synq
 
     def on_process_alive(self, pid):
@@ -340,7 +531,7 @@ class AsynPool(_pool.Pool):
                 break
             else:
                 if task is not None:
-                    on_state_change(task)
+                    on_state_change(ring_message(proc.outq, task))
                 else:
                     debug('got sentinel while flushing process %r', proc)
 
@@ -387,6 +578,9 @@ class AsynPool(_pool.Pool):
                             sock.close()
                         except (IOError, OSError):
                             pass
+                ring = getattr(queue, '_ring', None)
+                if ring is not None:
+                    ring.close()
         return removed
 
     def _create_payload(self, type_, args,
@@ -438,6 +632,14 @@ class TaskPool(BasePool):
     uses_semaphore = True
     write_stats = None
 
+    #: :class:`~celery.concurrency.shm.SharedInt` with the max
+    #: resident memory of a pool process in kilobytes, (0 disables).
+    max_memory_per_child = None
+
+    #: :class:`~celery.concurrency.affinity.Placement` used to set the
+    #: CPU affinity of processes, if enabled.
+    placement = None
+
     def on_start(self):
         """Run the task pool.
 
@@ -453,12 +655,49 @@ class TaskPool(BasePool):
                 warning(MAXTASKS_NO_BILLIARD)
 
         forking_enable(self.forking_enable)
-        Pool = (self.BlockingPool if self.options.get('threads', True)
+        options = dict(self.options)
+        ring_size = options.pop('ring_size', None)
+        spawner = options.pop('spawner', False)
+        max_memory = memory_limit(options.pop('max_memory_per_child', None))
+        cpu_affinity = options.pop('cpu_affinity', None)
+        reserved_cpus = options.pop('reserved_cpus', None)
+        Pool = (self.BlockingPool if options.get('threads', True)
                 else self.Pool)
+        Worker = self.Pool.Worker
+        if Pool is self.Pool:
+            # ring buffers, memory limits and the spawner are only
+            # supported by the async pool.
+            options['ring_size'] = ring_size
+            # shared so that the limit can be changed at runtime.
+            self.max_memory_per_child = SharedInt(max_memory)
+            self._check_memory_limit(max_memory)
+            options['max_memory_per_child'] = self.max_memory_per_child
+            Worker = partial(
+                Worker, max_memory_per_child=self.max_memory_per_child,
+            )
+            if cpu_affinity:
+                self.placement = self.create_placement(
+                    cpu_affinity, reserved_cpus or 0,
+                )
+                options['placement'] = self.placement
+            # processes must be forked from the worker when restarting
+            # the pool, so that modules are imported again.
+            if spawner and self.forking_enable and \
+                    not options.get('allow_restart'):
+                options['spawner'] = Spawner(
+                    Worker,
+                    process_template_initializer,
+                    process_spawned_initializer,
+                    options.get('initargs', ()),
+                )
         P = self._pool = Pool(processes=self.limit,
                               initializer=process_initializer,
                               synack=False,
-                              **self.options)
+                              **options)
+        if self.placement is not None:
+            # only pinned after the first pool processes are placed,
+            # so that they're not started on the reserved CPUs.
+            self.placement.apply_parent()
         self.on_apply = P.apply_async
         self.on_soft_timeout = P._timeout_handler.on_soft_timeout
         self.on_hard_timeout = P._timeout_handler.on_hard_timeout
@@ -493,15 +732,45 @@ class TaskPool(BasePool):
         if self._pool is not None and self._pool._state == RUN:
             self._pool.close()
 
+    def create_placement(self, policy, reserved=0):
+        try:
+            placement = Placement(policy, reserved)
+        except NotImplementedError as exc:
+            warning('CPU affinity disabled: %s', exc)
+            return
+        # pool processes are placed by the pool as they are started.
+        return placement
+
+    def set_max_memory_per_child(self, limit):
+        if self.max_memory_per_child is None:
+            raise ValueError('Memory limits not supported by this pool')
+        limit = self.max_memory_per_child.value = memory_limit(limit)
+        self._check_memory_limit(limit)
+
+    def _check_memory_limit(self, limit):
+        # pool processes are forked from this process, so they start
+        # out at about the same size.
+        if limit:
+            used = rss()
+            if used >= limit:
+                warning(W_MEMORY_LIMIT_LOW, limit, used)
+
     def _get_info(self):
         return {
             'max-concurrency': self.limit,
             'processes': [p.pid for p in self._pool._pool],
             'max-tasks-per-child': self._pool._maxtasksperchild or 'N/A',
+            'max-memory-per-child': (
+                self.max_memory_per_child and
+                self.max_memory_per_child.value or 'N/A'),
             'put-guarded-by-semaphore': self.putlocks,
             'timeouts': (self._pool.soft_timeout or 0,
                          self._pool.timeout or 0),
             'writes': self.human_write_stats(),
+            'cpu-affinity': (
+                self.placement.info([(p.pid, p.index)
+                                     for p in self._pool._pool])
+                if self.placement else 'N/A'),
         }
 
     def human_write_stats(self):
@@ -652,8 +921,12 @@ class TaskPool(BasePool):
                         # has since exited and the message must be sent to
                         # another process.
                         return put_message(job)
-                    cor = _write_job(proc, ready_fd, job)
-                    job._writer = ref(cor)
+                    jobs = [job]
+                    if job._payload[2] < MAX_COMBINED_JOB_SIZE:
+                        _add_jobs_for_write(jobs, proc)
+                    cor = _write_job(proc, ready_fd, jobs)
+                    for job in jobs:
+                        job._writer = ref(cor)
                     mark_write_gen_as_active(cor)
                     mark_write_fd_as_active(ready_fd)
 
@@ -664,6 +937,27 @@ class TaskPool(BasePool):
                     except StopIteration:
                         pass
 
+        def _add_jobs_for_write(jobs, proc):
+            # Pending small jobs are written to the process together
+            # with the first, so that they can be written using a single
+            # system call.  The pending jobs are shared evenly between
+            # the processes so that idle processes are not left waiting.
+            nprocs = len(all_inqueues) or 1
+            limit = min(MAX_JOBS_PER_WRITE,
+                        (len(outbound) + nprocs) // nprocs)
+            while len(jobs) < limit:
+                try:
+                    job = pop_message()
+                except IndexError:
+                    break
+                if job._accepted:
+                    continue
+                if job._payload[2] >= MAX_COMBINED_JOB_SIZE:
+                    outbound.appendleft(job)
+                    break
+                job._scheduled_for = proc
+                jobs.append(job)
+
         def send_job(tup):
             # Schedule writing job request for when one of the process
             # inqueues are writable.
@@ -684,20 +978,42 @@ class TaskPool(BasePool):
             raise Exception(
                 'Process writable but cannot write. Contact support!')
 
-        def _write_job(proc, fd, job):
-            # writes job to the worker process.
+        def _job_payload(proc, job):
+            header, body, body_size = job._payload
+            ring = proc.inq._ring
+            if ring is not None and body_size >= RING_MIN_SIZE:
+                # copy the job into the shared memory ring buffer,
+                # so only the position needs to be sent over the pipe.
+                position = ring.write(body)
+                if position is not None:
+                    body = dumps((RING, position), protocol=protocol)
+                    body_size = len(body)
+                    header = pack('>I', body_size)
+            return header, body, body_size
+
+        def _write_job(proc, fd, jobs):
+            # writes jobs to the worker process.
             # Operation must complete if more than one byte of data
             # was written.  If the broker connection is lost
             # and no data was written the operation shall be cancelled.
-            header, body, body_size = job._payload
+            payloads = [_job_payload(proc, job) for job in jobs]
+            header, body, body_size = payloads[-1]
+            if len(payloads) > 1:
+                # every job is still a separate message for the child,
+                # so the other jobs are simply sent before the header.
+                header = b''.join(
+                    [h + b for h, b, _ in payloads[:-1]] + [header],
+                )
+            header_size = len(header)
             errors = 0
             try:
                 # job result keeps track of what process the job is sent to.
-                job._write_to = proc
+                for job in jobs:
+                    job._write_to = proc
                 send = proc.send_job_offset
 
                 Hw = Bw = 0
-                while Hw < 4:
+                while Hw < header_size:
                     try:
                         Hw += send(header, Hw)
                     except Exception as exc:
@@ -724,10 +1040,10 @@ class TaskPool(BasePool):
                         yield
                     errors = 0
             finally:
-                write_stats[proc.index] += 1
+                write_stats[proc.index] += len(jobs)
                 # message written, so this fd is now available
                 active_writes.discard(fd)
-                write_generator_done(job._writer())  # is a weakref
+                write_generator_done(jobs[0]._writer())  # is a weakref
 
         def send_ack(response, pid, job, fd, WRITE=WRITE, ERR=ERR):
             # Schedule writing ack response for when the fd is writeable.
@@ -825,17 +1141,16 @@ class TaskPool(BasePool):
                     for gen in writers:
                         if (gen.__name__ == '_write_job' and
                                 gen_not_started(gen)):
-                            # has not started writing the job so can
-                            # discard the task, but we must also remove
-                            # it from the Pool._cache.
-                            job_to_discard = None
-                            for job in values(self._pool._cache):
-                                if job._writer() is gen:  # _writer is saferef
-                                    # removes from Pool._cache
-                                    job_to_discard = job
-                                    break
-                            if job_to_discard:
-                                job_to_discard.discard()
+                            # has not started writing the jobs so can
+                            # discard the tasks, but we must also remove
+                            # them from the Pool._cache.
+                            jobs_to_discard = [
+                                job for job in values(self._pool._cache)
+                                if job._writer() is gen  # _writer is saferef
+                            ]
+                            for job in jobs_to_discard:
+                                # removes from Pool._cache
+                                job.discard()
                             self._active_writers.discard(gen)
                         else:
                             try:
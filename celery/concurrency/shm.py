@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.concurrency.shm
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Shared memory ring buffer used to transfer large payloads
+    between the worker and its pool processes, and shared
+    settings that can be changed by the worker at runtime.
+
+"""
+from __future__ import absolute_import
+
+import mmap
+import struct
+
+from kombu.serialization import pickle as _pickle
+
+from celery.five import PY3
+
+__all__ = ['RingBuffer', 'SharedInt']
+
+#: Header: position written by the producer, and the position released
+#: by the consumer (stored twice, see :meth:`RingBuffer._released`).
+HEADER = struct.Struct('>QQQ')
+POSITION = struct.Struct('>Q')
+INT = struct.Struct('q')
+
+
+class RingBuffer(object):
+    """Ring buffer in anonymous shared memory, with a single producer
+    and a single consumer.
+
+    The buffer must be created before the consumer/producer process
+    is forked, as it is inherited by the child process.
+
+    The producer copies data into the buffer using :meth:`write`,
+    and must then pass the position returned to the consumer
+    (e.g. over a pipe), which reads the data using :meth:`read`.
+    Records must be read in the order they were written,
+    and the space used is reclaimed as soon as a record is read.
+
+    :param size: Size of the buffer in bytes.
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._mmap = mmap.mmap(-1, HEADER.size + size)
+
+    def _written(self):
+        return POSITION.unpack_from(self._mmap, 0)[0]
+
+    def _released(self, unpack_from=POSITION.unpack_from):
+        # The consumer writes the position twice, and we read them
+        # in reverse order so that a position that is being written
+        # by the other process is never used.
+        mm = self._mmap
+        while 1:
+            second, = unpack_from(mm, 16)
+            first, = unpack_from(mm, 8)
+            if first == second:
+                return first
+
+    def _release(self, position, pack_into=POSITION.pack_into):
+        mm = self._mmap
+        pack_into(mm, 8, position)
+        pack_into(mm, 16, position)
+
+    def write(self, data):
+        """Copy data into the buffer.
+
+        Returns the ``(position, size)`` tuple to pass to :meth:`read`,
+        or :const:`None` if there is not enough free space.
+
+        """
+        size, capacity = len(data), self.size
+        if size > capacity:
+            return
+        position = self._written()
+        offset = position % capacity
+        if offset + size > capacity:
+            # records are contiguous, so skip the space left at the end.
+            position += capacity - offset
+            offset = 0
+        if position + size - self._released() > capacity:
+            return
+        start = HEADER.size + offset
+        self._mmap[start:start + size] = data
+        POSITION.pack_into(self._mmap, 0, position + size)
+        return position, size
+
+    def read(self, position, size, loads=_pickle.loads):
+        """Deserialize (using ``loads``) and release the record
+        at ``position``."""
+        start = HEADER.size + position % self.size
+        if PY3:
+            # loads directly from shared memory.
+            view = memoryview(self._mmap)[start:start + size]
+            try:
+                obj = loads(view)
+            finally:
+                view.release()
+        else:  # pragma: no cover
+            obj = loads(self._mmap[start:start + size])
+        self._release(position + size)
+        return obj
+
+    def close(self):
+        self._mmap.close()
+
+
+class SharedInt(object):
+    """Integer in anonymous shared memory.
+
+    Like :class:`RingBuffer` it must be created before the child
+    process is forked.  When pickled (e.g. when the child process is
+    not forked) it's copied, so changes are not shared.
+
+    :keyword value: Initial value.
+
+    """
+
+    def __init__(self, value=0):
+        self._mmap = mmap.mmap(-1, INT.size)
+        self.value = value
+
+    @property
+    def value(self):
+        return INT.unpack_from(self._mmap)[0]
+
+    @value.setter
+    def value(self, value):
+        INT.pack_into(self._mmap, 0, value)
+
+    def __reduce__(self):
+        return self.__class__, (self.value, )
+
+    def __repr__(self):
+        return '<SharedInt: {0!r}>'.format(self.value)
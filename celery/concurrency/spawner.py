@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.concurrency.spawner
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Template process forking new pool processes, so that they
+    don't have to be forked from the worker main process.
+
+"""
+from __future__ import absolute_import
+
+import errno
+import fcntl
+import os
+import select
+import signal
+import threading
+
+from billiard import Pipe, Process
+from billiard import util
+from billiard.connection import Connection
+from billiard.forking import Popen
+from billiard.queues import _SimpleQueue
+from billiard.reduction import send_handle, recv_handle
+from kombu.utils.compat import get_errno
+
+from celery.five import range
+
+__all__ = ['Spawner', 'SpawnedPopen']
+
+#: Message sent by the template process when a process was forked,
+#: with the pid of the new process (or the exception raised).
+SPAWNED = 0
+
+#: Message sent by the template process when one of the processes
+#: it forked exited, with the pid and exit code of the process.
+EXITED = 1
+
+#: Exit code used for a process when the exit status could not be
+#: reported, because the template process is gone.
+EX_UNKNOWN = 1
+
+
+def _noop_handler(signum, frame):
+    pass
+
+
+def _set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def _rebuild_queue(reader, writer):
+    queue = _SimpleQueue.__new__(_SimpleQueue)
+    queue.__setstate__((Connection(reader), Connection(writer), None, None))
+    queue._ring = None  # ring buffers can't be passed to the process.
+    return queue
+
+
+def _returncode(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class SpawnedPopen(Popen):
+    """Process handle for a process forked by :class:`Spawner`.
+
+    The process is not a child of this process, so its exit status
+    is reported by the template process instead of using :func:`os.waitpid`.
+
+    """
+
+    def __init__(self, process_obj, spawner):
+        self.returncode = None
+        self.spawner = spawner
+        self.pid, self.sentinel = spawner.spawn(process_obj)
+        util.Finalize(self, os.close, (self.sentinel, ))
+
+    def poll(self, flag=os.WNOHANG):
+        if self.returncode is None:
+            self.returncode = self.spawner.returncode(
+                self.pid, self.sentinel, block=not flag,
+            )
+        return self.returncode
+
+
+class Spawner(object):
+    """Forks pool processes from a template process.
+
+    The template process is forked from the worker when the pool starts,
+    and runs ``template_initializer`` once.  New pool processes are then
+    forked by the template process, so the cost of forking doesn't grow with
+    the size of the worker process, and only ``initializer`` needs to
+    run in every new process.
+
+    The queues of a new process are created by the worker, and passed to
+    the template process over a unix socket.
+
+    :param Worker: The pool process class.
+    :keyword template_initializer: Called in the template process.
+    :keyword initializer: Called in every new process.
+    :keyword initargs: Arguments for both initializers.
+
+    """
+
+    def __init__(self, Worker, template_initializer=None,
+                 initializer=None, initargs=()):
+        self.Worker = Worker
+        self.template_initializer = template_initializer
+        self.initializer = initializer
+        self.initargs = initargs
+        self.process = None
+        self._conn = None
+        self._exited = {}
+        self._mutex = threading.Lock()
+
+    def start(self):
+        self._conn, conn = Pipe()
+        self.process = Process(target=self.run, args=(conn, ),
+                               name='PoolSpawner')
+        self.process.daemon = True
+        self.process.start()
+        conn.close()
+
+    def stop(self, timeout=1.0):
+        """Stop the template process, processes forked by it
+        are not affected."""
+        with self._mutex:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self.process.join(timeout)
+
+    def Popen(self, process_obj):
+        """Used as the ``_Popen`` class of pool processes."""
+        return SpawnedPopen(process_obj, self)
+
+    def spawn(self, process):
+        """Fork ``process`` from the template process,
+        returns the pid and sentinel of the new process."""
+        queues = [q for q in (process.inq, process.outq, process.synq)
+                  if q is not None]
+        request = (process.name, getattr(process, 'index', None),
+                   process.maxtasks, process.sigprotection, len(queues))
+        sentinel, w = os.pipe()
+        try:
+            with self._mutex:
+                conn, pid = self._conn, self.process.pid
+                conn.send(request)
+                for queue in queues:
+                    send_handle(conn, queue._reader.fileno(), pid)
+                    send_handle(conn, queue._writer.fileno(), pid)
+                send_handle(conn, w, pid)
+                while 1:
+                    type_, value = self._recv()
+                    if type_ == SPAWNED:
+                        break
+        except BaseException:
+            os.close(sentinel)
+            raise
+        finally:
+            os.close(w)
+        if isinstance(value, Exception):
+            os.close(sentinel)
+            raise value
+        return value, sentinel
+
+    def returncode(self, pid, sentinel, block=False):
+        """Return the exit code of a process forked by the template
+        process, or :const:`None` if it is still running."""
+        with self._mutex:
+            try:
+                while pid not in self._exited:
+                    if self._conn is None:
+                        raise EOFError()
+                    if not block and not self._conn.poll(0):
+                        return
+                    self._recv()
+            except (EOFError, IOError, OSError):
+                return self._returncode_unknown(pid, sentinel)
+            return self._exited.pop(pid)
+
+    def _recv(self):
+        type_, value = self._conn.recv()
+        if type_ == EXITED:
+            pid, exitcode = value
+            self._exited[pid] = exitcode
+        return type_, value
+
+    def _returncode_unknown(self, pid, sentinel):
+        # the sentinel is closed when the process exits, but the process
+        # may not have been reaped yet.
+        if select.select([sentinel], [], [], 0)[0]:
+            return EX_UNKNOWN
+        try:
+            os.kill(pid, 0)
+        except OSError as exc:
+            if get_errno(exc) == errno.ESRCH:
+                return EX_UNKNOWN
+            raise
+
+    def run(self, conn):
+        # -- runs in the template process.
+        self._conn.close()
+        if self.template_initializer is not None:
+            self.template_initializer(*self.initargs)
+        wakeup_r, wakeup_w = os.pipe()
+        _set_nonblocking(wakeup_r)
+        _set_nonblocking(wakeup_w)
+        signal.set_wakeup_fd(wakeup_w)
+        signal.signal(signal.SIGCHLD, _noop_handler)
+        fileno = conn.fileno()
+
+        while 1:
+            self._reap(conn)
+            try:
+                readable = select.select([fileno, wakeup_r], [], [], 1.0)[0]
+            except (select.error, OSError) as exc:
+                if get_errno(exc) == errno.EINTR:
+                    continue
+                raise
+            if wakeup_r in readable:
+                try:
+                    os.read(wakeup_r, 4096)
+                except OSError as exc:
+                    if get_errno(exc) != errno.EAGAIN:
+                        raise
+            if fileno in readable:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+                handles = [recv_handle(conn)
+                           for _ in range(request[-1] * 2 + 1)]
+                try:
+                    pid = self._fork(request, handles,
+                                     (conn, wakeup_r, wakeup_w))
+                except Exception as exc:
+                    pid = exc
+                finally:
+                    for handle in handles:
+                        os.close(handle)
+                conn.send((SPAWNED, pid))
+
+    def _reap(self, conn):
+        while 1:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as exc:
+                if get_errno(exc) == errno.ECHILD:
+                    return
+                raise
+            if not pid:
+                return
+            conn.send((EXITED, (pid, _returncode(status))))
+
+    def _fork(self, request, handles, close):
+        name, index, maxtasks, sigprotection, nqueues = request
+        pid = os.fork()
+        if pid:
+            return pid
+        # -- runs in the new process.
+        exitcode = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            conn, wakeup_r, wakeup_w = close
+            conn.close()
+            os.close(wakeup_r)
+            os.close(wakeup_w)
+            queues = [_rebuild_queue(handles[i], handles[i + 1])
+                      for i in range(0, nqueues * 2, 2)]
+            inq, outq, synq = (queues + [None])[:3]
+            # handles[-1] is the write end of the sentinel pipe,
+            # which is kept open until the process exits.
+            process = self.Worker(
+                inq, outq, synq, self.initializer, self.initargs,
+                maxtasks, sigprotection=sigprotection,
+            )
+            process.name, process.index = name, index
+            process.daemon = True
+            exitcode = process._bootstrap()
+        finally:
+            os._exit(exitcode)
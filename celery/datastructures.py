@@ -541,31 +541,53 @@ class LimitedSet(object):
     Good for when you need to test for membership (`a in set`),
     but the list might become to big.
 
+    Members are kept in a dict (value -> time inserted) for constant time
+    membership tests, and a heap ordered by insertion time is used
+    to find the members to evict, so adding, discarding and expiring
+    members are all ``O(log n)`` operations.
+
+    Entries for discarded (or re-added) members are not removed
+    from the heap right away, but skipped when they reach the top,
+    and the heap is compacted when most of it is made up of these
+    stale entries.
+
     :keyword maxlen: Maximum number of members before we start
                      evicting expired members.
     :keyword expires: Time in seconds, before a membership expires.
 
     """
+    #: Heap is compacted when it has more than this many stale entries,
+    #: and at least as many stale entries as there are members.
+    min_stale = 64
+
+    #: Optional callback called with ``(op, value, inserted)`` when
+    #: a member is added (``"add"``), discarded (``"discard"``)
+    #: or evicted (``"expire"``).
+    on_change = None
 
     def __init__(self, maxlen=None, expires=None, data=None, heap=None):
         self.maxlen = maxlen
         self.expires = expires
         self._data = {} if data is None else data
         self._heap = [] if heap is None else heap
-        # make shortcuts
-        self.__iter__ = self._data.__iter__
-        self.__len__ = self._data.__len__
-        self.__contains__ = self._data.__contains__
 
     def add(self, value, now=time.time):
         """Add a new member."""
-        # offset is there to modify the length of the list,
-        # this way we can expire an item before inserting the value,
-        # and it will end up in correct order.
-        self.purge(1, offset=1)
-        inserted = now()
-        self._data[value] = inserted
-        heappush(self._heap, (inserted, value))
+        if value in self._data:
+            # the old entry in the heap is now stale.
+            self._data[value] = inserted = now()
+            heappush(self._heap, (inserted, value))
+            self._maybe_compact()
+        else:
+            # offset is there to modify the length of the list,
+            # this way we can expire an item before inserting the value,
+            # and it will end up in correct order.
+            self.purge(1, offset=1)
+            inserted = now()
+            self._data[value] = inserted
+            heappush(self._heap, (inserted, value))
+        if self.on_change is not None:
+            self.on_change('add', value, inserted)
 
     def clear(self):
         """Remove all members"""
@@ -574,15 +596,11 @@ class LimitedSet(object):
 
     def discard(self, value):
         """Remove membership by finding value."""
-        try:
-            itime = self._data[value]
-        except KeyError:
-            return
-        try:
-            self._heap.remove((value, itime))
-        except ValueError:
-            pass
-        self._data.pop(value, None)
+        inserted = self._data.pop(value, None)
+        if inserted is not None:
+            if self.on_change is not None:
+                self.on_change('discard', value, inserted)
+            self._maybe_compact()
     pop_value = discard  # XXX compat
 
     def purge(self, limit=None, offset=0, now=time.time):
@@ -596,29 +614,46 @@ class LimitedSet(object):
         # have a value to guard the loop.
         limit = len(self) + offset if limit is None else limit
 
-        i = 0
+        i, pops = 0, len(H)
         while len(self) + offset > maxlen:
-            if i >= limit:
+            if i >= limit or not pops:
                 break
+            pops -= 1
             try:
                 item = heappop(H)
             except IndexError:
                 break
+            if self._data.get(item[1]) != item[0]:
+                continue  # stale entry, discarded or added again.
             if self.expires:
                 if now() < item[0] + self.expires:
                     heappush(H, item)
                     break
-            try:
-                self._data.pop(item[1])
-            except KeyError:  # out of sync with heap
-                pass
+            self._data.pop(item[1], None)
+            if self.on_change is not None:
+                self.on_change('expire', item[1], item[0])
             i += 1
 
+    def _maybe_compact(self):
+        stale = len(self._heap) - len(self._data)
+        if stale > self.min_stale and stale >= len(self._data):
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the heap without the stale entries."""
+        H = self._heap
+        H[:] = [(inserted, value) for value, inserted in items(self._data)]
+        heapify(H)
+
     def update(self, other, heappush=heappush):
         if isinstance(other, self.__class__):
             self._data.update(other._data)
             self._heap.extend(other._heap)
             heapify(self._heap)
+            self._maybe_compact()
+            if self.on_change is not None:
+                for value, inserted in items(other._data):
+                    self.on_change('add', value, inserted)
         else:
             for obj in other:
                 self.add(obj)
@@ -627,7 +662,7 @@ class LimitedSet(object):
         return self._data
 
     def __eq__(self, other):
-        return self._heap == other._heap
+        return self._data == other._data
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -636,10 +671,12 @@ class LimitedSet(object):
         return 'LimitedSet({0})'.format(len(self))
 
     def __iter__(self):
-        return (item[1] for item in self._heap)
+        data = self._data
+        return (item[1] for item in sorted(self._heap)
+                if data.get(item[1]) == item[0])
 
     def __len__(self):
-        return len(self._heap)
+        return len(self._data)
 
     def __contains__(self, key):
         return key in self._data
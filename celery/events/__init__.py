@@ -92,11 +92,27 @@ class EventDispatcher(object):
        while the connection is down. :meth:`flush` must be called
        as soon as the connection is re-established.
 
+    :keyword batch_size: If set task events are buffered and sent
+       as a single message for every ``batch_size`` events.
+       :meth:`flush_batch` must then be called regularly to send
+       any remaining events.
+
+    :keyword batch_interval: Max number of seconds a task event is
+       buffered when ``batch_size`` is set (checked when the next event
+       is sent, or by :meth:`flush_batch`).
+
     You need to :meth:`close` this after use.
 
     """
     DISABLED_TRANSPORTS = set(['sql'])
 
+    #: Event groups buffered when batching is enabled,
+    #: other events are sent right away (after any buffered events).
+    batch_groups = set(['task'])
+
+    #: Routing key used for batches of events.
+    batch_routing_key = 'task.multi'
+
     # set of callbacks to be called when :meth:`enabled`.
     on_enabled = None
 
@@ -105,7 +121,8 @@ class EventDispatcher(object):
 
     def __init__(self, connection=None, hostname=None, enabled=True,
                  channel=None, buffer_while_offline=True, app=None,
-                 serializer=None, groups=None):
+                 serializer=None, groups=None, batch_size=None,
+                 batch_interval=None):
         self.app = app_or_default(app or self.app)
         self.connection = connection
         self.channel = channel
@@ -114,6 +131,10 @@ class EventDispatcher(object):
         self.mutex = threading.Lock()
         self.producer = None
         self._outbound_buffer = deque()
+        self.batch_size = batch_size
+        self.batch_interval = 1.0 if batch_interval is None else batch_interval
+        self._batch = []
+        self._batch_start = None
         self.serializer = serializer or self.app.conf.CELERY_EVENT_SERIALIZER
         self.on_enabled = set()
         self.on_disabled = set()
@@ -206,15 +227,63 @@ class EventDispatcher(object):
 
         """
         if self.enabled:
+            group = group_from(type)
             groups = self.groups
-            if groups and group_from(type) not in groups:
+            if groups and group not in groups:
                 return
+            batched = self.batch_size and group in self.batch_groups
             try:
-                self.publish(type, fields, self.producer, blind)
+                if batched:
+                    self._send_batched(type, fields, blind)
+                else:
+                    if self._batch:
+                        self.flush_batch()
+                    self.publish(type, fields, self.producer, blind)
             except Exception as exc:
                 if not self.buffer_while_offline:
                     raise
-                self._outbound_buffer.append((type, fields, exc))
+                if not batched:
+                    # batched events are kept in the batch by flush_batch.
+                    self._outbound_buffer.append((type, fields, exc))
+
+    def _send_batched(self, type, fields, blind=False,
+                      utcoffset=utcoffset, Event=Event, now=time.time):
+        with self.mutex:
+            batch = self._batch
+            clock = None if blind else self.clock.forward()
+            batch.append(Event(type, hostname=self.hostname,
+                               utcoffset=utcoffset(), pid=self.pid,
+                               clock=clock, **fields))
+            if len(batch) == 1:
+                self._batch_start = now()
+        if len(batch) >= self.batch_size or (
+                now() - self._batch_start >= self.batch_interval):
+            self.flush_batch()
+
+    def flush_batch(self):
+        """Send the buffered task events as a single message.
+
+        The events are kept in the buffer if they cannot be sent.
+
+        """
+        with self.mutex:
+            batch, self._batch = self._batch, []
+            if not batch:
+                return
+            exchange = self.exchange
+            try:
+                self.producer.publish(
+                    batch,
+                    routing_key=self.batch_routing_key,
+                    exchange=exchange.name,
+                    declare=[exchange],
+                    serializer=self.serializer,
+                    headers=self.headers,
+                )
+            except Exception:
+                batch.extend(self._batch)
+                self._batch = batch
+                raise
 
     def flush(self):
         """Flushes the outbound buffer."""
@@ -224,14 +293,23 @@ class EventDispatcher(object):
             except IndexError:
                 return
             self.send(type, **fields)
+        if self._batch:
+            self.flush_batch()
 
     def copy_buffer(self, other):
         """Copies the outbound buffer of another instance."""
         self._outbound_buffer = other._outbound_buffer
+        self._batch = other._batch
 
     def close(self):
         """Close the event dispatcher."""
         self.mutex.locked() and self.mutex.release()
+        if self._batch and self.producer is not None:
+            try:
+                self.flush_batch()
+            except Exception:
+                if not self.buffer_while_offline:
+                    raise
         self.producer = None
 
     def _get_publisher(self):
@@ -247,6 +325,9 @@ class EventReceiver(ConsumerMixin):
 
     :param connection: Connection to the broker.
     :keyword handlers: Event handlers.
+    :keyword bulk_handler: Called with the list of all events received
+        in a message, instead of dispatching them to :attr:`handlers`
+        one by one (e.g. :meth:`celery.events.state.State.bulk_event`).
 
     :attr:`handlers` is a dict of event types and their handlers,
     the special handler `"*"` captures all events that doesn't have a
@@ -255,10 +336,12 @@ class EventReceiver(ConsumerMixin):
     """
 
     def __init__(self, connection, handlers=None, routing_key='#',
-                 node_id=None, app=None, queue_prefix='celeryev'):
+                 node_id=None, app=None, queue_prefix='celeryev',
+                 bulk_handler=None):
         self.app = app_or_default(app)
         self.connection = connection
         self.handlers = {} if handlers is None else handlers
+        self.bulk_handler = bulk_handler
         self.routing_key = routing_key
         self.node_id = node_id or uuid()
         self.queue_prefix = queue_prefix
@@ -321,7 +404,18 @@ class EventReceiver(ConsumerMixin):
         return type, Event(type, body, local_received=now())
 
     def _receive(self, body, message):
-        self.process(*self.event_from_message(body))
+        if self.bulk_handler is not None:
+            from_message = self.event_from_message
+            self.bulk_handler([
+                from_message(event)[1]
+                for event in (body if isinstance(body, list) else [body])
+            ])
+        elif isinstance(body, list):  # batch of events, ordered by clock.
+            process, from_message = self.process, self.event_from_message
+            for event in body:
+                process(*from_message(event))
+        else:
+            self.process(*self.event_from_message(body))
 
 
 class Events(object):
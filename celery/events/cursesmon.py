@@ -21,7 +21,7 @@ from math import ceil
 from celery import VERSION_BANNER
 from celery import states
 from celery.app import app_or_default
-from celery.five import items, values
+from celery.five import items
 from celery.utils.text import abbr, abbrtask
 
 BORDER_SPACING = 4
@@ -36,7 +36,8 @@ MIN_TASK_WIDTH = 16
 # we don't care about coverage.
 
 STATUS_SCREEN = """\
-events: {s.event_count} tasks:{s.task_count} workers:{w_alive}/{w_all}
+events: {s.event_count} tasks:{s.task_count} workers:{w_alive}/{w_all} \
+showing:{first}-{last}
 """
 
 
@@ -52,16 +53,36 @@ class CursesMonitor(object):  # pragma: no cover
     background = curses.COLOR_WHITE
     online_str = 'Workers online: '
     help_title = 'Keys: '
-    help = ('j:down k:up i:info t:traceback r:result c:revoke ^c: quit')
+    help = ('j:down k:up n:next page p:prev page i:info t:traceback '
+            'r:result c:revoke ^c: quit')
     greet = 'celery events {0}'.format(VERSION_BANNER)
     info_str = 'Info: '
 
+    #: Position of the first task displayed in the list of tasks
+    #: (ordered by time).
+    offset = 0
+
+    #: The screen is refreshed at most this often (in seconds), and the
+    #: interval grows with the number of events received per second
+    #: (by ``min_refresh_interval`` for every ``refresh_event_rate``
+    #: events per second), up to ``max_refresh_interval``.
+    #: Keypresses are always handled immediately.
+    min_refresh_interval = 0.1
+    max_refresh_interval = 2.0
+    refresh_event_rate = 1000.0
+
+    _last_refresh = 0.0
+    _refreshed_event_count = None
+    _screen_size = None
+
     def __init__(self, state, keymap=None, app=None):
         self.app = app_or_default(app)
         self.keymap = keymap or self.keymap
         self.state = state
         default_keymap = {'J': self.move_selection_down,
                           'K': self.move_selection_up,
+                          'N': self.move_page_down,
+                          'P': self.move_page_up,
                           'C': self.revoke_selection,
                           'T': self.selection_traceback,
                           'R': self.selection_result,
@@ -69,6 +90,9 @@ class CursesMonitor(object):  # pragma: no cover
                           'L': self.selection_rate_limit}
         self.keymap = dict(default_keymap, **self.keymap)
         self.lock = threading.RLock()
+        # contents of the lines currently on screen, by line number.
+        self._lines = {}
+        self._needs_erase = True
 
     def format_row(self, uuid, task, worker, timestamp, state):
         mx = self.display_width
@@ -136,18 +160,34 @@ class CursesMonitor(object):  # pragma: no cover
     def move_selection_down(self):
         self.move_selection(1)
 
+    def move_page_up(self):
+        self.move_selection(-self.limit)
+
+    def move_page_down(self):
+        self.move_selection(self.limit)
+
     def move_selection(self, direction=1):
-        if not self.tasks:
+        if not self.state.tasks:
             return
-        pos = self.find_position()
-        try:
-            self.selected_task = self.tasks[pos + direction][0]
-        except IndexError:
-            self.selected_task = self.tasks[0][0]
+        pos = self.find_position() + direction
+        # scroll the list if the selection moves outside the screen.
+        if pos < 0:
+            self.offset, pos = max(self.offset + pos, 0), 0
+        elif pos >= self.limit:
+            self.offset += pos - self.limit + 1
+            pos = self.limit - 1
+        self.offset = max(min(self.offset, len(self.state.tasks) - 1), 0)
+        tasks = self.tasks
+        if tasks:
+            self.selected_task = tasks[min(pos, len(tasks) - 1)][0]
 
     keyalias = {curses.KEY_DOWN: 'J',
                 curses.KEY_UP: 'K',
-                curses.KEY_ENTER: 'I'}
+                curses.KEY_ENTER: 'I',
+                'KEY_DOWN': 'J',
+                'KEY_UP': 'K',
+                'KEY_NPAGE': 'N',
+                'KEY_PPAGE': 'P'}
 
     def handle_keypress(self):
         try:
@@ -158,6 +198,8 @@ class CursesMonitor(object):  # pragma: no cover
         handler = self.keymap.get(key)
         if handler is not None:
             handler()
+            # handlers may have used the whole screen.
+            self._needs_erase = True
 
     def alert(self, callback, title=None):
         self.win.erase()
@@ -339,45 +381,82 @@ class CursesMonitor(object):  # pragma: no cover
         line = self.format_row(task.uuid, task.name,
                                hostname,
                                timef, task.state)
-        self.win.addstr(lineno, LEFT_BORDER_OFFSET, line, attr)
-
+        parts = [(LEFT_BORDER_OFFSET, line, attr)]
         if state_color:
-            self.win.addstr(lineno,
-                            len(line) - STATE_WIDTH + BORDER_SPACING - 1,
-                            task.state, state_color | attr)
+            parts.append((len(line) - STATE_WIDTH + BORDER_SPACING - 1,
+                          task.state, state_color | attr))
+        self.put_line(lineno, *parts)
+
+    def put_line(self, lineno, *parts):
+        """Draw line made of ``(x, string, attr)`` parts,
+        unless the same line is already on the screen."""
+        if self._lines.get(lineno) == parts:
+            return
+        self._lines[lineno] = parts
+        win = self.win
+        win.addstr(lineno, LEFT_BORDER_OFFSET, ' ' * self.display_width)
+        for x, string, attr in parts:
+            win.addstr(lineno, x, string[:self.screen_width - x - 1], attr)
+
+    def refresh_interval(self, event_rate):
+        return min(self.max_refresh_interval,
+                   self.min_refresh_interval *
+                   max(1.0, event_rate / self.refresh_event_rate))
+
+    def should_refresh(self, now=time.time):
+        if self._needs_erase:
+            return True
+        elapsed = now() - self._last_refresh
+        events = self.state.event_count - (self._refreshed_event_count or 0)
+        if not events:
+            # nothing happened, but times and alive workers may change.
+            return elapsed >= self.max_refresh_interval
+        return elapsed >= self.refresh_interval(events / max(elapsed, 1e-3))
 
     def draw(self):
         with self.lock:
-            win = self.win
             self.handle_keypress()
+            if self.should_refresh():
+                self.refresh_screen()
+
+    def refresh_screen(self):
+        with self.lock:
+            win = self.win
             x = LEFT_BORDER_OFFSET
             y = blank_line = count(2)
             my, mx = win.getmaxyx()
-            win.erase()
-            win.bkgd(' ', curses.color_pair(1))
-            win.border()
-            win.addstr(1, x, self.greet, curses.A_DIM | curses.color_pair(5))
+            self._last_refresh = time.time()
+            self._refreshed_event_count = self.state.event_count
+            if self._needs_erase or self._screen_size != (my, mx):
+                # only the lines that changed are drawn otherwise.
+                self._needs_erase, self._screen_size = False, (my, mx)
+                self._lines.clear()
+                win.erase()
+                win.bkgd(' ', curses.color_pair(1))
+                win.border()
+                win.addstr(1, x, self.greet,
+                           curses.A_DIM | curses.color_pair(5))
+                win.hline(my - 6, x, curses.ACS_HLINE, self.screen_width - 4)
             next(blank_line)
-            win.addstr(next(y), x, self.format_row('UUID', 'TASK',
-                                                   'WORKER', 'TIME', 'STATE'),
-                       curses.A_BOLD | curses.A_UNDERLINE)
+            self.put_line(next(y), (x, self.format_row(
+                'UUID', 'TASK', 'WORKER', 'TIME', 'STATE'),
+                curses.A_BOLD | curses.A_UNDERLINE))
             tasks = self.tasks
-            if tasks:
-                for row, (uuid, task) in enumerate(tasks):
-                    if row > self.display_height:
-                        break
-
-                    if task.uuid:
-                        lineno = next(y)
-                    self.display_task_row(lineno, task)
+            first_row = next(y)
+            lineno = first_row - 1
+            for row, (uuid, task) in enumerate(tasks):
+                if row > self.display_height:
+                    break
+                lineno = first_row + row
+                self.display_task_row(lineno, task)
+            # clear rows no longer used.
+            for lineno in range(lineno + 1, my - 6):
+                self.put_line(lineno)
 
             # -- Footer
-            next(blank_line)
-            win.hline(my - 6, x, curses.ACS_HLINE, self.screen_width - 4)
 
             # Selected Task Info
             if self.selected_task:
-                win.addstr(my - 5, x, self.selected_str, curses.A_BOLD)
                 info = 'Missing extended info'
                 detail = ''
                 try:
@@ -398,40 +477,48 @@ class CursesMonitor(object):  # pragma: no cover
                 infowin = abbr(info,
                                self.screen_width - len(self.selected_str) - 2,
                                detail)
-                win.addstr(my - 5, x + len(self.selected_str), infowin)
+                parts = [(x, self.selected_str, curses.A_BOLD),
+                         (x + len(self.selected_str), infowin,
+                          curses.A_NORMAL)]
                 # Make ellipsis bold
                 if detail in infowin:
                     detailpos = len(infowin) - len(detail)
-                    win.addstr(my - 5, x + len(self.selected_str) + detailpos,
-                               detail, curses.A_BOLD)
+                    parts.append((x + len(self.selected_str) + detailpos,
+                                  detail, curses.A_BOLD))
+                self.put_line(my - 5, *parts)
             else:
-                win.addstr(my - 5, x, 'No task selected', curses.A_NORMAL)
+                self.put_line(my - 5, (x, 'No task selected',
+                                       curses.A_NORMAL))
 
             # Workers
-            if self.workers:
-                win.addstr(my - 4, x, self.online_str, curses.A_BOLD)
-                win.addstr(my - 4, x + len(self.online_str),
-                           ', '.join(sorted(self.workers)), curses.A_NORMAL)
+            workers = self.workers
+            if workers:
+                self.put_line(
+                    my - 4, (x, self.online_str, curses.A_BOLD),
+                    (x + len(self.online_str), ', '.join(sorted(workers)),
+                     curses.A_NORMAL),
+                )
             else:
-                win.addstr(my - 4, x, 'No workers discovered.')
+                self.put_line(my - 4, (x, 'No workers discovered.',
+                                       curses.A_NORMAL))
 
             # Info
-            win.addstr(my - 3, x, self.info_str, curses.A_BOLD)
-            win.addstr(
-                my - 3, x + len(self.info_str),
-                STATUS_SCREEN.format(
+            self.put_line(
+                my - 3, (x, self.info_str, curses.A_BOLD),
+                (x + len(self.info_str), STATUS_SCREEN.format(
                     s=self.state,
-                    w_alive=len([w for w in values(self.state.workers)
-                                if w.alive]),
+                    w_alive=len(workers),
                     w_all=len(self.state.workers),
-                ),
-                curses.A_DIM,
+                    first=self.offset + 1 if tasks else 0,
+                    last=self.offset + len(tasks),
+                ).rstrip(), curses.A_DIM),
             )
 
             # Help
-            self.safe_add_str(my - 2, x, self.help_title, curses.A_BOLD)
-            self.safe_add_str(my - 2, x + len(self.help_title), self.help,
-                              curses.A_DIM)
+            self.put_line(
+                my - 2, (x, self.help_title, curses.A_BOLD),
+                (x + len(self.help_title), self.help, curses.A_DIM),
+            )
             win.refresh()
 
     def safe_add_str(self, y, x, string, *args, **kwargs):
@@ -477,7 +564,9 @@ class CursesMonitor(object):  # pragma: no cover
 
     @property
     def tasks(self):
-        return list(self.state.tasks_by_time(limit=self.limit))
+        # only the tasks visible on the screen are read from the state.
+        return list(self.state.tasks_by_time(limit=self.limit,
+                                             offset=self.offset))
 
     @property
     def workers(self):
@@ -510,7 +599,7 @@ def capture_events(app, state, display):  # pragma: no cover
             try:
                 conn.ensure_connection(on_connection_error,
                                        app.conf.BROKER_CONNECTION_MAX_RETRIES)
-                recv = app.events.Receiver(conn, handlers={'*': state.event})
+                recv = app.events.Receiver(conn, bulk_handler=state.bulk_event)
                 display.resetscreen()
                 display.init_screen()
                 recv.capture()
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.events.recorder
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Record the event stream to a local file, and replay
+    recordings into a :class:`~celery.events.state.State`,
+    camera or any other event handler without a broker.
+
+    Recordings are made of blocks of events, each block
+    starting with a header containing the time of the first and last
+    event in the block, the number of events and the size of the block,
+    so that the recording can be searched by time by only reading
+    the block headers.  The block contents (length-prefixed json
+    encoded events) can optionally be compressed.
+
+"""
+from __future__ import absolute_import, print_function
+
+import anyjson
+import os
+import struct
+import sys
+
+from bisect import bisect_left
+from time import sleep, time
+
+from kombu import compression
+
+from celery.app import app_or_default
+from celery.utils.imports import instantiate
+
+__all__ = ['EventRecorder', 'EventRecording', 'Replay',
+           'evrecord', 'evreplay']
+
+#: Recording file header: magic, version, length of compression type.
+HEADER = struct.Struct('>8sBH')
+MAGIC = b'CELERYEV'
+VERSION = 1
+
+#: Block header: first event time, last event time, count, size.
+BLOCK = struct.Struct('>ddII')
+
+#: Every event in a block is prefixed by its size.
+RECORD = struct.Struct('>I')
+
+
+class InvalidRecording(Exception):
+    """The file is not an event recording."""
+
+
+def event_time(event):
+    """Time an event was received (or sent, if the time it was
+    received is not known)."""
+    return event.get('local_received') or event.get('timestamp') or 0
+
+
+def _read_header(fh):
+    header = fh.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise InvalidRecording('Missing header')
+    magic, version, ctlen = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise InvalidRecording('Not an event recording (or unknown version)')
+    return fh.read(ctlen).decode('ascii') or None
+
+
+class EventRecorder(object):
+    """Writes events to a recording.
+
+    :param filename: Path to the recording file.  New events are
+        appended if the file already exists (using the compression
+        method of the existing recording), after removing any
+        incomplete block at the end of it.
+    :keyword compression: Compress blocks using this method,
+        e.g. ``zlib`` or ``bzip2`` (see :mod:`kombu.compression`).
+    :keyword block_size: Max number of events in a block.
+    :keyword flush_interval: Max number of seconds events are buffered
+        before the block is written (checked when the next event
+        is received).
+
+    The instance can be used as the ``bulk_handler`` of
+    an :class:`~celery.events.EventReceiver` (using :meth:`bulk_event`),
+    or as a handler (using :meth:`event`).  :meth:`close` must be called
+    to write the last block.
+
+    """
+
+    def __init__(self, filename, compression=None, block_size=1000,
+                 flush_interval=1.0):
+        self.filename = filename
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._buffer_start = None
+        self.event_count = 0
+        if os.path.exists(filename) and os.path.getsize(filename):
+            recording = EventRecording(filename)
+            compression = recording.compression
+            # blocks appended after an incomplete block (e.g. if the
+            # recorder was killed) could never be read.
+            end = recording.blocks_end()
+            if os.path.getsize(filename) > end:
+                with open(filename, 'r+b') as fh:
+                    fh.truncate(end)
+        else:
+            with open(filename, 'wb') as fh:
+                ctype = (compression or '').encode('ascii')
+                fh.write(HEADER.pack(MAGIC, VERSION, len(ctype)) + ctype)
+        self.compression = compression
+        self.fh = open(filename, 'ab')
+
+    def event(self, event, now=time):
+        self.bulk_event([event], now=now)
+
+    def bulk_event(self, events, now=time):
+        buf = self._buffer
+        if not buf:
+            self._buffer_start = now()
+        buf.extend(events)
+        self.event_count += len(events)
+        if len(buf) >= self.block_size or (
+                now() - self._buffer_start >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events as a new block."""
+        buf, self._buffer = self._buffer, []
+        for i in range(0, len(buf), self.block_size):
+            self._write_block(buf[i:i + self.block_size])
+        self.fh.flush()
+
+    def _write_block(self, events, dumps=anyjson.dumps):
+        parts = []
+        for event in events:
+            data = dumps(event).encode('utf-8')
+            parts.append(RECORD.pack(len(data)))
+            parts.append(data)
+        body = b''.join(parts)
+        if self.compression:
+            body, _ = compression.compress(body, self.compression)
+        self.fh.write(BLOCK.pack(
+            event_time(events[0]), event_time(events[-1]),
+            len(events), len(body),
+        ) + body)
+
+    def close(self):
+        if self.fh is not None:
+            try:
+                self.flush()
+            finally:
+                self.fh.close()
+                self.fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EventRecording(object):
+    """Reads a recording written by :class:`EventRecorder`.
+
+    :param filename: Path to the recording file.
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fh:
+            self.compression = _read_header(fh)
+            self._data_start = fh.tell()
+
+    def index(self):
+        """Return list of ``(first_time, last_time, count, offset, size)``
+        tuples for the blocks in the recording, ordered by time.
+
+        An incomplete block at the end of the recording
+        (e.g. if the recorder was killed) is ignored.
+
+        """
+        index = []
+        with open(self.filename, 'rb') as fh:
+            fh.seek(0, os.SEEK_END)
+            end = fh.tell()
+            offset = self._data_start
+            while offset + BLOCK.size <= end:
+                fh.seek(offset)
+                first, last, count, size = BLOCK.unpack(fh.read(BLOCK.size))
+                offset += BLOCK.size
+                if offset + size > end:
+                    break
+                index.append((first, last, count, offset, size))
+                offset += size
+        return index
+
+    def blocks_end(self):
+        """Return the offset of the end of the last complete block."""
+        index = self.index()
+        if not index:
+            return self._data_start
+        _, _, _, offset, size = index[-1]
+        return offset + size
+
+    def __len__(self):
+        return sum(block[2] for block in self.index())
+
+    def iterblocks(self, start=None, end=None, loads=anyjson.loads):
+        """Iterate over the events in the recording one block at a time,
+        giving a list of events for every block.
+
+        :keyword start: Skip events received before this time.
+        :keyword end: Stop at events received after this time.
+
+        """
+        index = self.index()
+        first = 0
+        if start is not None:
+            # find the first block not entirely before start.
+            first = bisect_left([block[1] for block in index], start)
+        with open(self.filename, 'rb') as fh:
+            for block_start, _, count, offset, size in index[first:]:
+                if end is not None and block_start > end:
+                    break
+                fh.seek(offset)
+                body = fh.read(size)
+                if self.compression:
+                    body = compression.decompress(body, self.compression)
+                events, pos = [], 0
+                for _ in range(count):
+                    length, = RECORD.unpack_from(body, pos)
+                    pos += RECORD.size
+                    events.append(
+                        loads(body[pos:pos + length].decode('utf-8')),
+                    )
+                    pos += length
+                if start is not None or end is not None:
+                    events = [
+                        event for event in events
+                        if (start is None or event_time(event) >= start) and
+                        (end is None or event_time(event) <= end)
+                    ]
+                if events:
+                    yield events
+
+    def __iter__(self):
+        for events in self.iterblocks():
+            for event in events:
+                yield event
+
+
+class Replay(object):
+    """Feeds the events in a recording to an event handler.
+
+    :param recording: :class:`EventRecording` or path to recording file.
+    :keyword handler: Called with every event
+        (e.g. :meth:`State.event <celery.events.state.State.event>`).
+    :keyword bulk_handler: Called with lists of events
+        (e.g. :meth:`State.bulk_event
+        <celery.events.state.State.bulk_event>`), this is much faster
+        than using ``handler``.
+    :keyword speed: Replay speed relative to the speed the events were
+        recorded at, e.g. ``10.0`` replays events ten times faster than
+        they were received.  If this is :const:`None` the events are
+        replayed as fast as possible.
+
+    """
+
+    def __init__(self, recording, handler=None, bulk_handler=None,
+                 speed=None, sleep=sleep, now=time):
+        if not isinstance(recording, EventRecording):
+            recording = EventRecording(recording)
+        if handler is None and bulk_handler is None:
+            raise ValueError('Replay requires handler or bulk_handler')
+        self.recording = recording
+        self.handler = handler
+        self.bulk_handler = bulk_handler
+        self.speed = speed
+        self.sleep = sleep
+        self.now = now
+
+    def feed(self, events):
+        if self.bulk_handler is not None:
+            self.bulk_handler(events)
+        else:
+            handler = self.handler
+            for event in events:
+                handler(event)
+
+    def run(self, start=None, end=None):
+        """Replay the recording (or the events received between
+        ``start`` and ``end``), returns the number of events replayed."""
+        count, origin = 0, None
+        speed, now, feed = self.speed, self.now, self.feed
+        for events in self.recording.iterblocks(start, end):
+            count += len(events)
+            if not speed:
+                feed(events)
+                continue
+            pending = []
+            for event in events:
+                if origin is None:
+                    origin = event_time(event), now()
+                delay = (origin[1] + (event_time(event) - origin[0]) / speed -
+                         now())
+                if delay > 0:
+                    if pending:
+                        feed(pending)
+                        pending = []
+                    self.sleep(delay)
+                pending.append(event)
+            if pending:
+                feed(pending)
+        return count
+
+
+def evrecord(filename, compression=None, app=None, out=sys.stdout):
+    app = app_or_default(app)
+    recorder = EventRecorder(filename, compression=compression)
+    print('-> evrecord: recording events to {0}...'.format(filename),
+          file=out)
+    conn = app.connection()
+    recv = app.events.Receiver(conn, bulk_handler=recorder.bulk_event)
+    try:
+        try:
+            recv.capture(limit=None)
+        except KeyboardInterrupt:
+            raise SystemExit
+    finally:
+        recorder.close()
+        conn.close()
+        print('-> evrecord: {0} events recorded.'.format(
+            recorder.event_count), file=out)
+
+
+def evreplay(filename, camera=None, freq=1.0, maxrate=None, speed=None,
+             app=None, out=sys.stdout):
+    app = app_or_default(app)
+    state = app.events.State()
+    cam = None
+    if camera:
+        cam = instantiate(camera, state, app=app, freq=freq, maxrate=maxrate)
+        cam.install()
+    print('-> evreplay: replaying {0}...'.format(filename), file=out)
+    time_start = time()
+    try:
+        count = Replay(
+            filename, bulk_handler=state.bulk_event, speed=speed,
+        ).run()
+    finally:
+        if cam is not None:
+            cam.cancel()
+    runtime = time() - time_start
+    print('-> evreplay: {0} events replayed in {1:.2f}s '
+          '({2:.0f} events/s), {3} tasks, {4} workers.'.format(
+              count, runtime, count / (runtime or 1e-9),
+              len(state.tasks), len(state.workers)), file=out)
+    return state
@@ -31,6 +31,11 @@ class Polaroid(object):
     cleanup_signal = Signal()
     clear_after = False
 
+    #: If enabled :meth:`on_changes` is called for every shutter
+    #: with the tasks and workers that changed since the last shutter.
+    #: (see :meth:`celery.events.state.State.take_changes`).
+    incremental = False
+
     _tref = None
     _ctref = None
 
@@ -53,6 +58,9 @@ class Polaroid(object):
     def on_shutter(self, state):
         pass
 
+    def on_changes(self, state, changes):
+        pass
+
     def on_cleanup(self):
         pass
 
@@ -66,6 +74,8 @@ class Polaroid(object):
             logger.debug('Shutter: %s', self.state)
             self.shutter_signal.send(self.state)
             self.on_shutter(self.state)
+            if self.incremental:
+                self.on_changes(self.state, self.state.take_changes())
 
     def capture(self):
         self.state.freeze_while(self.shutter, clear_after=self.clear_after)
@@ -101,7 +111,7 @@ def evcam(camera, freq=1.0, maxrate=None, loglevel=0,
                       maxrate=maxrate, timer=timer)
     cam.install()
     conn = app.connection()
-    recv = app.events.Receiver(conn, handlers={'*': state.event})
+    recv = app.events.Receiver(conn, bulk_handler=state.bulk_event)
     try:
         try:
             recv.capture(limit=None)
@@ -20,7 +20,8 @@ from __future__ import absolute_import
 
 import threading
 
-from heapq import heappush, heappop
+from collections import namedtuple
+from heapq import heappush
 from itertools import islice
 from operator import itemgetter
 from time import time
@@ -29,7 +30,7 @@ from kombu.utils import kwdict
 
 from celery import states
 from celery.datastructures import AttributeDict
-from celery.five import items, values
+from celery.five import OrderedDict, items, values
 from celery.utils.functional import LRUCache
 from celery.utils.log import get_logger
 
@@ -50,6 +51,23 @@ Substantial drift from %s may mean clocks are out of sync.  Current drift is
 logger = get_logger(__name__)
 warn = logger.warning
 
+#: Event types known in advance, used to prebuild the dispatch table
+#: of :class:`State`.  Other types are added to the table when first seen.
+KNOWN_EVENT_TYPES = {
+    'task': ('sent', 'received', 'started', 'succeeded',
+             'failed', 'retried', 'revoked'),
+    'worker': ('online', 'heartbeat', 'offline'),
+}
+
+#: Tasks and workers added, changed and evicted since the last call to
+#: :meth:`State.take_changes`.  The ``new_*`` and ``changed_*`` fields
+#: are dicts of ``uuid -> Task`` and ``hostname -> Worker``, and the
+#: ``evicted_*`` fields are sets of task ids and worker hostnames.
+Changes = namedtuple('Changes', (
+    'new_tasks', 'changed_tasks', 'evicted_tasks',
+    'new_workers', 'changed_workers', 'evicted_workers',
+))
+
 R_STATE = '<State: events={0.event_count} tasks={0.task_count}>'
 R_CLOCK = '_lamport(clock={0}, timestamp={1}, id={2} {3!r})'
 R_WORKER = '<Worker: {0.hostname} ({0.status_string})'
@@ -61,6 +79,7 @@ def heartbeat_expires(timestamp, freq=60,
     return timestamp + freq * (expire_window / 1e2)
 
 
+# not used anymore, but needed to load states pickled by older versions.
 class _lamportinfo(tuple):
     __slots__ = ()
 
@@ -177,9 +196,13 @@ class Worker(AttributeDict):
         return '{0.hostname}.{0.pid}'.format(self)
 
 
-@with_unique_field('uuid')
-class Task(AttributeDict):
-    """Task State."""
+class TaskMixin(object):
+    """Event handlers and helpers shared by the task state classes.
+
+    Subclasses must implement :meth:`_set_fields`.
+
+    """
+    __slots__ = ()
 
     #: How to merge out of order events.
     #: Disorder is detected by logical ordering (e.g. :event:`task-received`
@@ -207,8 +230,8 @@ class Task(AttributeDict):
                      traceback=None, exchange=None, routing_key=None,
                      clock=0)
 
-    def __init__(self, **fields):
-        dict.__init__(self, self._defaults, **fields)
+    def _set_fields(self, fields):
+        raise NotImplementedError('subclass responsibility')
 
     def update(self, state, timestamp, fields):
         """Update state from new event.
@@ -228,14 +251,14 @@ class Task(AttributeDict):
         else:
             self.state = state
             self.timestamp = timestamp
-            super(Task, self).update(fields)
+            self._set_fields(fields)
 
     def merge(self, state, timestamp, fields):
         """Merge with out of order event."""
         keep = self.merge_rules.get(state)
         if keep is not None:
             fields = dict((key, fields.get(key)) for key in keep)
-            super(Task, self).update(fields)
+            self._set_fields(fields)
 
     def on_sent(self, timestamp=None, **fields):
         """Callback for the :event:`task-sent` event."""
@@ -295,11 +318,111 @@ class Task(AttributeDict):
         return self.state in states.READY_STATES
 
 
+@with_unique_field('uuid')
+class Task(TaskMixin, AttributeDict):
+    """Task State."""
+
+    def __init__(self, **fields):
+        dict.__init__(self, self._defaults, **fields)
+
+    def _set_fields(self, fields):
+        dict.update(self, fields)
+
+    def as_dict(self):
+        return dict(self)
+
+
+@with_unique_field('uuid')
+class CompactTask(TaskMixin):
+    """Task State using less memory than :class:`Task`.
+
+    The fields are stored in slots instead of a dictionary,
+    task names, routing keys and exchange names are interned, and
+    the event fields that are already available from the worker
+    (``hostname``, ``pid``, ``utcoffset``) or only used while
+    processing the event (``type``, ``local_received``) are not stored.
+    Other fields unknown to this class are kept in a separate
+    dictionary, created only when needed.
+
+    Used by :class:`CompactState`.
+
+    """
+    _fields = tuple(sorted(TaskMixin._defaults))
+    __slots__ = _fields + ('_extra', )
+
+    #: Values of these fields are interned.
+    _interned_fields = frozenset(['name', 'routing_key', 'exchange'])
+
+    #: Event fields that are not stored.
+    _discarded_fields = frozenset([
+        'hostname', 'pid', 'utcoffset', 'type', 'local_received',
+    ])
+
+    #: Table of interned strings shared by all instances.
+    _interned = {}
+
+    def __init__(self, **fields):
+        for key, value in items(self._defaults):
+            setattr(self, key, value)
+        self._extra = None
+        self._set_fields(fields)
+
+    def _set_fields(self, fields, setattr=setattr):
+        slots, interned = self._defaults, self._interned_fields
+        discarded = self._discarded_fields
+        for key, value in items(fields):
+            if key in slots:
+                if key in interned and value is not None:
+                    value = self._interned.setdefault(value, value)
+                setattr(self, key, value)
+            elif key not in discarded:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+
+    def __getattr__(self, key):
+        # only called for attributes not found the normal way.
+        if key == 'hostname':
+            worker = self.worker
+            return worker.hostname if worker is not None else None
+        try:
+            return object.__getattribute__(self, '_extra')[key]
+        except (TypeError, KeyError, AttributeError):
+            raise AttributeError(key)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        d = dict((key, getattr(self, key)) for key in self._fields)
+        if self._extra:
+            d.update(self._extra)
+        return d
+
+    def __getstate__(self):
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in items(state):
+            setattr(self, key, value)
+
+
 class State(object):
     """Records clusters state."""
+    Worker = Worker
+    Task = Task
     event_count = 0
     task_count = 0
 
+    #: Set when changes are tracked, see :meth:`take_changes`.
+    track_changes = False
+
     def __init__(self, callback=None,
                  workers=None, tasks=None, taskheap=None,
                  max_workers_in_memory=5000, max_tasks_in_memory=10000):
@@ -308,13 +431,22 @@ class State(object):
                         if workers is None else workers)
         self.tasks = (LRUCache(max_tasks_in_memory)
                       if tasks is None else tasks)
-        self._taskheap = [] if taskheap is None else taskheap
+        # taskheap is only accepted for compatibility with states
+        # pickled by older versions, tasks are ordered by the indexes.
         self.max_workers_in_memory = max_workers_in_memory
         self.max_tasks_in_memory = max_tasks_in_memory
-        self._mutex = threading.Lock()
+        # reentrant, as the indexes are also read by snapshot cameras
+        # called with the state frozen (see freeze_while).
+        self._mutex = threading.RLock()
         self.handlers = {'task': self.task_event,
                          'worker': self.worker_event}
         self._get_handler = self.handlers.__getitem__
+        self._event_types = dict(
+            ('-'.join([group, subject]), (group, subject))
+            for group, subjects in items(KNOWN_EVENT_TYPES)
+            for subject in subjects
+        )
+        self._rebuild_index()
 
     def freeze_while(self, fun, *args, **kwargs):
         clear_after = kwargs.pop('clear_after', False)
@@ -338,7 +470,7 @@ class State(object):
             self.tasks.update(in_progress)
         else:
             self.tasks.clear()
-        self._taskheap[:] = []
+        self._rebuild_index()
 
     def _clear(self, ready=True):
         self.workers.clear()
@@ -360,7 +492,16 @@ class State(object):
             worker.update(kwargs)
             return worker, False
         except KeyError:
-            worker = self.workers[hostname] = Worker(
+            if self.track_changes:
+                limit = getattr(self.workers, 'limit', None)
+                if limit and len(self.workers) >= limit:
+                    # the least recently used worker is evicted.
+                    self._evicted(next(iter(self.workers)),
+                                  self._new_workers, self._changed_workers,
+                                  self._evicted_workers)
+                self._new_workers.add(hostname)
+                self._evicted_workers.discard(hostname)
+            worker = self.workers[hostname] = self.Worker(
                 hostname=hostname, **kwargs)
             return worker, True
 
@@ -369,9 +510,141 @@ class State(object):
         try:
             return self.tasks[uuid], True
         except KeyError:
-            task = self.tasks[uuid] = Task(uuid=uuid)
+            task = self.tasks[uuid] = self.Task(uuid=uuid)
+            by_time = self._tasks_by_time
+            by_time[uuid] = task
+            if len(by_time) > len(self.tasks):
+                self._prune_index()
+            self._limit_index()
+            if self.track_changes:
+                self._new_tasks.add(uuid)
+                self._evicted_tasks.discard(uuid)
             return task, False
 
+    def take_changes(self):
+        """Get the tasks and workers added, changed and evicted
+        (from :attr:`tasks`/:attr:`workers` because of the size limits)
+        since the last call, returns :class:`Changes`.
+
+        Change tracking is enabled by the first call, which returns
+        all tasks and workers as new.  Tasks and workers removed
+        by :meth:`clear` or :meth:`clear_tasks` are not included
+        in the evicted sets.
+
+        The state should be frozen (see :meth:`freeze_while`) while
+        calling this, as is the case in :meth:`Polaroid.shutter
+        <celery.events.snapshot.Polaroid.shutter>`.
+
+        """
+        by_time = self._tasks_by_time
+        workers = dict(items(self.workers))
+        if not self.track_changes:
+            self.track_changes = True
+            changes = Changes(dict(by_time), {}, set(), workers, {}, set())
+        else:
+            changes = Changes(
+                _select(by_time, self._new_tasks),
+                _select(by_time, self._changed_tasks),
+                self._evicted_tasks,
+                _select(workers, self._new_workers),
+                _select(workers, self._changed_workers),
+                self._evicted_workers,
+            )
+        self._new_tasks, self._changed_tasks = set(), set()
+        self._evicted_tasks = set()
+        self._new_workers, self._changed_workers = set(), set()
+        self._evicted_workers = set()
+        return changes
+
+    def _changed(self, key, new, changed):
+        if key not in new:
+            changed.add(key)
+
+    def _evicted(self, key, new, changed, evicted):
+        if key in new:
+            # never seen by the consumer of the changes.
+            new.discard(key)
+        else:
+            changed.discard(key)
+            evicted.add(key)
+
+    def _rebuild_index(self):
+        # Tasks ordered by the time of the last event received,
+        # for all tasks and by task name/worker hostname.
+        self._tasks_by_time = OrderedDict()
+        self._tasks_by_type = {}
+        self._tasks_by_worker = {}
+        for uuid, task in items(self.tasks):
+            worker = task.worker
+            self._index_task(uuid, task, None,
+                             worker.hostname if worker else None)
+
+    def _index_task(self, uuid, task, prev_name, prev_hostname):
+        """Move task to the end of the indexes, also moving it
+        to a new name/hostname if these changed."""
+        worker = task.worker
+        for index, prev, key in (
+                (self._tasks_by_type, prev_name, task.name),
+                (self._tasks_by_worker, prev_hostname,
+                 worker.hostname if worker else None)):
+            if prev is not None and prev != key:
+                self._unindex(index, prev, uuid)
+            if key is not None:
+                try:
+                    bucket = index[key]
+                except KeyError:
+                    bucket = index[key] = OrderedDict()
+                bucket.pop(uuid, None)
+                bucket[uuid] = task
+        self._tasks_by_time.pop(uuid, None)
+        self._tasks_by_time[uuid] = task
+
+    def _unindex(self, index, key, uuid):
+        try:
+            bucket = index[key]
+        except KeyError:
+            pass
+        else:
+            bucket.pop(uuid, None)
+            if not bucket:
+                index.pop(key, None)
+
+    def _prune_index(self):
+        """Remove tasks evicted from :attr:`tasks` from the indexes."""
+        by_time, tasks = self._tasks_by_time, self.tasks
+        excess = len(by_time) - len(tasks)
+        # evicted tasks are usually the oldest in the index,
+        # unless tasks have been accessed out of band.
+        evicted = []
+        for uuid in by_time:
+            if uuid not in tasks:
+                evicted.append(uuid)
+                if len(evicted) >= excess:
+                    break
+        for uuid in evicted:
+            self._drop_indexed(uuid)
+
+    def _limit_index(self):
+        """Evict the oldest tasks if there are more than
+        :attr:`max_tasks_in_memory`, which may have been lowered
+        after :attr:`tasks` was created."""
+        by_time, limit = self._tasks_by_time, self.max_tasks_in_memory
+        if limit:
+            while len(by_time) > limit:
+                uuid = next(iter(by_time))
+                self.tasks.pop(uuid, None)
+                self._drop_indexed(uuid)
+
+    def _drop_indexed(self, uuid):
+        task = self._tasks_by_time.pop(uuid)
+        if self.track_changes:
+            self._evicted(uuid, self._new_tasks, self._changed_tasks,
+                          self._evicted_tasks)
+        worker = task.worker
+        self._unindex(self._tasks_by_type, task.name, uuid)
+        if worker is not None:
+            self._unindex(self._tasks_by_worker, worker.hostname, uuid)
+
     def worker_event(self, type, fields):
         """Process worker event."""
         try:
@@ -383,6 +656,9 @@ class State(object):
             handler = getattr(worker, 'on_' + type, None)
             if handler:
                 handler(**fields)
+            if self.track_changes:
+                self._changed(hostname, self._new_workers,
+                              self._changed_workers)
             return worker, created
 
     def task_event(self, type, fields):
@@ -391,15 +667,8 @@ class State(object):
         hostname = fields['hostname']
         worker, _ = self.get_or_create_worker(hostname)
         task, created = self.get_or_create_task(uuid)
+        prev_worker, prev_name = task.worker, task.name
         task.worker = worker
-        maxtasks = self.max_tasks_in_memory * 2
-
-        taskheap = self._taskheap
-        timestamp = fields.get('timestamp') or 0
-        clock = 0 if type == 'sent' else fields.get('clock')
-        heappush(taskheap, _lamportinfo(clock, timestamp, worker.id, task))
-        if len(taskheap) > maxtasks:
-            heappop(taskheap)
 
         handler = getattr(task, 'on_' + type, None)
         if type == 'received':
@@ -408,16 +677,39 @@ class State(object):
             handler(**fields)
         else:
             task.on_unknown_event(type, **fields)
+        self._index_task(uuid, task, prev_name,
+                         prev_worker.hostname if prev_worker else None)
+        if self.track_changes:
+            self._changed(uuid, self._new_tasks, self._changed_tasks)
         return created
 
     def event(self, event):
         with self._mutex:
             return self._dispatch_event(event)
 
+    def bulk_event(self, events):
+        """Process a list of events.
+
+        The lock is only taken once for the whole batch, and several
+        events for the same task in the batch are coalesced so that
+        the task is looked up and indexed only once.
+
+        """
+        with self._mutex:
+            return self._dispatch_bulk(events)
+
+    def _event_type(self, type):
+        try:
+            return self._event_types[type]
+        except KeyError:
+            group, _, subject = type.partition('-')
+            ret = self._event_types[type] = (group, subject)
+            return ret
+
     def _dispatch_event(self, event, kwdict=kwdict):
         self.event_count += 1
         event = kwdict(event)
-        group, _, subject = event['type'].partition('-')
+        group, subject = self._event_type(event['type'])
         try:
             self._get_handler(group)(subject, event)
         except KeyError:
@@ -425,21 +717,95 @@ class State(object):
         if self.event_callback:
             self.event_callback(self, event)
 
+    def _dispatch_bulk(self, events, kwdict=kwdict):
+        callback, handlers = self.event_callback, self.handlers
+        event_type, task_event = self._event_type, self._bulk_task_event
+        coalesce = handlers.get('task') == self.task_event
+        pending = OrderedDict()
+        for event in events:
+            self.event_count += 1
+            event = kwdict(event)
+            group, subject = event_type(event['type'])
+            if coalesce and group == 'task':
+                task_event(subject, event, pending)
+            else:
+                try:
+                    handlers[group](subject, event)
+                except KeyError:
+                    pass
+            if callback:
+                callback(self, event)
+        self._flush_pending(pending)
+
+    def _bulk_task_event(self, type, fields, pending):
+        # like task_event, but the indexes are updated
+        # by _flush_pending, once for every task in the batch.
+        uuid = fields['uuid']
+        hostname = fields['hostname']
+        try:
+            p = pending.pop(uuid)
+        except KeyError:
+            task, _ = self.get_or_create_task(uuid)
+            worker = task.worker
+            p = [task, task.name, worker.hostname if worker else None]
+        pending[uuid] = p
+        task = p[0]
+        worker = task.worker
+        if worker is None or worker.hostname != hostname:
+            worker, _ = self.get_or_create_worker(hostname)
+            task.worker = worker
+
+        handler = getattr(task, 'on_' + type, None)
+        if type == 'received':
+            self.task_count += 1
+        if handler:
+            handler(**fields)
+        else:
+            task.on_unknown_event(type, **fields)
+
+    def _flush_pending(self, pending):
+        tasks = self.tasks
+        for uuid, (task, prev_name, prev_hostname) in items(pending):
+            if uuid not in tasks:
+                # evicted by a later task in the same batch.
+                self._unindex(self._tasks_by_type, prev_name, uuid)
+                self._unindex(self._tasks_by_worker, prev_hostname, uuid)
+                continue
+            self._index_task(uuid, task, prev_name, prev_hostname)
+            if self.track_changes:
+                self._changed(uuid, self._new_tasks, self._changed_tasks)
+
     def itertasks(self, limit=None):
         for index, row in enumerate(items(self.tasks)):
             yield row
             if limit and index + 1 >= limit:
                 break
 
-    def tasks_by_time(self, limit=None):
+    def _iter_index(self, index, limit=None, offset=0):
+        # the keys are copied while holding the lock, so that the index
+        # can be changed by the event thread while the result is consumed.
+        if not index:
+            return
+        stop = offset + limit if limit else None
+        with self._mutex:
+            uuids = list(islice(reversed(index), offset, stop))
+        for uuid in uuids:
+            task = index.get(uuid)
+            if task is not None:
+                yield uuid, task
+
+    def tasks_by_time(self, limit=None, offset=0):
         """Generator giving tasks ordered by time,
-        in ``(uuid, Task)`` tuples."""
-        seen = set()
-        for evtup in islice(reversed(self._taskheap), 0, limit):
-            uuid = evtup[3].uuid
-            if uuid not in seen:
-                yield uuid, evtup[3]
-                seen.add(uuid)
+        in ``(uuid, Task)`` tuples.
+
+        The tasks that most recently received an event are
+        returned first, skipping the first ``offset`` tasks.
+
+        The order is the order the events were received in,
+        events are not reordered by their logical clock or timestamp.
+
+        """
+        return self._iter_index(self._tasks_by_time, limit, offset)
     tasks_by_timestamp = tasks_by_time
 
     def tasks_by_type(self, name, limit=None):
@@ -448,25 +814,17 @@ class State(object):
         Returns a list of ``(uuid, Task)`` tuples.
 
         """
-        return islice(
-            ((uuid, task) for uuid, task in self.tasks_by_time()
-             if task.name == name),
-            0, limit,
-        )
+        return self._iter_index(self._tasks_by_type.get(name), limit)
 
     def tasks_by_worker(self, hostname, limit=None):
         """Get all tasks by worker.
 
         """
-        return islice(
-            ((uuid, task) for uuid, task in self.tasks_by_time()
-             if task.worker.hostname == hostname),
-            0, limit,
-        )
+        return self._iter_index(self._tasks_by_worker.get(hostname), limit)
 
     def task_types(self):
         """Returns a list of all seen task types."""
-        return list(sorted(set(task.name for task in values(self.tasks))))
+        return sorted(self._tasks_by_type)
 
     def alive_workers(self):
         """Returns a list of (seemingly) alive workers."""
@@ -477,8 +835,18 @@ class State(object):
 
     def __reduce__(self):
         return self.__class__, (
-            self.event_callback, self.workers, self.tasks, self._taskheap,
+            self.event_callback, self.workers, self.tasks, None,
             self.max_workers_in_memory, self.max_tasks_in_memory,
         )
 
+
+def _select(d, keys):
+    return dict((key, d[key]) for key in keys if key in d)
+
+
+class CompactState(State):
+    """Records clusters state, using :class:`CompactTask` to
+    store the tasks using less memory."""
+    Task = CompactTask
+
 state = State()
@@ -22,6 +22,7 @@ import sys
 from warnings import warn
 
 from billiard.einfo import ExceptionInfo
+from kombu.serialization import loads
 from kombu.utils import kwdict
 
 from celery import current_app
@@ -286,6 +287,22 @@ def _trace_task_ret(name, uuid, args, kwargs, request={}, **opts):
 trace_task_ret = _trace_task_ret
 
 
+def trace_task_message(name, uuid, payload, request={}):
+    """Like :func:`trace_task_ret`, but the task arguments are decoded
+    from ``payload``, the ``(body, content_type, content_encoding)``
+    tuple of the original task message."""
+    try:
+        body = loads(*payload)
+        args, kwargs = body.get('args') or [], body.get('kwargs') or {}
+        kwargs.items
+    except Exception as exc:
+        return report_internal_error(current_app.tasks[name], exc)
+    # the fields in the request sent by the worker take precedence.
+    request = dict(body, **request)
+    request['group'] = request.get('taskset')
+    return trace_task_ret(name, uuid, args, kwargs, request)
+
+
 def _fast_trace_task(task, uuid, args, kwargs, request={}):
     # setup_worker_optimizations will point trace_task_ret to here,
     # so this is the function used in the worker.
@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from kombu import Exchange, Queue
 from mock import Mock
 
-from celery.app.amqp import Queues, TaskPublisher
+from celery.app.amqp import ENVELOPE_HEADER, Queues, TaskPublisher
 from celery.tests.case import AppCase
 
 
@@ -47,6 +47,60 @@ class test_TaskProducer(AppCase):
         self.assertEqual(prod.publish.call_args[1]['exchange'], 'yyy')
         self.assertEqual(prod.publish.call_args[1]['routing_key'], 'zzz')
 
+    def test_publish_envelope_headers(self):
+        prod = self.app.amqp.TaskProducer(Mock())
+        prod.channel.connection.client.declared_entities = set()
+        prod.publish = Mock()
+        prod.publish_task('tasks.add', (2, 2), {}, retry=False,
+                          headers={'task': 'custom'})
+        headers = prod.publish.call_args[1]['headers']
+        self.assertEqual(headers, {'task': 'custom'})
+
+        prod.envelope_headers = True
+        task_id = prod.publish_task('tasks.add', (2, 2), {}, retry=False,
+                                    headers={'task': 'custom'})
+        headers = prod.publish.call_args[1]['headers']
+        self.assertEqual(headers['task'], 'custom')
+        self.assertDictEqual(headers[ENVELOPE_HEADER], {
+            'task': 'tasks.add', 'id': task_id, 'retries': 0,
+            'utc': prod.utc,
+        })
+        prod.publish_task('tasks.add', (2, 2), {}, retry=False,
+                          countdown=10, expires=10, timeout=30)
+        envelope = prod.publish.call_args[1]['headers'][ENVELOPE_HEADER]
+        self.assertTrue(envelope['eta'])
+        self.assertTrue(envelope['expires'])
+        self.assertEqual(envelope['timeouts'], (30, None))
+
+    def test_sent_event_repr_maxlen(self):
+        prod = self.app.amqp.TaskProducer(Mock())
+        prod.channel.connection.client.declared_entities = set()
+        prod.publish = Mock()
+        prod.send_sent_event = True
+        evd = Mock()
+        prod.repr_maxlen = 5
+        prod.publish_task('tasks.add', ('x' * 100, ), {}, retry=False,
+                          event_dispatcher=evd)
+        fields = evd.publish.call_args[0][1]
+        self.assertEqual(fields['args'], "('xxx...")
+        prod.repr_maxlen = 0
+        prod.publish_task('tasks.add', ('x' * 100, ), {}, retry=False,
+                          event_dispatcher=evd)
+        fields = evd.publish.call_args[0][1]
+        self.assertNotIn('args', fields)
+        self.assertNotIn('kwargs', fields)
+        # the task's limit is used if set.
+        prod.repr_maxlen = None
+        prod.publish_task('tasks.add', ('x' * 100, ), {}, retry=False,
+                          event_dispatcher=evd, repr_maxlen=0)
+        fields = evd.publish.call_args[0][1]
+        self.assertNotIn('args', fields)
+        prod.repr_maxlen = 0
+        prod.publish_task('tasks.add', ('x' * 100, ), {}, retry=False,
+                          event_dispatcher=evd, repr_maxlen=5)
+        fields = evd.publish.call_args[0][1]
+        self.assertEqual(fields['args'], "('xxx...")
+
     def test_event_dispatcher(self):
         prod = self.app.amqp.TaskProducer(Mock())
         self.assertTrue(prod.event_dispatcher)
@@ -57,6 +57,22 @@ class test_events(Case):
         self.assertEqual(kw['logfile'], 'logfile')
         self.assertIn('celery events:cam', proctitle.last[0])
 
+    @mpatch('celery.events.recorder.evrecord')
+    @mpatch('celery.bin.events.set_process_title')
+    def test_run_record(self, set_process_title, evrecord):
+        self.ev.run(record='events.rec', compression='zlib')
+        evrecord.assert_called_with('events.rec', compression='zlib',
+                                    app=self.app)
+
+    @mpatch('celery.events.recorder.evreplay')
+    @mpatch('celery.bin.events.set_process_title')
+    def test_run_replay(self, set_process_title, evreplay):
+        self.ev.run(replay='events.rec', camera='foo.Cam', speed=10.0)
+        evreplay.assert_called_with(
+            'events.rec', app=self.app, camera='foo.Cam', freq=1.0,
+            maxrate=None, speed=10.0,
+        )
+
     @mpatch('celery.events.snapshot.evcam')
     @mpatch('celery.bin.events.detached')
     def test_run_cam_detached(self, detached, evcam):
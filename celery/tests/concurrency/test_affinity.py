@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+from mock import patch
+
+from celery.concurrency.affinity import Placement, Topology, parse_cpulist
+from celery.tests.case import Case
+
+
+def write(root, path, data):
+    path = os.path.join(root, path)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fh:
+        fh.write(data + '\n')
+
+
+class SysfsCase(Case):
+    # two NUMA nodes with two cores each, every core having two threads:
+    # cpu0 and cpu2 are siblings, cpu1 and cpu3, and so on.
+    cpus = set(range(8))
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for cpu in self.cpus:
+            topology = 'cpu/cpu{0}/topology/'.format(cpu)
+            write(self.root, topology + 'physical_package_id',
+                  str(cpu // 4))
+            write(self.root, topology + 'core_id', str(cpu % 2))
+        write(self.root, 'node/node0/cpulist', '0-3')
+        write(self.root, 'node/node1/cpulist', '4-7')
+        self.topology = Topology(self.cpus, root=self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def placement(self, policy, reserved=0):
+        return Placement(policy, reserved, self.cpus, self.topology)
+
+
+class test_Topology(SysfsCase):
+
+    def test_parse_cpulist(self):
+        self.assertSetEqual(parse_cpulist('0-3,8,10-11\n'),
+                            set([0, 1, 2, 3, 8, 10, 11]))
+        self.assertSetEqual(parse_cpulist(''), set())
+
+    def test_nodes(self):
+        self.assertDictEqual(self.topology.nodes(),
+                             {0: set([0, 1, 2, 3]), 1: set([4, 5, 6, 7])})
+
+    def test_by_core(self):
+        self.assertListEqual(self.topology.by_core(),
+                             [0, 1, 4, 5, 2, 3, 6, 7])
+
+    def test_core_groups(self):
+        self.assertListEqual(self.topology.core_groups(),
+                             [[0, 2], [1, 3], [4, 6], [5, 7]])
+
+    def test_by_node(self):
+        self.assertListEqual(self.topology.by_node(),
+                             [set([0, 1, 2, 3]), set([4, 5, 6, 7])])
+
+    def test_unknown_topology(self):
+        topology = Topology(set([0, 1, 2]),
+                            root=os.path.join(self.root, 'missing'))
+        self.assertListEqual(topology.by_core(), [0, 1, 2])
+        self.assertListEqual(topology.by_node(), [set([0, 1, 2])])
+
+
+class test_Placement(SysfsCase):
+
+    def test_round_robin(self):
+        p = self.placement('round-robin')
+        self.assertIsNone(p.parent)
+        self.assertSetEqual(p.for_process(0), set([0]))
+        self.assertSetEqual(p.for_process(3), set([3]))
+        self.assertSetEqual(p.for_process(9), set([1]))
+
+    def test_cores(self):
+        # whole cores are reserved, including the siblings.
+        p = self.placement('cores', reserved=1)
+        self.assertSetEqual(p.parent, set([0, 2]))
+        self.assertListEqual([p.for_process(i) for i in range(4)],
+                             [set([1]), set([4]), set([5]), set([3])])
+        p = self.placement('cores', reserved=3)
+        self.assertSetEqual(p.parent, set([0, 1, 2, 3]))
+        self.assertListEqual([p.for_process(i) for i in range(4)],
+                             [set([4]), set([5]), set([6]), set([7])])
+
+    def test_numa(self):
+        p = self.placement('numa', reserved=1)
+        self.assertSetEqual(p.for_process(0), set([1, 2, 3]))
+        self.assertSetEqual(p.for_process(1), set([4, 5, 6, 7]))
+        self.assertSetEqual(p.for_process(2), set([1, 2, 3]))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.placement('foo')
+        with self.assertRaises(ValueError):
+            self.placement('cores', reserved=8)
+        with self.assertRaises(ValueError):
+            self.placement('cores', reserved=7)
+
+    @patch('celery.concurrency.affinity.set_affinity')
+    def test_apply(self, set_affinity):
+        p = self.placement('round-robin', reserved=2)
+        p.apply_parent()
+        set_affinity.assert_called_with(set([0, 1]), 0)
+        p = self.placement('cores', reserved=2)
+        p.apply_parent()
+        set_affinity.assert_called_with(set([0, 2]), 0)
+        p.apply(1234, 1)
+        set_affinity.assert_called_with(set([4]), 1234)
+
+        set_affinity.side_effect = OSError()
+        with patch('celery.concurrency.affinity.warning') as warning:
+            p.apply(1234, 1)
+            self.assertTrue(warning.called)
+
+    @patch('celery.concurrency.affinity.set_affinity')
+    def test_apply_parent_not_reserved(self, set_affinity):
+        self.placement('cores').apply_parent()
+        self.assertFalse(set_affinity.called)
+
+    def test_info(self):
+        info = self.placement('cores', reserved=1).info([(10, 0), (11, 1)])
+        self.assertDictEqual(info, {
+            'policy': 'cores',
+            'parent': [0, 2],
+            'processes': {10: [1], 11: [4]},
+        })
@@ -9,6 +9,7 @@ from itertools import cycle
 from mock import Mock, call, patch
 from nose import SkipTest
 
+from celery.concurrency.shm import SharedInt
 from celery.five import items, range
 from celery.utils.functional import noop
 from celery.tests.case import AppCase
@@ -56,6 +57,7 @@ class MockResult(object):
 
 
 class MockPool(object):
+    Worker = Mock(name='Worker')
     started = False
     closed = False
     joined = False
@@ -69,6 +71,9 @@ class MockPool(object):
         self.maintain_pool = Mock()
         self._state = mp.RUN
         self._processes = kwargs.get('processes')
+        self.spawner = kwargs.get('spawner')
+        self.max_memory_per_child = kwargs.get('max_memory_per_child')
+        self.placement = kwargs.get('placement')
         self._pool = [Object(pid=i, inqW_fd=1, outqR_fd=2)
                       for i in range(self._processes)]
         self._current_proc = cycle(range(self._processes))
@@ -216,6 +221,42 @@ class test_AsynPool(PoolCase):
         w.on_loop_start(1234)
         w.outq.put.assert_called_with((mp.WORKER_UP, (1234, )))
 
+    def test_ring_message(self):
+        queue = Mock()
+        queue._ring.read.return_value = 'message'
+        self.assertIsNone(mp.ring_message(queue, None))
+        self.assertTupleEqual(
+            mp.ring_message(queue, (mp.WORKER_UP, (1234, ))),
+            (mp.WORKER_UP, (1234, )),
+        )
+        self.assertEqual(mp.ring_message(queue, (mp.RING, (0, 10))),
+                         'message')
+        queue._ring.read.assert_called_with(0, 10)
+
+    def test_Worker_ring_receive(self):
+        w = mp.Worker(Mock(), Mock())
+        w.inq._ring.read.return_value = 'job'
+        receive = Mock(return_value=(mp.RING, (10, 20)))
+        self.assertEqual(w._make_ring_receive(receive)(), 'job')
+        w.inq._ring.read.assert_called_with(10, 20)
+        receive.return_value = None
+        self.assertIsNone(w._make_ring_receive(receive)())
+
+    def test_Worker_ring_put(self):
+        w = mp.Worker(Mock(), Mock())
+        outq = w.outq
+        put = w._make_ring_put(outq, dumps=lambda obj, protocol: obj)
+        outq._ring.write.return_value = (0, mp.RING_MIN_SIZE)
+        put('x' * mp.RING_MIN_SIZE)
+        outq._writer.send.assert_called_with(
+            (mp.RING, (0, mp.RING_MIN_SIZE)),
+        )
+        put('small')
+        outq._writer.send_bytes.assert_called_with('small')
+        outq._ring.write.return_value = None
+        put('y' * mp.RING_MIN_SIZE)
+        outq._writer.send_bytes.assert_called_with('y' * mp.RING_MIN_SIZE)
+
 
 class test_ResultHandler(PoolCase):
 
@@ -317,6 +358,94 @@ class test_TaskPool(PoolCase):
         pool.start()
         self.assertEqual(pool.num_processes, 7)
 
+    @patch('celery.concurrency.processes.Spawner')
+    def test_start_with_spawner(self, Spawner):
+        pool = TaskPool(10, threads=False, spawner=True,
+                        initargs=(self.app, 'w1'))
+        pool.start()
+        Worker, template_init, init, initargs = Spawner.call_args[0]
+        self.assertIs(Worker.func, MockPool.Worker)
+        self.assertIs(Worker.keywords['max_memory_per_child'],
+                      pool.max_memory_per_child)
+        self.assertIs(template_init, mp.process_template_initializer)
+        self.assertIs(init, mp.process_spawned_initializer)
+        self.assertTupleEqual(initargs, (self.app, 'w1'))
+        self.assertIs(pool._pool.spawner, Spawner())
+
+    @patch('celery.concurrency.processes.Placement')
+    def test_cpu_affinity(self, Placement):
+        pool = TaskPool(10, threads=False, cpu_affinity='cores',
+                        reserved_cpus=2)
+        # the main process is pinned after the pool is started.
+        Placement().apply_parent.side_effect = lambda: self.assertIsNotNone(
+            pool._pool,
+        )
+        pool.start()
+        Placement.assert_called_with('cores', 2)
+        Placement().apply_parent.assert_called_with()
+        self.assertIs(pool._pool.placement, Placement())
+        self.assertIs(pool.placement, Placement())
+
+    @patch('celery.concurrency.processes.Placement')
+    def test_cpu_affinity_not_supported(self, Placement):
+        Placement.side_effect = NotImplementedError()
+        pool = TaskPool(10, threads=False, cpu_affinity='cores')
+        with patch('celery.concurrency.processes.warning') as warning:
+            pool.start()
+            self.assertTrue(warning.called)
+        self.assertIsNone(pool._pool.placement)
+
+    def test_max_memory_per_child(self):
+        pool = TaskPool(10, threads=False, max_memory_per_child=1000)
+        pool.start()
+        limit = pool._pool.max_memory_per_child
+        self.assertIs(limit, pool.max_memory_per_child)
+        self.assertEqual(limit.value, 1000)
+        pool.set_max_memory_per_child(2000)
+        self.assertEqual(limit.value, 2000)
+        pool.set_max_memory_per_child(None)
+        self.assertEqual(limit.value, 0)
+        pool.set_max_memory_per_child('3000')
+        self.assertEqual(limit.value, 3000)
+
+        with self.assertRaises(ValueError):
+            TaskPool(10).set_max_memory_per_child(1000)
+
+    def test_memory_limit(self):
+        self.assertEqual(mp.memory_limit(None), 0)
+        self.assertEqual(mp.memory_limit('1000'), 1000)
+        self.assertEqual(mp.memory_limit(2000), 2000)
+        with self.assertRaises(ValueError):
+            mp.memory_limit('1GB')
+        with self.assertRaises(ValueError):
+            mp.memory_limit(object())
+        with self.assertRaises(ValueError):
+            mp.memory_limit(-1)
+
+    @patch('celery.concurrency.processes.rss')
+    @patch('celery.concurrency.processes.warning')
+    def test_max_memory_per_child_below_parent(self, warning, rss):
+        rss.return_value = 5000
+        pool = TaskPool(10, threads=False, max_memory_per_child=1000)
+        pool.start()
+        self.assertTrue(warning.called)
+        warning.reset_mock()
+        pool.set_max_memory_per_child(10000)
+        self.assertFalse(warning.called)
+
+    @patch('celery.concurrency.processes.Spawner')
+    def test_start_with_spawner_disabled(self, Spawner):
+        # pool restarts must fork from the worker, to reimport modules.
+        pool = TaskPool(10, threads=False, spawner=True, allow_restart=True)
+        pool.start()
+        self.assertIsNone(pool._pool.spawner)
+        # pool processes are not forked when using execv.
+        pool = TaskPool(10, threads=False, spawner=True,
+                        forking_enable=False)
+        pool.start()
+        self.assertIsNone(pool._pool.spawner)
+        self.assertFalse(Spawner.called)
+
     def test_restart(self):
         raise SkipTest('functional test')
 
@@ -330,3 +459,57 @@ class test_TaskPool(PoolCase):
         tp.restart()
         time.sleep(0.5)
         self.assertEqual(pids, get_pids(tp))
+
+
+class test_Worker(PoolCase):
+
+    def memory_check(self, limit, receive):
+
+        class Worker(mp.Worker):
+
+            def __init__(self, limit):
+                self.max_memory_per_child = SharedInt(limit)
+        return Worker(limit)._make_memory_check(receive)
+
+    @patch('celery.concurrency.processes.rss')
+    def test_memory_check(self, rss):
+        rss.return_value = 2000
+        receive = Mock(return_value=None)
+        wait_for_job = self.memory_check(1000, receive)
+        # does not exit before executing a job.
+        self.assertIsNone(wait_for_job())
+        receive.return_value = ('TASK', ())
+        self.assertTupleEqual(wait_for_job(), ('TASK', ()))
+        with self.assertRaises(SystemExit) as cm:
+            wait_for_job()
+        self.assertEqual(cm.exception.code, mp.EX_RECYCLE)
+
+    @patch('celery.concurrency.processes.rss')
+    def test_memory_check_below_limit(self, rss):
+        rss.return_value = 500
+        receive = Mock(return_value=('TASK', ()))
+        wait_for_job = self.memory_check(1000, receive)
+        wait_for_job()
+        wait_for_job()
+        self.assertEqual(receive.call_count, 2)
+
+    @patch('celery.concurrency.processes.rss')
+    def test_memory_check_disabled(self, rss):
+        receive = Mock(return_value=('TASK', ()))
+        wait_for_job = self.memory_check(0, receive)
+        wait_for_job()
+        wait_for_job()
+        self.assertFalse(rss.called)
+
+    def test_maxrss(self):
+        self.assertGreater(mp.maxrss(), 0)
+
+    def test_rss(self):
+        self.assertGreater(mp.rss(), 0)
+
+    @patch('celery.concurrency.processes.maxrss')
+    @patch.dict('sys.modules', {'psutil': None})
+    @patch('celery.concurrency.processes.PROC_STATM', '/nonexistent')
+    def test_rss_fallback(self, maxrss):
+        maxrss.return_value = 313
+        self.assertEqual(mp.rss(), 313)
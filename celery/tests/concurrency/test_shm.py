@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+
+import os
+import pickle
+
+from celery.concurrency.shm import RingBuffer, SharedInt
+from celery.tests.case import Case
+
+
+class test_RingBuffer(Case):
+
+    def setUp(self):
+        self.ring = RingBuffer(100)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_write_read(self):
+        data = pickle.dumps({'foo': 'bar'})
+        position = self.ring.write(data)
+        self.assertTupleEqual(position, (0, len(data)))
+        self.assertDictEqual(self.ring.read(*position), {'foo': 'bar'})
+
+    def test_too_large(self):
+        self.assertIsNone(self.ring.write(b'x' * 101))
+
+    def test_full(self):
+        ring = self.ring
+        p1 = ring.write(b'a' * 40)
+        p2 = ring.write(b'b' * 40)
+        self.assertIsNone(ring.write(b'c' * 40))
+        self.assertEqual(ring.read(*p1, loads=bytes), b'a' * 40)
+        # does not fit at the end, so is written at the start.
+        p3 = ring.write(b'c' * 40)
+        self.assertTupleEqual(p3, (100, 40))
+        self.assertEqual(ring.read(*p2, loads=bytes), b'b' * 40)
+        self.assertEqual(ring.read(*p3, loads=bytes), b'c' * 40)
+        self.assertTupleEqual(ring.write(b'd' * 60), (140, 60))
+
+
+class test_SharedInt(Case):
+
+    def test_value(self):
+        value = SharedInt(10)
+        self.assertEqual(value.value, 10)
+        value.value = -3
+        self.assertEqual(value.value, -3)
+        self.assertIn('-3', repr(value))
+
+    def test_shared_with_child(self):
+        value = SharedInt()
+        pid = os.fork()
+        if not pid:  # pragma: no cover
+            value.value = 42
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(value.value, 42)
+
+    def test_pickle_copies(self):
+        value = SharedInt(10)
+        copy = pickle.loads(pickle.dumps(value))
+        self.assertEqual(copy.value, 10)
+        copy.value = 20
+        self.assertEqual(value.value, 10)
@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+
+import os
+import signal
+
+from mock import Mock
+
+from billiard.queues import SimpleQueue
+
+from celery.concurrency.spawner import Spawner, SpawnedPopen
+from celery.tests.case import Case
+
+
+class Worker(object):
+
+    def __init__(self, inq, outq, synq, initializer, initargs, maxtasks,
+                 sigprotection=False):
+        self.inq, self.outq = inq, outq
+        self.initializer, self.initargs = initializer, initargs
+
+    def _bootstrap(self):
+        if self.initializer is not None:
+            self.initializer(*self.initargs)
+        self.outq.put((os.getpid(), os.getppid(), self.inq.get()))
+        return 3
+
+
+def process(inq, outq):
+    p = Mock(inq=inq, outq=outq, synq=None, maxtasks=None,
+             sigprotection=False, index=0)
+    p.name = 'PoolWorker-1'
+    return p
+
+
+class test_Spawner(Case):
+
+    def setUp(self):
+        self.spawner = Spawner(Worker)
+        self.spawner.start()
+
+    def tearDown(self):
+        self.spawner.stop()
+
+    def test_spawn(self):
+        inq, outq = SimpleQueue(), SimpleQueue()
+        p = SpawnedPopen(process(inq, outq), self.spawner)
+        self.assertIsNone(p.poll())
+        inq.put('hello')
+        self.assertTupleEqual(
+            outq.get(), (p.pid, self.spawner.process.pid, 'hello'),
+        )
+        self.assertEqual(p.wait(5.0), 3)
+
+    def test_spawn_killed(self):
+        inq, outq = SimpleQueue(), SimpleQueue()
+        p = SpawnedPopen(process(inq, outq), self.spawner)
+        os.kill(p.pid, signal.SIGKILL)
+        self.assertEqual(p.wait(5.0), -signal.SIGKILL)
+
+    def test_returncode_after_stop(self):
+        inq, outq = SimpleQueue(), SimpleQueue()
+        p = SpawnedPopen(process(inq, outq), self.spawner)
+        self.spawner.stop()
+        self.assertIsNone(p.poll())
+        os.kill(p.pid, signal.SIGKILL)
+        self.assertIsNotNone(p.wait(5.0))
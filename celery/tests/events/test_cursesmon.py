@@ -2,14 +2,22 @@ from __future__ import absolute_import
 
 from nose import SkipTest
 
+from celery.events import Event
+from celery.events.state import State
 from celery.tests.case import Case
 
 
 class MockWindow(object):
 
+    def __init__(self):
+        self.written = []
+
     def getmaxyx(self):
         return self.y, self.x
 
+    def addstr(self, y, x, string, *args):
+        self.written.append((y, x, string))
+
 
 class test_CursesDisplay(Case):
 
@@ -70,3 +78,84 @@ class test_CursesDisplay(Case):
                          'task.task.task.task.task.task.task.[.]tas '
                          '21:13:20 SUCCESS ',
                          row)
+
+
+class test_CursesMonitor(Case):
+
+    def setUp(self):
+        try:
+            import curses  # noqa
+        except ImportError:
+            raise SkipTest('curses monitor requires curses')
+
+        from celery.events import cursesmon
+        self.state = State()
+        for i in range(100):
+            self.state.event(Event('task-received', uuid=str(i),
+                                   name='x', hostname='w1'))
+        self.monitor = cursesmon.CursesMonitor(self.state)
+        self.win = MockWindow()
+        self.win.x, self.win.y = 80, 30
+        self.monitor.win = self.win
+
+    def test_tasks_only_visible_window(self):
+        self.assertEqual(self.monitor.limit, 20)
+        tasks = self.monitor.tasks
+        self.assertEqual(len(tasks), 20)
+        self.assertEqual(tasks[0][0], '99')
+        self.monitor.offset = 90
+        self.assertListEqual([uuid for uuid, _ in self.monitor.tasks],
+                             [str(i) for i in reversed(range(10))])
+
+    def test_move_selection_scrolls(self):
+        m = self.monitor
+        m.move_selection_down()
+        self.assertEqual(m.selected_task, '98')
+        for i in range(18):
+            m.move_selection_down()
+        self.assertEqual(m.offset, 0)
+        self.assertEqual(m.selected_task, '80')
+        m.move_selection_down()
+        self.assertEqual(m.offset, 1)
+        self.assertEqual(m.selected_task, '79')
+        m.move_page_down()
+        self.assertEqual(m.offset, 21)
+        self.assertEqual(m.selected_task, '59')
+        m.move_page_up()
+        m.move_page_up()
+        self.assertEqual(m.offset, 0)
+        self.assertEqual(m.selected_task, '99')
+        m.offset = 1000
+        m.move_selection_down()
+        self.assertEqual(m.offset, 99)
+
+    def test_put_line_unchanged(self):
+        m = self.monitor
+        m.put_line(5, (3, 'foo', 0))
+        self.assertEqual(len(self.win.written), 2)
+        m.put_line(5, (3, 'foo', 0))
+        self.assertEqual(len(self.win.written), 2)
+        m.put_line(5, (3, 'bar', 0))
+        self.assertEqual(self.win.written[-1], (5, 3, 'bar'))
+
+    def test_refresh_interval(self):
+        m = self.monitor
+        self.assertEqual(m.refresh_interval(10), m.min_refresh_interval)
+        self.assertEqual(m.refresh_interval(5000),
+                         m.min_refresh_interval * 5)
+        self.assertEqual(m.refresh_interval(1e6), m.max_refresh_interval)
+
+    def test_should_refresh(self):
+        m = self.monitor
+        self.assertTrue(m.should_refresh(now=lambda: 100.0))
+        m._needs_erase = False
+        m._last_refresh, m._refreshed_event_count = 100.0, 100
+        self.assertFalse(m.should_refresh(now=lambda: 101.0))
+        self.assertTrue(m.should_refresh(now=lambda: 102.0))
+        # 10 events in 0.05s is 200/s
+        m._refreshed_event_count = 90
+        self.assertFalse(m.should_refresh(now=lambda: 100.05))
+        self.assertTrue(m.should_refresh(now=lambda: 100.2))
+        # busy: 20k events/s refreshes every 2 seconds.
+        m._refreshed_event_count = 100 - 20000
+        self.assertFalse(m.should_refresh(now=lambda: 101.0))
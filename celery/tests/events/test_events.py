@@ -100,6 +100,80 @@ class test_EventDispatcher(AppCase):
         buf.popleft.side_effect = IndexError()
         eventer.flush()
 
+    def get_batching_dispatcher(self, batch_size=3, **kwargs):
+        producer = MockProducer()
+        connection = Mock()
+        connection.transport.driver_type = 'amqp'
+        eventer = self.app.events.Dispatcher(
+            connection, enabled=False, batch_size=batch_size, **kwargs
+        )
+        eventer.producer = producer
+        eventer.enabled = True
+        return eventer, producer
+
+    def test_send_batched(self):
+        eventer, producer = self.get_batching_dispatcher(3)
+        eventer.send('task-received', uuid='a')
+        eventer.send('task-started', uuid='a')
+        self.assertFalse(producer.sent)
+        eventer.send('task-succeeded', uuid='a')
+        self.assertEqual(len(producer.sent), 1)
+        batch = producer.sent[0]
+        self.assertListEqual(
+            [ev['type'] for ev in batch],
+            ['task-received', 'task-started', 'task-succeeded'],
+        )
+        clocks = [ev['clock'] for ev in batch]
+        self.assertListEqual(clocks, sorted(clocks))
+        self.assertFalse(eventer._batch)
+
+    def test_send_batched_other_group_flushes(self):
+        eventer, producer = self.get_batching_dispatcher(10)
+        eventer.send('task-received', uuid='a')
+        eventer.send('worker-heartbeat')
+        self.assertEqual(len(producer.sent), 2)
+        self.assertEqual(producer.sent[0][0]['type'], 'task-received')
+        self.assertEqual(producer.sent[1]['type'], 'worker-heartbeat')
+
+    def test_send_batched_interval(self):
+        eventer, producer = self.get_batching_dispatcher(
+            10, batch_interval=0.0,
+        )
+        eventer.send('task-received', uuid='a')
+        self.assertEqual(len(producer.sent), 1)
+
+    def test_flush_batch_error(self):
+        eventer, producer = self.get_batching_dispatcher(10)
+        eventer.flush_batch()
+        self.assertFalse(producer.sent)
+        eventer.send('task-received', uuid='a')
+        producer.raise_on_publish = True
+        with self.assertRaises(KeyError):
+            eventer.flush_batch()
+        self.assertEqual(len(eventer._batch), 1)
+        producer.raise_on_publish = False
+        eventer.flush()
+        self.assertEqual(len(producer.sent[0]), 1)
+
+    def test_send_batched_error_not_buffered_twice(self):
+        eventer, producer = self.get_batching_dispatcher(2)
+        eventer.send('task-received', uuid='a')
+        producer.raise_on_publish = True
+        eventer.send('task-started', uuid='a')
+        self.assertEqual(len(eventer._batch), 2)
+        self.assertFalse(eventer._outbound_buffer)
+        producer.raise_on_publish = False
+        eventer.flush()
+        self.assertEqual(len(producer.sent), 1)
+        self.assertListEqual([ev['type'] for ev in producer.sent[0]],
+                             ['task-received', 'task-started'])
+
+    def test_close_flushes_batch(self):
+        eventer, producer = self.get_batching_dispatcher(10)
+        eventer.send('task-received', uuid='a')
+        eventer.close()
+        self.assertEqual(len(producer.sent), 1)
+
     def test_enter_exit(self):
         with self.app.connection() as conn:
             d = self.app.events.Dispatcher(conn)
@@ -181,6 +255,39 @@ class test_EventReceiver(AppCase):
         r._receive(message, object())
         self.assertTrue(got_event[0])
 
+    def test_process_batch(self):
+        got = []
+        connection = Mock()
+        connection.transport_cls = 'memory'
+        r = self.app.events.Receiver(
+            connection, handlers={'*': got.append}, node_id='celery.tests',
+        )
+        r.adjust_clock = Mock()
+        r._receive([{'type': 'task-received', 'clock': 1},
+                    {'type': 'task-started', 'clock': 2}], object())
+        self.assertListEqual([ev['type'] for ev in got],
+                             ['task-received', 'task-started'])
+        r.adjust_clock.assert_called_with(2)
+
+    def test_bulk_handler(self):
+        got, handler = [], Mock()
+        connection = Mock()
+        connection.transport_cls = 'memory'
+        r = self.app.events.Receiver(
+            connection, handlers={'*': handler}, node_id='celery.tests',
+            bulk_handler=got.append,
+        )
+        r.adjust_clock = Mock()
+        r._receive([{'type': 'task-received', 'clock': 1},
+                    {'type': 'task-started', 'clock': 2}], object())
+        r._receive({'type': 'worker-online', 'clock': 3}, object())
+        self.assertListEqual(
+            [[ev['type'] for ev in events] for events in got],
+            [['task-received', 'task-started'], ['worker-online']],
+        )
+        self.assertIn('local_received', got[0][0])
+        self.assertFalse(handler.called)
+
     def test_catch_all_event(self):
 
         message = {'type': 'world-war'}
@@ -0,0 +1,208 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+from mock import Mock, patch
+
+from celery.events import Event
+from celery.events.recorder import (
+    EventRecorder,
+    EventRecording,
+    InvalidRecording,
+    Replay,
+    evrecord,
+    evreplay,
+)
+from celery.events.state import State
+
+from celery.tests.case import AppCase, Case, WhateverIO
+
+
+def events(n, start=100.0, hostname='w1'):
+    return [Event('task-received', uuid=str(i), name='x',
+                  hostname=hostname, local_received=start + i)
+            for i in range(n)]
+
+
+class RecordingCase(Case):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'events.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self, evs, **kwargs):
+        with EventRecorder(self.filename, **kwargs) as recorder:
+            recorder.bulk_event(evs)
+        return EventRecording(self.filename)
+
+
+class test_EventRecorder(RecordingCase):
+
+    def test_roundtrip(self):
+        evs = events(10)
+        recording = self.record(evs)
+        self.assertListEqual(list(recording), evs)
+        self.assertEqual(len(recording), 10)
+        self.assertIsNone(recording.compression)
+
+    def test_compression(self):
+        evs = events(100)
+        recording = self.record(evs, compression='zlib')
+        self.assertEqual(recording.compression, 'zlib')
+        self.assertListEqual(list(recording), evs)
+        self.assertLess(
+            os.path.getsize(self.filename),
+            len(repr(evs)),
+        )
+
+    def test_blocks_and_index(self):
+        evs = events(25)
+        recording = self.record(evs, block_size=10)
+        index = recording.index()
+        self.assertListEqual([block[2] for block in index], [10, 10, 5])
+        self.assertEqual(index[0][:2], (100.0, 109.0))
+        self.assertListEqual(
+            [len(block) for block in recording.iterblocks()], [10, 10, 5],
+        )
+
+    def test_flush_interval(self):
+        recorder = EventRecorder(self.filename, flush_interval=1.0)
+        try:
+            recorder.event(events(1)[0], now=lambda: 10.0)
+            self.assertEqual(len(EventRecording(self.filename)), 0)
+            recorder.event(events(1)[0], now=lambda: 11.0)
+            self.assertEqual(len(EventRecording(self.filename)), 2)
+            self.assertEqual(recorder.event_count, 2)
+        finally:
+            recorder.close()
+        recorder.close()
+
+    def test_append(self):
+        self.record(events(5), compression='zlib')
+        recording = self.record(events(5, start=200.0))
+        self.assertEqual(recording.compression, 'zlib')
+        self.assertEqual(len(list(recording)), 10)
+
+    def test_start_end(self):
+        recording = self.record(events(30), block_size=10)
+        blocks = list(recording.iterblocks(start=115.0, end=121.0))
+        self.assertListEqual(
+            [ev['uuid'] for block in blocks for ev in block],
+            [str(i) for i in range(15, 22)],
+        )
+        self.assertFalse(list(recording.iterblocks(start=1000.0)))
+
+    def test_truncated_block_ignored(self):
+        self.record(events(10), block_size=5)
+        with open(self.filename, 'rb+') as fh:
+            fh.truncate(os.path.getsize(self.filename) - 3)
+        self.assertEqual(len(list(EventRecording(self.filename))), 5)
+
+    def test_append_after_truncated_block(self):
+        self.record(events(10), block_size=5)
+        with open(self.filename, 'rb+') as fh:
+            fh.truncate(os.path.getsize(self.filename) - 3)
+        recording = self.record(events(5, start=200.0, hostname='n'))
+        self.assertListEqual([block[2] for block in recording.index()],
+                             [5, 5])
+        self.assertListEqual(
+            [(ev['hostname'], ev['uuid']) for ev in recording],
+            [('w1', str(i)) for i in range(5)] +
+            [('n', str(i)) for i in range(5)],
+        )
+        self.assertEqual(recording.blocks_end(),
+                         os.path.getsize(self.filename))
+
+    def test_invalid_recording(self):
+        with open(self.filename, 'wb') as fh:
+            fh.write(b'foo bar baz, this is not a recording')
+        with self.assertRaises(InvalidRecording):
+            EventRecording(self.filename)
+        with self.assertRaises(InvalidRecording):
+            EventRecorder(self.filename)
+        open(self.filename, 'wb').close()
+        with self.assertRaises(InvalidRecording):
+            EventRecording(self.filename)
+
+
+class test_Replay(RecordingCase):
+
+    def test_replay_into_state(self):
+        self.record(events(5, hostname='w1') + events(5, hostname='w2'))
+        state = State()
+        self.assertEqual(
+            Replay(self.filename, bulk_handler=state.bulk_event).run(), 10,
+        )
+        self.assertEqual(state.event_count, 10)
+        self.assertIn('w2', state.workers)
+
+    def test_replay_handler(self):
+        recording = self.record(events(5))
+        handler = Mock()
+        Replay(recording, handler=handler).run()
+        self.assertEqual(handler.call_count, 5)
+
+    def test_requires_handler(self):
+        self.record(events(1))
+        with self.assertRaises(ValueError):
+            Replay(self.filename)
+
+    def test_speed(self):
+        self.record(events(5))
+        clock, got = [1000.0], []
+
+        def sleep(secs):
+            clock[0] += secs
+
+        r = Replay(self.filename, bulk_handler=got.append, speed=2.0,
+                   sleep=sleep, now=lambda: clock[0])
+        r.run()
+        # 4 seconds of events replayed in 2 seconds.
+        self.assertEqual(clock[0], 1002.0)
+        self.assertListEqual([len(evs) for evs in got], [1, 1, 1, 1, 1])
+
+
+class test_evrecord_evreplay(AppCase):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'events.rec')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_evrecord(self):
+        app = Mock(name='app')
+        receiver = app.events.Receiver.return_value
+
+        def capture(limit=None):
+            handler = app.events.Receiver.call_args[1]['bulk_handler']
+            handler(events(3))
+            raise KeyboardInterrupt()
+        receiver.capture.side_effect = capture
+
+        out = WhateverIO()
+        with self.assertRaises(SystemExit):
+            evrecord(self.filename, app=app, out=out)
+        app.connection.return_value.close.assert_called_with()
+        self.assertEqual(len(EventRecording(self.filename)), 3)
+        self.assertIn('3 events recorded', out.getvalue())
+
+    def test_evreplay(self):
+        with EventRecorder(self.filename) as recorder:
+            recorder.bulk_event(events(3))
+        camera = Mock()
+        out = WhateverIO()
+        with patch('celery.events.recorder.instantiate') as instantiate:
+            instantiate.return_value = camera
+            state = evreplay(self.filename, camera='x.Camera',
+                             app=self.app, out=out)
+        camera.install.assert_called_with()
+        camera.cancel.assert_called_with()
+        self.assertEqual(len(state.tasks), 3)
+        self.assertIn('3 events replayed', out.getvalue())
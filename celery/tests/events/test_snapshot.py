@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from mock import patch
 
 from celery.app import app_or_default
-from celery.events import Events
+from celery.events import Event, Events
 from celery.events.snapshot import Polaroid, evcam
 from celery.tests.case import Case
 
@@ -98,6 +98,28 @@ class test_Polaroid(Case):
             x.shutter()
         self.assertEqual(shutter_signal_sent[0], 1)
 
+    def test_shutter_incremental(self):
+        got = []
+
+        class Camera(Polaroid):
+            incremental = True
+
+            def on_changes(self, state, changes):
+                got.append(changes)
+
+        x = Camera(self.state, app=self.app)
+        self.state.event(Event('task-received', uuid='a', hostname='w1'))
+        x.capture()
+        self.assertIn('a', got[0].new_tasks)
+        self.state.event(Event('task-started', uuid='a', hostname='w1'))
+        x.capture()
+        self.assertListEqual(list(got[1].changed_tasks), ['a'])
+        self.assertFalse(got[1].new_tasks)
+
+        x.incremental = False
+        x.capture()
+        self.assertEqual(len(got), 2)
+
 
 class test_evcam(Case):
 
@@ -4,14 +4,16 @@ import pickle
 
 from time import time
 from itertools import count
-from mock import Mock, patch
+from mock import MagicMock, Mock, patch
 
 from celery import states
 from celery.events import Event
 from celery.events.state import (
     State,
+    CompactState,
     Worker,
     Task,
+    CompactTask,
     HEARTBEAT_EXPIRE_WINDOW,
     HEARTBEAT_DRIFT_MAX,
     _lamportinfo
@@ -220,6 +222,95 @@ class test_Task(Case):
         self.assertTrue(repr(Task(uuid='xxx', name='tasks.add')))
 
 
+class test_CompactTask(Case):
+
+    def test_no_dict(self):
+        task = CompactTask(uuid='abcdefg', name='tasks.add')
+        self.assertFalse(hasattr(task, '__dict__'))
+        self.assertEqual(task.name, 'tasks.add')
+        self.assertEqual(task['name'], 'tasks.add')
+        self.assertEqual(task.state, states.PENDING)
+        self.assertIsNone(task.result)
+
+    def test_equality(self):
+        self.assertEqual(CompactTask(uuid='foo'), CompactTask(uuid='foo'))
+        self.assertNotEqual(CompactTask(uuid='foo'), CompactTask(uuid='bar'))
+        self.assertEqual(
+            hash(CompactTask(uuid='foo')), hash(CompactTask(uuid='foo')),
+        )
+
+    def test_interns_names(self):
+        name = ''.join(['tasks.', 'add'])
+        t1 = CompactTask(uuid='a', name='tasks.add', routing_key='celery')
+        t2 = CompactTask(uuid='b', name=name, routing_key='celery')
+        self.assertIs(t1.name, t2.name)
+        self.assertIs(t1.routing_key, t2.routing_key)
+
+    def test_discarded_and_extra_fields(self):
+        task = CompactTask(uuid='a', hostname='w1', pid=301, foo='bar')
+        self.assertEqual(task.foo, 'bar')
+        self.assertEqual(task.get('foo'), 'bar')
+        self.assertIsNone(task.get('pid'))
+        self.assertIsNone(task.hostname)
+        with self.assertRaises(AttributeError):
+            task.pid
+        with self.assertRaises(KeyError):
+            task['pid']
+        self.assertNotIn('pid', task.as_dict())
+        self.assertEqual(task.as_dict()['foo'], 'bar')
+
+        task.worker = Worker(hostname='w1')
+        self.assertEqual(task.hostname, 'w1')
+
+    def test_info(self):
+        task = CompactTask(uuid='abcdefg', name='tasks.add', args='(2, 2)',
+                           kwargs='{}', result=42, exchange='celery')
+        self.assertDictEqual(task.info(), {
+            'args': '(2, 2)', 'kwargs': '{}',
+            'result': 42, 'exchange': 'celery',
+        })
+
+    def test_merge(self):
+        task = CompactTask()
+        task.on_failed(timestamp=time())
+        task.on_started(timestamp=time())
+        task.on_received(timestamp=time(), name='tasks.add', args=(2, 2))
+        self.assertEqual(task.state, states.FAILURE)
+        self.assertEqual(task.name, 'tasks.add')
+        self.assertTupleEqual(task.args, (2, 2))
+
+    def test_pickleable(self):
+        task = CompactTask(uuid='abcdefg', name='tasks.add', foo='bar')
+        task.on_succeeded(timestamp=time(), result=42)
+        t2 = pickle.loads(pickle.dumps(task))
+        self.assertEqual(t2, task)
+        self.assertDictEqual(t2.as_dict(), task.as_dict())
+
+    def test_repr(self):
+        self.assertTrue(repr(CompactTask(uuid='xxx', name='tasks.add')))
+
+
+class test_CompactState(Case):
+
+    def test_task_states(self):
+        r = ev_task_states(CompactState())
+        r.play()
+        task = r.state.tasks[r.tid]
+        self.assertIsInstance(task, CompactTask)
+        self.assertEqual(task.state, states.SUCCESS)
+        self.assertEqual(task.hostname, 'utest1')
+        self.assertEqual(task.result, '4')
+        self.assertEqual(task.runtime, 0.1234)
+
+    def test_snapshot(self):
+        s = CompactState()
+        ev_snapshot(s).play()
+        self.assertEqual(len(s.tasks), 20)
+        self.assertEqual(len(list(s.tasks_by_type('task1'))), 10)
+        self.assertEqual(len(list(s.tasks_by_worker('utest1'))), 10)
+        self.assertTrue(pickle.loads(pickle.dumps(s)))
+
+
 class test_State(Case):
 
     def test_repr(self):
@@ -376,6 +467,201 @@ class test_State(Case):
         self.assertEqual(len(list(r.state.tasks_by_type('task1'))), 10)
         self.assertEqual(len(list(r.state.tasks_by_type('task2'))), 10)
 
+    def test_tasks_by_time_order_and_limit(self):
+        s = State()
+        for i in range(10):
+            s.event(Event('task-received', uuid=str(i), name='x',
+                          hostname='w1'))
+        s.event(Event('task-started', uuid='3', hostname='w1'))
+        self.assertListEqual(
+            [uuid for uuid, _ in s.tasks_by_time(limit=3)],
+            ['3', '9', '8'],
+        )
+        self.assertEqual(len(list(s.tasks_by_time())), 10)
+        self.assertListEqual(
+            [uuid for uuid, _ in s.tasks_by_time(limit=2, offset=2)],
+            ['8', '7'],
+        )
+
+    def test_tasks_by_time_is_arrival_order(self):
+        # events are not reordered by logical clock or timestamp.
+        s = State()
+        s.event(Event('task-received', uuid='a', name='x', hostname='w1',
+                      clock=20, timestamp=20.0))
+        s.event(Event('task-received', uuid='b', name='x', hostname='w2',
+                      clock=10, timestamp=10.0))
+        self.assertListEqual([u for u, _ in s.tasks_by_time()], ['b', 'a'])
+
+    def test_tasks_by_time_copied_with_lock(self):
+        s = State()
+        s.event(Event('task-received', uuid='a', name='x', hostname='w1'))
+        s.event(Event('task-received', uuid='b', name='x', hostname='w1'))
+        it = s.tasks_by_time()
+        s._mutex = MagicMock()
+        self.assertEqual(next(it)[0], 'b')
+        self.assertTrue(s._mutex.__enter__.called)
+        # changing the index does not affect the keys already copied.
+        s.event(Event('task-received', uuid='c', name='x', hostname='w1'))
+        self.assertListEqual([u for u, _ in it], ['a'])
+
+    def test_unpickle_with_taskheap(self):
+        s = State()
+        s.event(Event('task-received', uuid='a', name='x', hostname='w1'))
+        task = s.tasks['a']
+        s2 = State(None, s.workers, s.tasks, [
+            _lamportinfo(1, 1.0, 'w1', task),
+        ])
+        self.assertListEqual([u for u, _ in s2.tasks_by_time()], ['a'])
+
+    def test_index_follows_name_and_worker(self):
+        s = State()
+        s.event(Event('task-started', uuid='a', hostname='w1'))
+        self.assertFalse(list(s.tasks_by_type('x')))
+        s.event(Event('task-received', uuid='a', name='x', hostname='w2'))
+        self.assertListEqual([u for u, _ in s.tasks_by_type('x')], ['a'])
+        self.assertListEqual([u for u, _ in s.tasks_by_worker('w2')], ['a'])
+        self.assertFalse(list(s.tasks_by_worker('w1')))
+        self.assertNotIn('w1', s._tasks_by_worker)
+        self.assertListEqual(s.task_types(), ['x'])
+
+    def test_index_consistent_with_eviction(self):
+        s = State(max_tasks_in_memory=3)
+        for i in range(5):
+            s.event(Event('task-received', uuid=str(i),
+                          name='x' if i % 2 else 'y', hostname='w1'))
+        self.assertListEqual(
+            [u for u, _ in s.tasks_by_time()], ['4', '3', '2'],
+        )
+        self.assertListEqual([u for u, _ in s.tasks_by_type('x')], ['3'])
+        self.assertListEqual(
+            [u for u, _ in s.tasks_by_type('y')], ['4', '2'],
+        )
+        self.assertEqual(len(list(s.tasks_by_worker('w1'))), 3)
+
+        # task accessed out of band is not the one evicted.
+        s.tasks['2']
+        s.event(Event('task-received', uuid='5', name='x', hostname='w1'))
+        self.assertListEqual(
+            [u for u, _ in s.tasks_by_time()], ['5', '4', '2'],
+        )
+        self.assertListEqual(
+            [u for u, _ in s.tasks_by_type('x')], ['5'],
+        )
+
+    def test_index_rebuilt(self):
+        r = ev_snapshot(State())
+        r.play()
+        s = pickle.loads(pickle.dumps(r.state))
+        self.assertEqual(len(list(s.tasks_by_type('task1'))), 10)
+        self.assertEqual(len(list(s.tasks_by_worker('utest2'))), 10)
+        s.clear_tasks(ready=False)
+        self.assertFalse(list(s.tasks_by_time()))
+        self.assertFalse(s.task_types())
+
+    def test_bulk_event(self):
+        r = ev_snapshot(State())
+        events = [r.next_event() for _ in range(len(r.events))]
+        s1, s2 = State(), State()
+        for event in events:
+            s1.event(dict(event))
+        s2.bulk_event([dict(event) for event in events])
+        self.assertEqual(s2.event_count, s1.event_count)
+        self.assertEqual(s2.task_count, s1.task_count)
+        self.assertListEqual(list(s2.tasks_by_time()),
+                             list(s1.tasks_by_time()))
+        self.assertListEqual(list(s2.tasks_by_type('task1')),
+                             list(s1.tasks_by_type('task1')))
+        self.assertEqual(len(s2.alive_workers()), 3)
+
+    def test_bulk_event_coalesces_task_events(self):
+        r = ev_task_states(State())
+        events = [r.next_event() for _ in range(len(r.events))]
+        s = State()
+        s.get_or_create_task = Mock(wraps=s.get_or_create_task)
+        s.bulk_event(events)
+        self.assertEqual(s.get_or_create_task.call_count, 1)
+        self.assertEqual(len(list(s.tasks_by_time())), 1)
+        task = s.tasks[r.tid]
+        self.assertEqual(task.state, states.SUCCESS)
+        self.assertEqual(task.result, '4')
+        self.assertTrue(task.received)
+        self.assertEqual(task.worker.hostname, 'utest1')
+        self.assertEqual(s.task_count, 1)
+
+    def test_bulk_event_evicted_in_batch(self):
+        s = State(max_tasks_in_memory=2)
+        s.bulk_event([
+            Event('task-received', uuid=str(i), name='x', hostname='w1')
+            for i in range(4)
+        ] + [Event('task-started', uuid='3', hostname='w1')])
+        self.assertListEqual([u for u, _ in s.tasks_by_time()], ['3', '2'])
+        self.assertListEqual([u for u, _ in s.tasks_by_type('x')], ['3', '2'])
+
+    def test_bulk_event_callback_and_handlers(self):
+        seen, custom = [], Mock()
+        s = State(callback=lambda state, event: seen.append(event['type']))
+        s.handlers['custom'] = custom
+        s.bulk_event([Event('worker-online', hostname='w1'),
+                      Event('custom-thing', foo=1),
+                      Event('unknown-thing')])
+        self.assertListEqual(
+            seen, ['worker-online', 'custom-thing', 'unknown-thing'],
+        )
+        self.assertEqual(custom.call_args[0][0], 'thing')
+        self.assertIn('w1', s.workers)
+
+    def test_take_changes(self):
+        s = State()
+        s.event(Event('worker-online', hostname='w1'))
+        s.event(Event('task-received', uuid='a', name='x', hostname='w1'))
+
+        # the first call gives everything.
+        changes = s.take_changes()
+        self.assertTrue(s.track_changes)
+        self.assertListEqual(list(changes.new_tasks), ['a'])
+        self.assertListEqual(list(changes.new_workers), ['w1'])
+        self.assertFalse(changes.changed_tasks)
+
+        changes = s.take_changes()
+        self.assertFalse(any(changes))
+
+        s.event(Event('task-started', uuid='a', hostname='w1'))
+        s.event(Event('task-received', uuid='b', name='x', hostname='w2'))
+        s.event(Event('task-started', uuid='b', hostname='w2'))
+        s.event(Event('worker-heartbeat', hostname='w1'))
+        changes = s.take_changes()
+        self.assertIs(changes.changed_tasks['a'], s.tasks['a'])
+        self.assertListEqual(list(changes.new_tasks), ['b'])
+        self.assertListEqual(list(changes.new_workers), ['w2'])
+        self.assertListEqual(list(changes.changed_workers), ['w1'])
+        self.assertFalse(changes.evicted_tasks)
+
+    def test_take_changes_bulk(self):
+        s = State()
+        s.take_changes()
+        s.bulk_event([Event('task-received', uuid='a', hostname='w1'),
+                      Event('task-started', uuid='a', hostname='w1')])
+        self.assertListEqual(list(s.take_changes().new_tasks), ['a'])
+        s.bulk_event([Event('task-succeeded', uuid='a', hostname='w1')])
+        self.assertListEqual(list(s.take_changes().changed_tasks), ['a'])
+
+    def test_take_changes_evicted(self):
+        s = State(max_tasks_in_memory=2, max_workers_in_memory=1)
+        s.event(Event('task-received', uuid='a', hostname='w1'))
+        s.event(Event('task-received', uuid='b', hostname='w1'))
+        s.take_changes()
+        s.event(Event('task-started', uuid='a', hostname='w1'))
+        s.event(Event('task-received', uuid='c', hostname='w2'))
+        s.event(Event('task-received', uuid='d', hostname='w2'))
+        s.event(Event('task-received', uuid='e', hostname='w2'))
+        changes = s.take_changes()
+        self.assertSetEqual(changes.evicted_tasks, set(['a', 'b']))
+        # c was added and evicted since the last changes.
+        self.assertItemsEqual(list(changes.new_tasks), ['d', 'e'])
+        self.assertFalse(changes.changed_tasks)
+        self.assertSetEqual(changes.evicted_workers, set(['w1']))
+        self.assertListEqual(list(changes.new_workers), ['w2'])
+
     def test_alive_workers(self):
         r = ev_snapshot(State())
         r.play()
@@ -415,12 +701,9 @@ class test_State(Case):
                                                 'uuid': 'z',
                                                 'hostname': 'y',
                                                 'clock': 5})
-        self.assertEqual(len(s._taskheap), 2)
-        self.assertEqual(s._taskheap[0].clock, 4)
-        self.assertEqual(s._taskheap[1].clock, 5)
-
-        s._taskheap.append(s._taskheap[0])
-        self.assertTrue(list(s.tasks_by_time()))
+        self.assertListEqual([u for u, _ in s.tasks_by_time()], ['z'])
+        self.assertListEqual([u for u, _ in s.tasks_by_worker('y')], ['z'])
+        self.assertListEqual(list(s.tasks), ['z'])
 
     def test_callback(self):
         scratch = {}
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+from kombu.serialization import dumps
 from mock import Mock, patch
 
 from celery import uuid
@@ -10,6 +11,7 @@ from celery.task.trace import (
     TraceInfo,
     eager_trace_task,
     trace_task,
+    trace_task_message,
     setup_worker_optimizations,
     reset_worker_optimizations,
 )
@@ -160,6 +162,45 @@ class test_trace(TraceCase):
         self.assertIs(xtask.__trace__, tracer)
 
 
+class test_trace_task_message(TraceCase):
+
+    def payload(self, body):
+        content_type, content_encoding, data = dumps(body, serializer='json')
+        return data, content_type, content_encoding
+
+    def test_decodes_arguments(self):
+        payload = self.payload({'args': [2, 2], 'kwargs': {},
+                                'taskset': 'g1', 'retries': 3})
+        with patch('celery.task.trace.trace_task_ret') as trace_ret:
+            trace_task_message(self.add.name, 'id-1', payload,
+                               {'hostname': 'w1', 'retries': 1})
+            name, id, args, kwargs, request = trace_ret.call_args[0]
+            self.assertEqual(args, [2, 2])
+            self.assertEqual(kwargs, {})
+            self.assertEqual(request['group'], 'g1')
+            self.assertEqual(request['hostname'], 'w1')
+            self.assertEqual(request['retries'], 1)
+
+    def test_executes(self):
+        payload = self.payload({'args': [2, 2], 'kwargs': {}})
+        self.assertEqual(
+            trace_task_message(self.add.name, uuid(), payload), 4,
+        )
+
+    def test_invalid_body(self):
+        with patch('celery.task.trace.report_internal_error') as rie:
+            trace_task_message(
+                self.add.name, 'id-1',
+                ('{"args": [2', 'application/json', 'utf-8'),
+            )
+            self.assertIs(rie.call_args[0][0], self.add)
+
+            rie.reset_mock()
+            payload = self.payload({'args': [2, 2], 'kwargs': [1]})
+            trace_task_message(self.add.name, 'id-1', payload)
+            self.assertIsInstance(rie.call_args[0][1], AttributeError)
+
+
 class test_TraceInfo(TraceCase):
 
     class TI(TraceInfo):
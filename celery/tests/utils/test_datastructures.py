@@ -3,7 +3,7 @@ from __future__ import absolute_import
 import pickle
 
 from billiard.einfo import ExceptionInfo
-from mock import Mock, patch
+from mock import Mock, call, patch
 from time import time
 
 from celery.datastructures import (
@@ -179,6 +179,21 @@ class test_LimitedSet(Case):
             self.assertIn(n, s)
         self.assertNotIn('foo', s)
 
+    def test_on_change(self):
+        s = LimitedSet(maxlen=1)
+        s.on_change = Mock()
+        s.add('foo', now=lambda: 1.0)
+        s.on_change.assert_called_with('add', 'foo', 1.0)
+        s.add('bar', now=lambda: 2.0)
+        s.on_change.assert_has_calls([
+            call('expire', 'foo', 1.0), call('add', 'bar', 2.0),
+        ])
+        s.discard('bar')
+        s.on_change.assert_called_with('discard', 'bar', 2.0)
+        s.on_change.reset_mock()
+        s.discard('bar')
+        self.assertFalse(s.on_change.called)
+
     def test_purge(self):
         s = LimitedSet(maxlen=None)
         [s.add(i) for i in range(10)]
@@ -249,6 +264,37 @@ class test_LimitedSet(Case):
         self.assertNotIn('foo', s)
         s.discard('foo')
 
+    def test_discard_not_evicted_again(self):
+        s = LimitedSet(maxlen=2)
+        s.add('foo')
+        s.add('bar')
+        s.discard('foo')
+        s.add('baz')
+        self.assertItemsEqual(list(s), ['bar', 'baz'])
+        s.add('xaz')
+        self.assertItemsEqual(list(s), ['baz', 'xaz'])
+
+    def test_add_again_moves_to_end(self):
+        s = LimitedSet(maxlen=2)
+        s.add('foo', now=lambda: 1.0)
+        s.add('bar', now=lambda: 2.0)
+        s.add('foo', now=lambda: 3.0)
+        self.assertEqual(len(s), 2)
+        self.assertListEqual(list(s), ['bar', 'foo'])
+        s.add('baz', now=lambda: 4.0)
+        self.assertItemsEqual(list(s), ['foo', 'baz'])
+
+    def test_compacts_stale_entries(self):
+        s = LimitedSet(maxlen=1000)
+        s.min_stale = 10
+        for i in range(100):
+            s.add(i)
+        for i in range(80):
+            s.discard(i)
+        self.assertEqual(len(s), 20)
+        self.assertLessEqual(len(s._heap), 2 * len(s) + s.min_stale)
+        self.assertListEqual(list(s), list(range(80, 100)))
+
     def test_clear(self):
         s = LimitedSet(maxlen=2)
         s.add('foo')
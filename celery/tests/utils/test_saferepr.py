@@ -0,0 +1,56 @@
+from __future__ import absolute_import
+
+from celery.utils.saferepr import LazyRepr, saferepr
+
+from celery.tests.case import Case
+
+
+class test_saferepr(Case):
+
+    def test_same_as_repr(self):
+        for value in (1, 'foo', [], (), {}, [1, 'two', (3, )],
+                      {'a': [1, {'b': 2}]}, (1, 2), object()):
+            self.assertEqual(saferepr(value, 1000), repr(value))
+
+    def test_no_maxlen(self):
+        self.assertEqual(saferepr(list(range(1000))),
+                         repr(list(range(1000))))
+        self.assertEqual(saferepr(list(range(1000)), -1),
+                         repr(list(range(1000))))
+
+    def test_truncated(self):
+        self.assertEqual(saferepr(list(range(1000)), 10), '[0, 1, 2, ...')
+        self.assertEqual(saferepr('x' * 1000, 4), "'xxx...")
+        self.assertEqual(saferepr({'k': 'v' * 1000}, 8), "{'k': 'v...")
+
+    def test_disabled(self):
+        self.assertEqual(saferepr([1, 2, 3], 0), '...')
+
+    def test_nested(self):
+        self.assertEqual(saferepr([[[[1]]]], 100), '[[[[1]]]]')
+        self.assertEqual(saferepr({'a': ({'b': [1]}, )}, 100),
+                         "{'a': ({'b': [1]},)}")
+
+    def test_deeply_nested(self):
+        x = []
+        for _ in range(10000):
+            x = [x]
+        self.assertEqual(saferepr(x, 20), '[' * 20 + '...')
+
+    def test_recursive(self):
+        x = [1]
+        x.append(x)
+        self.assertEqual(saferepr(x, 100), '[1, [...]]')
+
+
+class test_LazyRepr(Case):
+
+    def test_str(self):
+        self.assertEqual(str(LazyRepr([1, 2])), '[1, 2]')
+        self.assertEqual(repr(LazyRepr('x' * 100, 3)), "'xx...")
+
+    def test_custom_fun(self):
+        self.assertEqual(
+            str(LazyRepr(10, 3, lambda obj, maxlen: str(obj * maxlen))),
+            '30',
+        )
@@ -35,9 +35,10 @@ class test_Entry(Case):
 
 
 class test_Schedule(Case):
+    Schedule = timer2.Schedule
 
     def test_supports_Timer_interface(self):
-        x = timer2.Schedule()
+        x = self.Schedule()
         x.stop()
 
         tref = Mock()
@@ -46,6 +47,18 @@ class test_Schedule(Case):
 
         self.assertIs(x.schedule, x)
 
+    def test_lag_stats(self):
+        s = self.Schedule()
+        self.assertEqual(s.stats()['lag_avg'], 0.0)
+        s.enter(timer2.Entry(Mock()), 997.0)
+        s.enter(timer2.Entry(Mock()), 999.0).cancel()
+        it = s.__iter__(nowfun=lambda: 1000.0)
+        self.assertIsNotNone(next(it)[1])
+        self.assertTupleEqual(next(it), (None, None))
+        self.assertDictEqual(s.stats(), {
+            'fired': 1, 'lag_avg': 3.0, 'lag_max': 3.0, 'lag_last': 3.0,
+        })
+
     def test_handle_error(self):
         from datetime import datetime
         to_timestamp = timer2.to_timestamp
@@ -57,7 +70,7 @@ class test_Schedule(Case):
         def on_error(exc_info):
             scratch[0] = exc_info
 
-        s = timer2.Schedule(on_error=on_error)
+        s = self.Schedule(on_error=on_error)
 
         timer2.to_timestamp = _overflow
         try:
@@ -76,6 +89,10 @@ class test_Schedule(Case):
         self.assertIsInstance(exc, OverflowError)
 
 
+class test_TimingWheel_Schedule(test_Schedule):
+    Schedule = timer2.TimingWheel
+
+
 class test_Timer(Case):
 
     @skip_if_quick
@@ -196,3 +213,181 @@ class test_Timer(Case):
         tref = Mock()
         t.cancel(tref)
         tref.cancel.assert_called_with()
+
+
+class test_Wheel(Case):
+
+    def setUp(self):
+        self.wheel = timer2.Wheel(resolution=1.0, slots=4, levels=3,
+                                  now=lambda: 100.0)
+
+    def entries(self, *etas):
+        return [(eta, timer2.Entry(lambda: None)) for eta in etas]
+
+    def test_enter_levels(self):
+        w = self.wheel
+        entries = self.entries(99.0, 100.5, 101.0, 103.5, 104.0, 120.0, 9999)
+        for eta, entry in entries:
+            w.enter(eta, 0, entry)
+        self.assertEqual(len(w.due), 2)
+        self.assertListEqual(sorted(w.levels[0]), [101, 103])
+        self.assertListEqual(sorted(w.levels[1]), [26])
+        self.assertListEqual(sorted(w.levels[2]), [7, 624])
+        self.assertEqual(w.next_tick, 101)
+        self.assertEqual(len(w), 7)
+        self.assertTrue(w)
+        self.assertListEqual([item[0] for item in w.items()],
+                             [eta for eta, _ in entries])
+
+    def test_cancel_removes_entry(self):
+        w = self.wheel
+        (_, e1), (_, e2) = self.entries(110.0, 110.5)
+        w.enter(110.0, 0, e1)
+        w.enter(110.5, 0, e2)
+        e1.cancel()
+        self.assertEqual(len(w), 1)
+        e1.cancel()
+        e2.cancel()
+        self.assertEqual(len(w), 0)
+        self.assertFalse(w)
+        self.assertTrue(e2.cancelled)
+        # empty buckets are removed.
+        self.assertFalse(any(w.levels))
+
+    def test_pop(self):
+        w = self.wheel
+        for eta, entry in self.entries(99.0, 100.5, 130.0):
+            w.enter(eta, 0, entry)
+        self.assertEqual(w.pop()[0], 99.0)
+        self.assertEqual(len(w), 2)
+        w.advance(131.0)
+        self.assertListEqual([w.pop()[0], w.pop()[0]], [100.5, 130.0])
+        self.assertEqual(len(w), 0)
+        self.assertFalse(w)
+
+    def test_cancel_after_cascade(self):
+        w = self.wheel
+        (_, entry), = self.entries(120.0)
+        w.enter(120.0, 0, entry)
+        w.advance(117.0)
+        self.assertListEqual(sorted(w.levels[0]), [120])
+        self.assertEqual(len(w), 1)
+        entry.cancel()
+        self.assertEqual(len(w), 0)
+        self.assertFalse(any(w.levels))
+
+    def test_advance_cascades(self):
+        w = self.wheel
+        entries = self.entries(101.5, 105.0, 112.0, 150.0)
+        for eta, entry in entries:
+            w.enter(eta, 0, entry)
+        w.advance(100.9)
+        self.assertFalse(w.due)
+        w.advance(104.0)
+        self.assertListEqual([item[0] for item in w.due], [101.5])
+        self.assertEqual(w.next_tick, 105)
+        w.due[:] = []
+        w.advance(113.0)
+        self.assertListEqual(sorted(item[0] for item in w.due),
+                             [105.0, 112.0])
+        w.due[:] = []
+        w.advance(10000.0)
+        self.assertListEqual([item[0] for item in w.due], [150.0])
+        self.assertIsNone(w.next_tick)
+
+    def test_advance_skips_cancelled(self):
+        w = self.wheel
+        entry = Mock(cancelled=False)
+        w.enter(130.0, 0, entry)
+        entry.cancelled = True
+        w.advance(200.0)
+        self.assertFalse(w)
+
+    def test_clear(self):
+        w = self.wheel
+        for eta, entry in self.entries(50.0, 150.0):
+            w.enter(eta, 0, entry)
+        w.clear()
+        self.assertFalse(w)
+        self.assertIsNone(w.next_tick)
+
+
+class test_TimingWheel(Case):
+
+    def setUp(self):
+        self.clock = [1000.0]
+        self.s = timer2.TimingWheel(max_interval=10)
+        self.s._queue = timer2.Wheel(now=lambda: 1000.0)
+        self.it = self.s.__iter__(nowfun=lambda: self.clock[0])
+
+    def test_supports_Schedule_interface(self):
+        self.assertTrue(self.s.empty())
+        self.assertIs(self.s.schedule, self.s)
+
+    def test_fires_in_order(self):
+        s, it = self.s, self.it
+        self.assertTupleEqual(next(it), (None, None))
+        fired = []
+        for eta in (1003.0, 1001.0, 1001.05, 1002.0):
+            s.enter(timer2.Entry(fired.append, (eta, )), eta)
+        self.assertFalse(s.empty())
+        delay, entry = next(it)
+        self.assertAlmostEqual(delay, 1.0)
+        self.assertIsNone(entry)
+        self.clock[0] = 1001.01
+        delay, entry = next(it)
+        s.apply_entry(entry)
+        delay, entry = next(it)
+        self.assertAlmostEqual(delay, 0.04)
+        self.clock[0] = 1002.5
+        for _ in range(2):
+            delay, entry = next(it)
+            s.apply_entry(entry)
+        self.assertListEqual(fired, [1001.0, 1001.05, 1002.0])
+        self.assertEqual(len(s.queue), 1)
+        self.assertEqual(s.queue[0][0], 1003.0)
+
+    def test_cancel(self):
+        s, it = self.s, self.it
+        entry = s.enter(timer2.Entry(Mock()), 1001.0)
+        s.cancel(entry)
+        self.assertTrue(s.empty())
+        entry = s.enter(timer2.Entry(Mock()), 999.0)
+        entry.cancel()
+        # wakes up once for the empty bucket.
+        self.assertIsNone(next(it)[1])
+        self.clock[0] = 1001.5
+        self.assertTupleEqual(next(it), (None, None))
+
+    def test_clear(self):
+        s = self.s
+        s.enter(timer2.Entry(Mock()), 1001.0)
+        s.enter(timer2.Entry(Mock()), 99.0)
+        s.clear()
+        self.assertTrue(s.empty())
+        self.assertListEqual(s.queue, [])
+
+    def test_info(self):
+        s = self.s
+        entry = s.enter(timer2.Entry(Mock()), 1001.0)
+        self.assertListEqual(
+            list(s.info()),
+            [{'eta': 1001.0, 'priority': 0, 'item': entry}],
+        )
+
+    def test_stats(self):
+        s, it = self.s, self.it
+        for eta in (999.0, 999.5):
+            s.enter(timer2.Entry(Mock()), eta)
+        next(it), next(it)
+        self.assertDictEqual(s.stats(), {
+            'fired': 2, 'lag_avg': 0.75, 'lag_max': 1.0, 'lag_last': 0.5,
+        })
+
+    def test_get_schedule_cls(self):
+        self.assertIs(timer2.get_schedule_cls('wheel'), timer2.TimingWheel)
+        self.assertIs(timer2.get_schedule_cls('heap'), timer2.Schedule)
+        self.assertIs(
+            timer2.get_schedule_cls('celery.utils.timer2:TimingWheel'),
+            timer2.TimingWheel,
+        )
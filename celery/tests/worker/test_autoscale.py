@@ -4,7 +4,7 @@ import sys
 
 from time import time
 
-from mock import Mock, patch
+from mock import MagicMock, Mock, patch
 
 from celery.concurrency.base import BasePool
 from celery.worker import state
@@ -54,6 +54,7 @@ class test_WorkerComponent(AppCase):
         scaler = Mock()
         scaler.keepalive = 10
         w.on_poll_init(scaler, hub)
+        scaler.policy.start.assert_called_with()
         self.assertIn(scaler.maybe_scale, hub.on_task)
         hub.timer.apply_interval.assert_called_with(
             10 * 1000.0, scaler.maybe_scale,
@@ -70,6 +71,22 @@ class test_Autoscaler(AppCase):
 
     def setup(self):
         self.pool = MockPool(3)
+        self.ready_callbacks = list(state.task_ready_callbacks)
+
+    def teardown(self):
+        state.task_ready_callbacks[:] = self.ready_callbacks
+
+    def test_start(self):
+        x = autoscale.Autoscaler(self.pool, 10, 3)
+        self.assertNotIn(x.policy.on_task_ready, state.task_ready_callbacks)
+        with patch('celery.utils.threads.bgThread.start') as start:
+            x.start()
+            start.assert_called_with()
+        self.assertIn(x.policy.on_task_ready, state.task_ready_callbacks)
+        with patch('celery.utils.threads.bgThread.stop') as stop:
+            x.stop()
+            stop.assert_called_with()
+        self.assertNotIn(x.policy.on_task_ready, state.task_ready_callbacks)
 
     def test_stop(self):
 
@@ -85,8 +102,10 @@ class test_Autoscaler(AppCase):
 
         x = Scaler(self.pool, 10, 3)
         x._is_stopped.set()
+        x.policy = Mock()
         x.stop()
         self.assertTrue(x.joined)
+        x.policy.close.assert_called_with()
         x.joined = False
         x.alive = False
         x.stop()
@@ -94,7 +113,8 @@ class test_Autoscaler(AppCase):
 
     @sleepdeprived(autoscale)
     def test_body(self):
-        x = autoscale.Autoscaler(self.pool, 10, 3)
+        x = autoscale.Autoscaler(self.pool, 10, 3,
+                                 policy=autoscale.ReservedPolicy())
         x.body()
         self.assertEqual(x.pool.num_processes, 3)
         for i in range(20):
@@ -169,6 +189,22 @@ class test_Autoscaler(AppCase):
         self.assertEqual(info['min'], 3)
         self.assertEqual(info['current'], 3)
 
+    def test_default_policy(self):
+        x = autoscale.Autoscaler(self.pool, 10, 3)
+        try:
+            self.assertIsInstance(x.policy, autoscale.PredictivePolicy)
+        finally:
+            x.policy.close()
+
+    def test_policy(self):
+        policy = Mock()
+        policy.target.return_value = 7
+        x = autoscale.Autoscaler(self.pool, 10, 3, policy=policy)
+        x.maybe_scale()
+        policy.target.assert_called_with(3)
+        self.assertEqual(x.pool.num_processes, 7)
+        self.assertIs(x.info()['policy'], policy.info())
+
     @patch('os._exit')
     def test_thread_crash(self, _exit):
 
@@ -187,3 +223,116 @@ class test_Autoscaler(AppCase):
             sys.stderr = p
         _exit.assert_called_with(1)
         self.assertTrue(stderr.write.call_count)
+
+
+class test_PredictivePolicy(AppCase):
+
+    def setup(self):
+        self.policy = autoscale.PredictivePolicy()
+        self.policy.depth_interval = None
+        self.policy.start()
+
+    def teardown(self):
+        self.policy.close()
+        state.reserved_requests.clear()
+
+    def sample(self, reserved, completed, runtime=2.0):
+        for i in range(completed):
+            self.policy.on_task_ready(Mock(time_start=time() - runtime))
+        state.reserved_requests.clear()
+        state.reserved_requests.update(range(reserved))
+        self.policy._last_sample -= 1.0
+
+    def test_closes(self):
+        self.assertIn(self.policy.on_task_ready, state.task_ready_callbacks)
+        self.policy.start()
+        self.assertEqual(
+            state.task_ready_callbacks.count(self.policy.on_task_ready), 1,
+        )
+        self.policy.close()
+        self.assertNotIn(self.policy.on_task_ready,
+                         state.task_ready_callbacks)
+        self.policy.close()
+
+    def test_ready_without_time_start(self):
+        self.policy.on_task_ready(object())
+        self.assertIsNone(self.policy.runtime)
+        self.assertEqual(self.policy._completed, 1)
+
+    def test_no_runtime_uses_backlog(self):
+        self.sample(reserved=4, completed=0)
+        self.assertEqual(self.policy.target(10), 4)
+
+    def test_growth_is_limited(self):
+        self.sample(reserved=100, completed=10)
+        self.assertEqual(self.policy.target(2), 4)
+        self.sample(reserved=100, completed=10)
+        self.assertEqual(self.policy.target(4), 8)
+
+    def test_target_is_cached_within_interval(self):
+        self.sample(reserved=4, completed=0)
+        self.assertEqual(self.policy.target(10), 4)
+        state.reserved_requests.update(range(100))
+        self.assertEqual(self.policy.target(10), 4)
+
+    def test_hysteresis(self):
+        policy = self.policy
+        policy.runtime, policy.rate = 1.0, 9.0
+        self.assertEqual(policy._limit(policy.predict(), 10), 10)
+        policy.rate = 5.0
+        self.assertEqual(policy._limit(policy.predict(), 10), 5)
+
+    def test_predict(self):
+        policy = self.policy
+        policy.runtime, policy.rate, policy.depth = 0.5, 10.0, 20
+        state.reserved_requests.update(range(10))
+        # 10 tasks/s * 0.5s + 30 tasks * 0.5s / 5s
+        self.assertEqual(policy.predict(), 8)
+
+    def test_queue_depth(self):
+        app = MagicMock()
+        queue = Mock()
+        queue.return_value.queue_declare.return_value = ('foo', 30, 1)
+        app.amqp.queues.consume_from = {'foo': queue}
+        policy = autoscale.PredictivePolicy(app)
+        try:
+            self.assertEqual(policy.queue_depth(), 30)
+            app.connection.assert_called_with(
+                connect_timeout=policy.depth_timeout,
+            )
+            app.connection.return_value.__enter__.side_effect = KeyError()
+            with patch('celery.worker.autoscale.error') as error:
+                self.assertIsNone(policy.queue_depth())
+                self.assertTrue(error.called)
+            self.assertIsNotNone(policy.depth_interval)
+        finally:
+            policy.close()
+
+    def test_update_depth(self):
+        policy = self.policy
+        policy.depth = 3
+        with patch('threading.Thread') as Thread:
+            policy.update_depth()
+            Thread.assert_called_with(target=policy._update_depth,
+                                      name='AutoscaleDepth')
+            Thread.return_value.start.assert_called_with()
+            # no new thread while the previous is still running.
+            Thread.return_value.is_alive.return_value = True
+            policy.update_depth()
+            self.assertEqual(Thread.call_count, 1)
+        with patch.object(policy, 'queue_depth') as queue_depth:
+            queue_depth.return_value = None
+            policy._update_depth()
+            self.assertEqual(policy.depth, 3)
+            queue_depth.return_value = 30
+            policy._update_depth()
+            self.assertEqual(policy.depth, 30)
+
+    def test_sample_starts_depth_update(self):
+        policy = autoscale.PredictivePolicy(Mock())
+        try:
+            with patch.object(policy, 'update_depth') as update_depth:
+                policy.sample(time())
+                update_depth.assert_called_with()
+        finally:
+            policy.close()
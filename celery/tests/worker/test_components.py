@@ -6,9 +6,12 @@ from __future__ import absolute_import
 
 from mock import Mock
 
+from celery.utils import timer2
 from celery.worker.components import (
+    Hub,
     Queues,
     Pool,
+    Timer,
 )
 
 from celery.tests.case import AppCase
@@ -38,3 +41,47 @@ class test_Pool(AppCase):
         w.pool = None
         comp.close(w)
         comp.terminate(w)
+
+
+class test_Hub(AppCase):
+
+    def test_timer_schedule(self):
+        w = Mock()
+        w.timer_schedule = 'wheel'
+        Hub(w).create(w)
+        self.assertIsInstance(w.timer, timer2.TimingWheel)
+        self.assertIs(w.hub.timer, w.timer)
+
+    def test_info(self):
+        w = Mock()
+        w.timer_schedule = 'heap'
+        step = Hub(w)
+        step.create(w)
+        info = step.info(w)['timer']
+        self.assertEqual(info['fired'], 0)
+        self.assertEqual(info['budget'], w.hub.timer_budget)
+
+
+class test_Timer(AppCase):
+
+    def test_timer_schedule(self):
+        w = Mock()
+        w.timer_schedule = 'wheel'
+        w.timer_precision = 3.0
+        w.pool.is_green = False
+        Timer(w).create(w)
+        schedule = w.pool.Timer.call_args[1]['schedule']
+        self.assertIsInstance(schedule, timer2.TimingWheel)
+        self.assertEqual(schedule.max_interval, 3.0)
+
+    def test_green_pool_keeps_schedule(self):
+        w = Mock()
+        w.timer_schedule = 'wheel'
+        w.pool.is_green = True
+        Timer(w).create(w)
+        self.assertNotIn('schedule', w.pool.Timer.call_args[1])
+
+    def test_info(self):
+        w = Mock()
+        w.timer = timer2.Timer()
+        self.assertEqual(Timer(w).info(w)['timer']['fired'], 0)
@@ -3,20 +3,25 @@ from __future__ import absolute_import
 import errno
 import socket
 
+from collections import deque
+
 from mock import Mock, patch, call
 from nose import SkipTest
 
 from billiard.exceptions import RestartFreqExceeded
 
+from celery.app.amqp import ENVELOPE_HEADER
 from celery.datastructures import LimitedSet
 from celery.worker import state as worker_state
 from celery.worker.consumer import (
     Consumer,
+    Events,
     Heart,
     Tasks,
     Agent,
     Mingle,
     Gossip,
+    TaskBucket,
     dump_body,
     CLOSE,
 )
@@ -85,6 +90,7 @@ class test_Consumer(AppCase):
 
         with patch('celery.worker.consumer.task_reserved') as reserved:
             bucket = Mock()
+            bucket.contents = deque()
             request = Mock()
             bucket.can_consume.return_value = True
 
@@ -99,10 +105,51 @@ class test_Consumer(AppCase):
             c._limit_task(request, bucket, 4)
             bucket.can_consume.assert_called_with(4)
             c.timer.apply_after.assert_called_with(
-                3.33 * 1000.0, c._limit_task, (request, bucket, 4),
+                3.33 * 1000.0, c._drain_bucket, (bucket, ),
             )
             bucket.expected_time.assert_called_with(4)
             self.assertFalse(reserved.called)
+            self.assertListEqual(list(bucket.contents), [(request, 4)])
+
+    def test_limit_task_keeps_single_timer_and_order(self):
+        c = self.get_consumer()
+        bucket = c.bucket_for_task(Mock(rate_limit='1/s'))
+        self.assertIsInstance(bucket, TaskBucket)
+        bucket.can_consume = Mock(return_value=False)
+        bucket.expected_time = Mock(return_value=1.0)
+        requests = [Mock(name='r{0}'.format(i)) for i in range(10)]
+
+        with patch('celery.worker.consumer.task_reserved') as reserved:
+            for request in requests:
+                c._limit_task(request, bucket, 1)
+            self.assertEqual(c.timer.apply_after.call_count, 1)
+            self.assertFalse(reserved.called)
+
+            bucket.can_consume.side_effect = [True, True, False]
+            c._drain_bucket(bucket)
+            self.assertListEqual(
+                [call[0][0] for call in c.on_task.call_args_list],
+                requests[:2],
+            )
+            self.assertEqual(len(bucket.contents), 8)
+            self.assertEqual(c.timer.apply_after.call_count, 2)
+
+            bucket.can_consume.side_effect = None
+            bucket.can_consume.return_value = True
+            c._drain_bucket(bucket)
+            self.assertListEqual(
+                [call[0][0] for call in c.on_task.call_args_list],
+                requests,
+            )
+            self.assertFalse(bucket.contents)
+            self.assertEqual(c.timer.apply_after.call_count, 2)
+
+    def test_on_close_clears_pending_bucket_requests(self):
+        c = self.get_consumer()
+        bucket = c.task_buckets['x.limited'] = TaskBucket(1.0)
+        bucket.contents.append((Mock(), 1))
+        c.on_close()
+        self.assertFalse(bucket.contents)
 
     def test_start_blueprint_raises_EMFILE(self):
         c = self.get_consumer()
@@ -162,6 +209,130 @@ class test_Consumer(AppCase):
             c.pool = None
             c.on_close()
 
+    def test_batched_task_handler(self):
+        c = self.get_consumer(task_batching=True)
+        c.event_dispatcher = Mock()
+        c.event_dispatcher.enabled = False
+        callbacks = [Mock()]
+        strategy = c.strategies['x.add'] = Mock()
+        on_task = c.create_task_handler(callbacks)
+
+        msgs = [Mock(), Mock()]
+        on_task({'task': 'x.add', 'id': 'a'}, msgs[0])
+        on_task({'task': 'x.add', 'id': 'b'}, msgs[1])
+        self.assertFalse(strategy.batch.called)
+        self.assertFalse(callbacks[0].called)
+
+        on_task.flush()
+        callbacks[0].assert_called_with()
+        self.assertEqual(strategy.batch.call_count, 1)
+        run, revoked_ids, received = strategy.batch.call_args[0]
+        self.assertListEqual([m for m, _, _ in run], msgs)
+        self.assertIsNone(received)
+        strategy.dispatch.assert_called_with(strategy.batch.return_value)
+
+        strategy.batch.reset_mock()
+        on_task.flush()
+        self.assertFalse(strategy.batch.called)
+
+    def test_batched_task_handler__revoked_and_events(self):
+        c = self.get_consumer(task_batching=True)
+        c.event_dispatcher = Mock()
+        c.event_dispatcher.enabled = True
+
+        def batch(run, revoked_ids, received):
+            received.extend({'uuid': body['id']} for _, body, _ in run)
+            return ['requests']
+        strategy = c.strategies['x.add'] = Mock()
+        strategy.batch.side_effect = batch
+        # events must be sent before the tasks are dispatched.
+        strategy.dispatch.side_effect = lambda requests: self.assertEqual(
+            c.event_dispatcher.send.call_count, 2,
+        )
+        on_task = c.create_task_handler([])
+
+        worker_state.revoked.add('revoked-id')
+        try:
+            on_task({'task': 'x.add', 'id': 'revoked-id'}, Mock())
+            on_task({'task': 'x.add', 'id': 'b'}, Mock())
+            on_task.flush()
+        finally:
+            worker_state.revoked.discard('revoked-id')
+        revoked_ids = strategy.batch.call_args[0][1]
+        self.assertSetEqual(revoked_ids, set(['revoked-id']))
+        self.assertEqual(c.event_dispatcher.send.call_count, 2)
+        c.event_dispatcher.send.assert_called_with('task-received', uuid='b')
+        strategy.dispatch.assert_called_with(['requests'])
+
+    def test_batched_task_handler__unknown(self):
+        c = self.get_consumer(task_batching=True)
+        c.event_dispatcher = None
+        c.on_unknown_message = Mock()
+        c.on_unknown_task = Mock()
+        c.on_invalid_task = Mock()
+        on_task = c.create_task_handler([])
+
+        on_task({'id': 'a'}, Mock())
+        self.assertTrue(c.on_unknown_message.called)
+
+        on_task({'task': 'x.missing', 'id': 'a'}, Mock())
+        on_task.flush()
+        self.assertTrue(c.on_unknown_task.called)
+
+    def test_batched_task_handler__strategy_without_batch(self):
+        from celery.exceptions import InvalidTaskError
+        c = self.get_consumer(task_batching=True)
+        c.event_dispatcher = None
+        c.on_invalid_task = Mock()
+        strategy = c.strategies['x.add'] = Mock(spec=lambda m, b, a: 1)
+        strategy.side_effect = InvalidTaskError()
+        on_task = c.create_task_handler([])
+
+        message = Mock()
+        on_task({'task': 'x.add', 'id': 'a'}, message)
+        on_task.flush()
+        strategy.assert_called_with(
+            message, {'task': 'x.add', 'id': 'a'}, message.ack_log_error,
+        )
+        self.assertTrue(c.on_invalid_task.called)
+
+    def test_on_task_message(self):
+        c = self.get_consumer(pool_raw_messages=True)
+        c.task_consumer = Mock()
+        callback = Mock()
+        c.task_consumer.callbacks = [callback]
+        strategy = c.strategies['x.add'] = Mock()
+        strategy.raw = True
+        message = Mock()
+        message.accept = None
+        envelope = {'task': 'x.add', 'id': 'a'}
+        message.headers = {ENVELOPE_HEADER: envelope, 'task': 'other'}
+        c.on_task_message(message)
+        callback.assert_called_with(envelope, message)
+        self.assertFalse(message.decode.called)
+
+        # custom strategy
+        strategy.raw = False
+        c.on_task_message(message)
+        callback.assert_called_with(message.decode.return_value, message)
+
+        # content type not accepted
+        strategy.raw = True
+        message.accept = set(['application/json'])
+        message.content_type = 'application/x-python-serialize'
+        message.decode.side_effect = KeyError()
+        c.on_decode_error = Mock()
+        callback.reset_mock()
+        c.on_task_message(message)
+        self.assertFalse(callback.called)
+        self.assertTrue(c.on_decode_error.called)
+
+        # no headers
+        message.decode.side_effect = None
+        message.headers = {}
+        c.on_task_message(message)
+        callback.assert_called_with(message.decode.return_value, message)
+
     def test_connect_error_handler(self):
         _prev, self.app.connection = self.app.connection, Mock()
         try:
@@ -223,6 +394,45 @@ class test_Agent(AppCase):
         agent.instantiate.assert_called_with(agent.agent_cls, c.connection)
 
 
+class test_Events(AppCase):
+
+    def test_start_batching(self):
+        c = Mock()
+        c.app.conf.CELERY_EVENT_BATCH_SIZE = 100
+        c.app.conf.CELERY_EVENT_BATCH_INTERVAL = 0.5
+        c.event_dispatcher = None
+        ev = Events(c)
+        ev.start(c)
+        dis = c.app.events.Dispatcher.return_value
+        self.assertEqual(
+            c.app.events.Dispatcher.call_args[1]['batch_size'], 100,
+        )
+        c.timer.apply_interval.assert_called_with(500.0, dis.flush_batch)
+
+        ev.stop(c)
+        c.timer.apply_interval.return_value.cancel.assert_called_with()
+        dis.close.assert_called_with()
+        self.assertIsNone(c.event_dispatcher)
+
+    def test_start_batching_zero_interval(self):
+        c = Mock()
+        c.app.conf.CELERY_EVENT_BATCH_SIZE = 100
+        c.app.conf.CELERY_EVENT_BATCH_INTERVAL = 0
+        c.event_dispatcher = None
+        ev = Events(c)
+        ev.start(c)
+        self.assertFalse(c.timer.apply_interval.called)
+        ev.stop(c)
+
+    def test_start_not_batching(self):
+        c = Mock()
+        c.app.conf.CELERY_EVENT_BATCH_SIZE = 0
+        c.event_dispatcher = None
+        ev = Events(c)
+        ev.start(c)
+        self.assertFalse(c.timer.apply_interval.called)
+
+
 class test_Mingle(AppCase):
 
     def test_start_no_replies(self):
@@ -260,7 +470,7 @@ class test_Mingle(AppCase):
             }
 
             mingle.start(c)
-            I.hello.assert_called_with()
+            I.hello.assert_called_with(c.hostname, summary=True)
             c.app.clock.adjust.assert_has_calls([
                 call(312), call(29),
             ], any_order=True)
@@ -270,6 +480,66 @@ class test_Mingle(AppCase):
         finally:
             worker_state.revoked.clear()
 
+    def test_start_delta(self):
+        try:
+            c = Mock()
+            mingle = Mingle(c)
+
+            def hello(from_node, revoked_since=None, summary=False):
+                if summary:
+                    return {
+                        'A@example.com': {'clock': 312, 'revoked_count': 2,
+                                          'revoked_version': 20.0},
+                        'B@example.com': {'clock': 29, 'revoked_count': 1,
+                                          'revoked_version': 10.0},
+                        c.hostname: None,
+                    }
+                replies = {
+                    'A@example.com': {
+                        'clock': 313, 'revoked_version': 20.0,
+                        'revoked_packed': worker_state.pack_revoked(
+                            ['Aig-1', 'Aig-2'][
+                                1 if revoked_since['A@example.com'] else 0:]),
+                    },
+                    'B@example.com': {
+                        'clock': 30, 'revoked_version': 10.0,
+                        'revoked_packed': worker_state.pack_revoked(
+                            ['Big-1']),
+                    },
+                }
+                return dict((hostname, replies[hostname])
+                            for hostname in revoked_since)
+            I = c.app.control.inspect.return_value = Mock()
+            I.hello.side_effect = hello
+
+            mingle.start(c)
+            dest = c.app.control.inspect.call_args[1]['destination']
+            self.assertItemsEqual(dest, ['A@example.com', 'B@example.com'])
+            I.hello.assert_called_with(c.hostname, revoked_since={
+                'A@example.com': 0, 'B@example.com': 0,
+            })
+            # revokes from all workers are merged.
+            for id in 'Aig-1', 'Aig-2', 'Big-1':
+                self.assertIn(id, worker_state.revoked)
+            self.assertEqual(
+                worker_state.revoked_versions['A@example.com'], 20.0,
+            )
+
+            # nothing changed since last time
+            I.hello.reset_mock()
+            mingle.start(c)
+            I.hello.assert_called_once_with(c.hostname, summary=True)
+
+            # only the changes are requested.
+            worker_state.revoked_versions['A@example.com'] = 15.0
+            mingle.start(c)
+            I.hello.assert_called_with(c.hostname, revoked_since={
+                'A@example.com': 15.0,
+            })
+        finally:
+            worker_state.revoked.clear()
+            worker_state.revoked_versions.clear()
+
 
 class test_Gossip(AppCase):
 
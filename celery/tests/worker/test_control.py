@@ -172,6 +172,39 @@ class test_ControlPanel(AppCase):
         finally:
             worker_state.revoked.discard('revoked1')
 
+    def test_hello_from_self(self):
+        panel = self.create_panel(consumer=Consumer(self.app),
+                                  hostname=hostname)
+        self.assertIsNone(panel.handle('hello', {'from_node': hostname}))
+
+    def test_hello_summary_and_delta(self):
+        consumer = Consumer(self.app)
+        panel = self.create_panel(consumer=consumer, hostname=hostname)
+        panel.state.app.clock.value = 313
+        id1 = '1ed9ec2b-d0e9-4b56-9cf6-e2ee2b0d2e46'
+        worker_state.revoked.add(id1, now=lambda: 10.0)
+        worker_state.revoked.add('revoked2', now=lambda: 20.0)
+        try:
+            x = panel.handle('hello', {'summary': True})
+            self.assertEqual(x['revoked_version'], 20.0)
+            self.assertEqual(x['revoked_count'], 2)
+            self.assertNotIn('revoked', x)
+
+            x = panel.handle('hello', {'revoked_since': {}})
+            self.assertItemsEqual(
+                worker_state.unpack_revoked(x['revoked_packed']),
+                [id1, 'revoked2'],
+            )
+            self.assertListEqual(x['revoked_packed']['other'], ['revoked2'])
+            x = panel.handle('hello', {'revoked_since': {hostname: 20.0}})
+            self.assertListEqual(
+                worker_state.unpack_revoked(x['revoked_packed']),
+                ['revoked2'],
+            )
+            self.assertEqual(x['revoked_version'], 20.0)
+        finally:
+            worker_state.revoked.clear()
+
     def test_conf(self):
         return
         consumer = Consumer(self.app)
@@ -462,6 +495,20 @@ class test_ControlPanel(AppCase):
         r = self.panel.handle_message(m, None)
         self.assertIn('error', r)
 
+    def test_pool_max_memory(self):
+        self.panel.state.consumer = Mock()
+        pool = self.panel.state.consumer.pool
+        m = {'method': 'pool_max_memory',
+             'destination': hostname,
+             'arguments': {'limit': '250000'}}
+        r = self.panel.handle_message(m, None)
+        self.assertIn('ok', r)
+        pool.set_max_memory_per_child.assert_called_with(250000)
+
+        pool.set_max_memory_per_child.side_effect = ValueError()
+        r = self.panel.handle_message(m, None)
+        self.assertIn('error', r)
+
     def test_ping(self):
         m = {'method': 'ping',
              'destination': hostname}
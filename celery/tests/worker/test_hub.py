@@ -190,13 +190,47 @@ class test_Hub(Case):
 
         entries[:] = [Mock() for _ in range(11)]
         keep = list(entries)
-        self.assertEqual(hub.fire_timers(max_timers=10, min_delay=1.13), 1.13)
+        # more timers may be due, so must not block.
+        self.assertEqual(hub.fire_timers(max_timers=10, min_delay=1.13), 0)
         for E in reversed(keep[1:]):
             E.assert_called_with()
         reset()
         self.assertEqual(hub.fire_timers(max_timers=10), 3.982)
         keep[0].assert_called_with()
 
+    def test_fire_timers_budget(self):
+        hub = Hub()
+        hub.timer = Mock()
+        hub.timer._queue = [1]
+        entries = [Mock() for _ in range(10)]
+
+        def se():
+            while 1:
+                while entries:
+                    yield None, entries.pop()
+                yield 3.982, None
+        hub.scheduler = se()
+        clock = [100.0]
+
+        def now():
+            clock[0] += 0.015
+            return clock[0]
+
+        self.assertEqual(hub.fire_timers(now=now), 0)
+        self.assertEqual(len(entries), 8)
+        self.assertEqual(hub.timer_budget, hub.min_timer_budget * 2)
+        self.assertEqual(hub.fire_timers(now=now), 0)
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(hub.timer_budget, hub.min_timer_budget * 4)
+        self.assertEqual(hub.fire_timers(now=now), 3.982)
+        self.assertFalse(entries)
+        self.assertEqual(hub.timer_budget, hub.min_timer_budget * 2)
+
+        hub.timer_budget = hub.max_timer_budget
+        entries[:] = [Mock() for _ in range(100)]
+        hub.fire_timers(now=now)
+        self.assertEqual(hub.timer_budget, hub.max_timer_budget)
+
     def test_fire_timers_raises(self):
         hub = Hub()
         eback = Mock()
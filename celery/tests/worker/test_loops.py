@@ -340,6 +340,16 @@ class test_asynloop(AppCase):
         x.hub.readers[6].assert_called_with(6, ERR)
         self.assertTrue(x.hub.poller.poll.called)
 
+    def test_flushes_batched_task_handler(self):
+        x = X()
+        x.hub.readers = {6: Mock()}
+        on_task = x.obj.create_task_handler = Mock(name='create_task_handler')
+        x.close_then_error(x.connection.drain_nowait, mod=1)
+        x.hub.poller.poll.return_value = [(6, READ)]
+        with self.assertRaises(socket.error):
+            asynloop(*x.args)
+        on_task.return_value.flush.assert_called_with()
+
     def test_poll_raises_ValueError(self):
         x = X()
         x.hub.readers = {6: Mock()}
@@ -373,6 +383,14 @@ class test_synloop(AppCase):
             synloop(*x.args)
         x.qos.update.assert_called_with()
 
+    def test_flushes_batched_task_handler(self):
+        x = X()
+        on_task = x.obj.create_task_handler = Mock(name='create_task_handler')
+        x.timeout_then_error(x.connection.drain_events)
+        with self.assertRaises(socket.error):
+            synloop(*x.args)
+        on_task.return_value.flush.assert_called_with()
+
     def test_ignores_socket_errors_when_closed(self):
         x = X()
         x.close_then_error(x.connection.drain_events)
@@ -0,0 +1,169 @@
+from __future__ import absolute_import
+
+from mock import Mock
+
+from celery.worker import state
+from celery.worker.prefetch import AdaptivePrefetch, PrefetchController, ewma
+
+from celery.tests.case import AppCase, Case
+
+
+class test_ewma(Case):
+
+    def test_first_value(self):
+        self.assertEqual(ewma(None, 3.0, 0.5), 3.0)
+
+    def test_moves_towards_value(self):
+        self.assertEqual(ewma(2.0, 4.0, 0.5), 3.0)
+
+
+def request(name='x.add', id='id', time_start=100.0):
+    req = Mock(id=id, time_start=time_start)
+    req.name = name
+    return req
+
+
+class test_PrefetchController(Case):
+
+    def get_controller(self, buffer_time=1.0, processes=4, value=16):
+        qos = Mock(name='qos')
+        qos.value = value
+        pool = Mock(name='pool')
+        pool.num_processes = processes
+        return PrefetchController(qos, pool, buffer_time)
+
+    def complete(self, x, runtime, name='x.add', id='id', wait=None):
+        req = request(name, id, time_start=100.0)
+        if wait is not None:
+            x.on_task_reserved(req, now=lambda: 100.0 - wait)
+        x.on_task_ready(req, now=lambda: 100.0 + runtime)
+
+    def test_tracks_runtime_and_wait(self):
+        x = self.get_controller()
+        self.complete(x, 2.0, wait=0.5)
+        self.assertEqual(x.runtime['x.add'], 2.0)
+        self.assertEqual(x.wait['x.add'], 0.5)
+        self.assertFalse(x._reserved_at)
+        self.assertEqual(x.completed['x.add'], 1)
+
+    def test_ready_not_started(self):
+        x = self.get_controller()
+        req = request(time_start=None)
+        x.on_task_reserved(req)
+        x.on_task_ready(req)
+        self.assertFalse(x.completed)
+        self.assertFalse(x._reserved_at)
+
+    def test_expected_weighted_by_completed(self):
+        x = self.get_controller()
+        self.complete(x, 1.0, name='x.a', wait=1.0)
+        self.complete(x, 1.0, name='x.a', wait=1.0)
+        self.complete(x, 4.0, name='x.b', wait=4.0)
+        self.complete(x, 1.0, name='x.c')
+        self.assertTupleEqual(x.expected(), (1.75, 2.0))
+        self.assertIsNone(x.expected())
+
+    def test_expected_wait_unknown(self):
+        x = self.get_controller()
+        self.complete(x, 1.0)
+        self.assertTupleEqual(x.expected(), (1.0, None))
+        self.assertNotIn('x.add', x.wait)
+
+    def test_update_short_tasks_grows(self):
+        x = self.get_controller(buffer_time=1.0, processes=4, value=16)
+        self.complete(x, 0.01)
+        x.update()
+        x.qos.increment_eventually.assert_called_with(400 - 16)
+        self.assertEqual(x.prefetch_count, 400)
+
+    def test_update_long_wait_shrinks(self):
+        x = self.get_controller(buffer_time=1.0, processes=4, value=16)
+        self.complete(x, 0.01, wait=4.0)
+        x.update()
+        x.qos.increment_eventually.assert_called_with(100 - 16)
+        self.assertEqual(x.prefetch_count, 100)
+
+    def test_update_short_wait(self):
+        x = self.get_controller(buffer_time=1.0, processes=4, value=16)
+        self.complete(x, 0.01, wait=0.5)
+        x.update()
+        self.assertEqual(x.prefetch_count, 400)
+
+    def test_update_long_tasks_shrinks(self):
+        x = self.get_controller(buffer_time=1.0, processes=4, value=16)
+        self.complete(x, 60.0)
+        x.update()
+        x.qos.decrement_eventually.assert_called_with(12)
+        self.assertEqual(x.prefetch_count, 4)
+
+    def test_update_respects_max(self):
+        x = self.get_controller(buffer_time=10.0, processes=2, value=8)
+        x.max_per_process = 10
+        self.complete(x, 0.0001)
+        x.update()
+        self.assertEqual(x.prefetch_count, 20)
+
+    def test_update_ignores_small_changes(self):
+        x = self.get_controller(buffer_time=1.0, processes=4, value=100)
+        self.complete(x, 1 / 26.0)
+        x.update()
+        self.assertFalse(x.qos.increment_eventually.called)
+        self.assertEqual(x.prefetch_count, 100)
+
+    def test_update_nothing_completed(self):
+        x = self.get_controller()
+        x.update()
+        self.assertFalse(x.qos.increment_eventually.called)
+        self.assertFalse(x.qos.decrement_eventually.called)
+
+    def test_update_from_unlimited(self):
+        x = self.get_controller(value=0)
+        self.complete(x, 0.5)
+        x.update()
+        x.qos.set.assert_called_with(8)
+
+    def test_info(self):
+        x = self.get_controller()
+        self.complete(x, 1.0)
+        info = x.info()
+        self.assertEqual(info['runtime'], {'x.add': 1.0})
+        self.assertEqual(info['prefetch_count'], 16)
+
+
+class test_AdaptivePrefetch(AppCase):
+
+    def test_disabled_by_default(self):
+        c = Mock()
+        c.app = self.app
+        self.assertFalse(AdaptivePrefetch(c).enabled)
+
+    def test_enabled(self):
+        c = Mock()
+        c.app = self.app
+        on_task = c.on_task
+        step = AdaptivePrefetch(c, prefetch_buffer_time=0.5)
+        self.assertTrue(step.enabled)
+
+        step.create(c)
+        req = request()
+        c.on_task(req)
+        on_task.assert_called_with(req)
+        self.assertIn(req.id, step.controller._reserved_at)
+
+        c.qos.value = 10
+        step.start(c)
+        self.assertIs(step.controller.qos, c.qos)
+        self.assertEqual(step.controller.prefetch_count, 10)
+        self.assertIn(step.controller.on_task_ready,
+                      state.task_ready_callbacks)
+        c.timer.apply_interval.assert_called_with(
+            step.interval * 1000.0, step.controller.update,
+        )
+        self.assertIn('adaptive_prefetch', step.info(c))
+
+        step.stop(c)
+        c.timer.apply_interval.return_value.cancel.assert_called_with()
+        self.assertNotIn(step.controller.on_task_ready,
+                         state.task_ready_callbacks)
+        self.assertFalse(step.controller._reserved_at)
+        step.stop(c)
@@ -11,6 +11,7 @@ import time
 from datetime import datetime, timedelta
 
 from billiard.einfo import ExceptionInfo
+from kombu.serialization import dumps
 from kombu.transport.base import Message
 from kombu.utils.encoding import from_utf8, default_encode
 from mock import Mock, patch
@@ -29,6 +30,7 @@ from celery.exceptions import (
 from celery.five import keys
 from celery.task.trace import (
     trace_task,
+    trace_task_message,
     _trace_task_ret,
     TraceInfo,
     mro_lookup,
@@ -265,18 +267,104 @@ class test_Request(AppCase):
         )
 
     def test_invalid_eta_raises_InvalidTaskError(self):
+        req = self.get_request(self.add.s(2, 2).set(eta='12345'))
         with self.assertRaises(InvalidTaskError):
-            self.get_request(self.add.s(2, 2).set(eta='12345'))
+            req.eta
 
     def test_invalid_expires_raises_InvalidTaskError(self):
+        req = self.get_request(self.add.s(2, 2).set(expires='12345'))
         with self.assertRaises(InvalidTaskError):
-            self.get_request(self.add.s(2, 2).set(expires='12345'))
+            req.expires
 
     def test_valid_expires_with_utc_makes_aware(self):
         with patch('celery.worker.job.maybe_make_aware') as mma:
-            self.get_request(self.add.s(2, 2).set(expires=10))
+            req = self.get_request(self.add.s(2, 2).set(expires=10))
+            self.assertFalse(mma.called)
+            self.assertTrue(req.expires)
             self.assertTrue(mma.called)
 
+    def test_eta_is_decoded_once(self):
+        body = body_from_sig(
+            self.app, self.add.s(2, 2).set(countdown=10), utc=False,
+        )
+        with patch('celery.worker.job.maybe_iso8601') as iso:
+            req = Request(body, app=self.app, task=self.add)
+            self.assertFalse(iso.called)
+            self.assertIs(req.eta, req.eta)
+            self.assertEqual(iso.call_count, 1)
+
+    def get_raw_request(self, sig):
+        body = body_from_sig(self.app, sig)
+        content_type, content_encoding, data = dumps(body, serializer='json')
+        return Request(
+            {'task': body['task'], 'id': body['id'], 'taskset': None},
+            app=self.app, task=sig.type,
+            payload=(data, content_type, content_encoding),
+        )
+
+    def test_raw_payload_is_decoded_once(self):
+        req = self.get_raw_request(self.add.s(2, 2, foo=1))
+        self.assertIsNotNone(req._payload)
+        self.assertEqual(req.args, [2, 2])
+        self.assertIsNone(req._payload)
+        self.assertEqual(req.kwargs, {'foo': 1})
+        self.assertEqual(req.request_dict['args'], [2, 2])
+        self.assertIn('callbacks', req.request_dict)
+
+    def test_raw_payload_invalid(self):
+        req = Request(
+            {'task': self.add.name, 'id': uuid()}, app=self.app,
+            payload=('{"args": [2', 'application/json', 'utf-8'),
+        )
+        with self.assertRaises(InvalidTaskError):
+            req.args
+        self.assertEqual(req.args, [])
+        self.assertEqual(req.kwargs, {})
+
+    def test_execute_using_pool_with_raw_payload(self):
+        req = self.get_raw_request(self.add.s(2, 2))
+        payload = req._payload
+        pool = Mock()
+        req.execute_using_pool(pool)
+        fun = pool.apply_async.call_args[0][0]
+        args = pool.apply_async.call_args[1]['args']
+        self.assertIs(fun, trace_task_message)
+        self.assertEqual(args, (req.name, req.id, payload, req.request_dict))
+        self.assertNotIn('args', args[3])
+        self.assertIsNotNone(req._payload)
+
+        req.args
+        req.execute_using_pool(pool)
+        args = pool.apply_async.call_args[1]['args']
+        self.assertIsNot(pool.apply_async.call_args[0][0], trace_task_message)
+        self.assertEqual(args[2], [2, 2])
+
+    def test_eta_expires_setters(self):
+        req = self.get_request(self.add.s(2, 2).set(countdown=10))
+        req.eta = req.expires = None
+        self.assertIsNone(req.eta)
+        self.assertIsNone(req.expires)
+
+    def test_delivery_info_is_compacted(self):
+        req = self.get_request(
+            self.add.s(2, 2),
+            delivery_info={'exchange': 'x', 'routing_key': 'y',
+                           'priority': 3, 'redelivered': False},
+        )
+        self.assertDictEqual(
+            req.delivery_info,
+            {'exchange': 'x', 'routing_key': 'y', 'priority': 3},
+        )
+        req.delivery_info = {'exchange': 'z'}
+        self.assertDictEqual(req.delivery_info, {'exchange': 'z'})
+
+    def test_has_no_dict(self):
+        if module.IS_PYPY:
+            raise SkipTest('PyPy does not use slots')
+        req = self.get_request(self.add.s(2, 2))
+        with self.assertRaises(AttributeError):
+            req.__dict__
+
     def test_maybe_expire_when_expires_is_None(self):
         req = self.get_request(self.add.s(2, 2))
         self.assertFalse(req.maybe_expire())
@@ -604,6 +692,29 @@ class test_Request(AppCase):
         tw.on_success(42)
         self.assertTrue(tw.send_event.called)
 
+    def test_on_success_repr_maxlen(self):
+        tw = TaskRequest(mytask.name, uuid(), [1], {'f': 'x'})
+        tw.time_start = 1
+        tw.eventer = Mock()
+        tw.send_event = Mock()
+        prev, mytask.repr_maxlen = mytask.repr_maxlen, 3
+        try:
+            tw.on_success(list(range(1000)))
+            self.assertEqual(tw.send_event.call_args[1]['result'], '[0,...')
+            text = 'the quick brown fox'
+            self.assertEqual(tw.repr_result(text), repr(text)[:3] + '...')
+
+            mytask.repr_maxlen = 0
+            tw.on_success(42)
+            self.assertNotIn('result', tw.send_event.call_args[1])
+
+            mytask.repr_maxlen = -1
+            tw.on_success(list(range(1000)))
+            self.assertEqual(tw.send_event.call_args[1]['result'],
+                             repr(list(range(1000))))
+        finally:
+            mytask.repr_maxlen = prev
+
     def test_on_success_when_failure(self):
         tw = TaskRequest(mytask.name, uuid(), [1], {'f': 'x'})
         tw.time_start = 1
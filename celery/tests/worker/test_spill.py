@@ -0,0 +1,179 @@
+from __future__ import absolute_import
+
+import sqlite3
+
+from mock import Mock
+
+from celery.worker.spill import ETASpill, ETASpillStep, ETAStore
+
+from celery.tests.case import AppCase, Case, body_from_sig
+
+
+class test_ETAStore(Case):
+
+    def setUp(self):
+        self.store = ETAStore(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_add_due_discard(self):
+        self.store.add('a', 30.0, {'id': 'a'}, {'routing_key': 'x'})
+        self.store.add('b', 10.0, {'id': 'b'})
+        self.store.add('c', 50.0, {'id': 'c'})
+        self.assertEqual(len(self.store), 3)
+
+        due = self.store.due(40.0)
+        self.assertListEqual(
+            due, [('b', 10.0, {'id': 'b'}, None),
+                  ('a', 30.0, {'id': 'a'}, {'routing_key': 'x'})],
+        )
+
+        self.store.discard('b')
+        self.assertListEqual([d[0] for d in self.store.due(40.0)], ['a'])
+        self.assertEqual(len(self.store), 2)
+
+    def test_add_replaces(self):
+        self.store.add('a', 30.0, {'id': 'a'})
+        self.store.add('a', 20.0, {'id': 'a'})
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.due(25.0)[0][1], 20.0)
+
+    def test_add_many(self):
+        self.store.add_many([('a', 30.0, {'id': 'a'}, None),
+                             ('b', 10.0, {'id': 'b'}, None)])
+        self.assertListEqual([d[0] for d in self.store.due(40.0)], ['b', 'a'])
+
+    def test_add_many_rolls_back(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.add_many([('a', 30.0, {'id': 'a'}, None),
+                                 ('b', None, {'id': 'b'}, None)])
+        self.assertEqual(len(self.store), 0)
+
+
+class test_ETASpill(AppCase):
+
+    def setup(self):
+
+        @self.app.task()
+        def add(x, y):
+            return x + y
+        self.add = add
+        self.store = ETAStore(':memory:')
+        self.c = Mock(name='consumer')
+        self.c.app = self.app
+        self.spill = ETASpill(self.c, self.store, 60.0)
+
+    def teardown(self):
+        self.store.close()
+
+    def get_request(self, sig):
+        req = Mock(name='request')
+        req.request_dict = body_from_sig(self.app, sig)
+        req.id = req.request_dict['id']
+        req.delivery_info = {'routing_key': 'celery'}
+        return req
+
+    def test_should_spill(self):
+        self.assertTrue(self.spill.should_spill(200.0, now=lambda: 100.0))
+        self.assertFalse(self.spill.should_spill(150.0, now=lambda: 100.0))
+
+    def test_spill(self):
+        req = self.get_request(self.add.s(2, 2))
+        self.assertTrue(self.spill.spill(req, 1000.0))
+        req.acknowledge.assert_called_with()
+        self.assertEqual(len(self.store), 1)
+
+    def test_spill_fails(self):
+        self.spill.store = Mock()
+        self.spill.store.add_many.side_effect = IOError()
+        req = self.get_request(self.add.s(2, 2))
+        self.assertFalse(self.spill.spill(req, 1000.0))
+        self.assertFalse(req.acknowledge.called)
+
+    def test_spill_many(self):
+        reqs = [self.get_request(self.add.s(i, i)) for i in range(3)]
+        reqs[1].decode.side_effect = ValueError()
+        self.spill.store = Mock()
+        failed = self.spill.spill_many([(req, 1000.0) for req in reqs])
+        self.assertListEqual(failed, [(reqs[1], 1000.0)])
+        items, = self.spill.store.add_many.call_args[0]
+        self.assertListEqual([item[0] for item in items],
+                             [reqs[0].id, reqs[2].id])
+        reqs[0].acknowledge.assert_called_with()
+        reqs[2].acknowledge.assert_called_with()
+        self.assertFalse(reqs[1].acknowledge.called)
+
+    def test_spill_many_fails(self):
+        reqs = [self.get_request(self.add.s(i, i)) for i in range(2)]
+        self.spill.store = Mock()
+        self.spill.store.add_many.side_effect = IOError()
+        pairs = [(req, 1000.0) for req in reqs]
+        self.assertListEqual(self.spill.spill_many(pairs), pairs)
+        self.assertFalse(any(req.acknowledge.called for req in reqs))
+
+    def test_load(self):
+        req = self.get_request(self.add.s(2, 2))
+        self.spill.spill(req, 1000.0)
+        self.spill.load(now=lambda: 100.0)
+        self.assertFalse(self.c.timer.apply_at.called)
+
+        self.spill.load(now=lambda: 950.0)
+        self.c.qos.increment_eventually.assert_called_with()
+        eta, fun, args = self.c.timer.apply_at.call_args[0]
+        self.assertEqual(eta, 1000.0)
+        self.assertIs(fun, self.c.apply_eta_task)
+        loaded = args[0]
+        self.assertEqual(loaded.id, req.id)
+        self.assertEqual(loaded.delivery_info['routing_key'], 'celery')
+        self.assertIn(req.id, self.spill.loaded)
+
+        # not loaded twice
+        self.spill.load(now=lambda: 950.0)
+        self.assertEqual(self.c.timer.apply_at.call_count, 1)
+
+        # acknowledging the request removes it from the store.
+        loaded.acknowledge()
+        self.assertFalse(self.spill.loaded)
+        self.assertEqual(len(self.store), 0)
+
+    def test_load_unknown_task(self):
+        self.store.add('a', 10.0, {'task': 'x.missing', 'id': 'a'})
+        self.spill.load(now=lambda: 10.0)
+        self.assertFalse(self.c.timer.apply_at.called)
+        self.assertEqual(len(self.store), 0)
+
+    def test_clear_and_info(self):
+        self.spill.loaded.add('a')
+        self.assertEqual(self.spill.info()['loaded'], 1)
+        self.spill.clear()
+        self.assertFalse(self.spill.loaded)
+
+
+class test_ETASpillStep(AppCase):
+
+    def test_disabled_by_default(self):
+        c = Mock()
+        c.app = self.app
+        step = ETASpillStep(c)
+        self.assertFalse(step.enabled)
+        self.assertIsNone(c.eta_spill)
+
+    def test_enabled(self):
+        c = Mock()
+        c.app = self.app
+        step = ETASpillStep(c, eta_spill_horizon=600, eta_spill_db=':memory:')
+        self.assertTrue(step.enabled)
+        step.create(c)
+        self.assertIsInstance(c.eta_spill, ETASpill)
+        c.eta_spill.load = Mock()
+
+        step.start(c)
+        c.eta_spill.load.assert_called_with()
+        c.timer.apply_interval.assert_called_with(
+            60.0 * 1000.0, c.eta_spill.load,
+        )
+        self.assertIn('eta_spill', step.info(c))
+
+        step.shutdown(c)
+        c.timer.apply_interval.return_value.cancel.assert_called_with()
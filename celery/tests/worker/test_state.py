@@ -1,5 +1,10 @@
 from __future__ import absolute_import
 
+import json
+import os
+import shutil
+import tempfile
+
 from mock import Mock, patch
 from time import time
 
@@ -23,6 +28,8 @@ class StateResetCase(Case):
     def reset_state(self):
         state.active_requests.clear()
         state.revoked.clear()
+        state.revoked.on_change = None
+        state.revoked_versions.clear()
         state.total_count.clear()
 
     def on_setup(self):
@@ -127,6 +134,27 @@ class test_Persistent(StateResetCase):
         for item in data2:
             self.assertIn(item, self.p.db['revoked'])
 
+    def test_revoked_versions(self):
+        state.revoked_versions['A@example.com'] = 10.0
+        self.p.sync(self.p.db)
+        state.revoked_versions.clear()
+        self.p.merge(self.p.db)
+        self.assertDictEqual(state.revoked_versions,
+                             {'A@example.com': 10.0})
+
+
+class test_pack_revoked(Case):
+
+    def test_pack_unpack(self):
+        ids = ['1ed9ec2b-d0e9-4b56-9cf6-e2ee2b0d2e46',
+               '1ED9EC2B-D0E9-4B56-9CF6-E2EE2B0D2E46', 'foo', 313]
+        packed = state.pack_revoked(ids)
+        self.assertListEqual(packed['other'], ids[1:])
+        self.assertItemsEqual(state.unpack_revoked(packed), ids)
+        self.assertListEqual(
+            state.unpack_revoked(state.pack_revoked([])), [],
+        )
+
 
 class SimpleReq(object):
 
@@ -156,3 +184,106 @@ class test_state(StateResetCase):
         for request in requests:
             state.task_ready(request)
         self.assertEqual(len(state.active_requests), 0)
+
+
+class test_JournalPersistent(StateResetCase):
+
+    def on_setup(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'celery-state')
+
+    def on_teardown(self):
+        shutil.rmtree(self.dir)
+
+    def journal(self):
+        with open(self.filename + '.journal') as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_revokes_appended(self):
+        p = state.JournalPersistent(self.filename)
+        state.revoked.add('foo', now=lambda: 1.0)
+        state.revoked.add('bar', now=lambda: 1.0)
+        self.assertListEqual(
+            self.journal(), [['r', 1.0, 'foo'], ['r', 1.0, 'bar']],
+        )
+        state.revoked.discard('foo')
+        state.revoked.discard('foo')
+        self.assertListEqual(self.journal()[2:], [['d', 'foo']])
+        p.close()
+
+    def test_expired_appended(self):
+        p = state.JournalPersistent(self.filename)
+        state.revoked.maxlen, state.revoked.expires = 1, None
+        try:
+            state.revoked.add('foo', now=lambda: 1.0)
+            state.revoked.add('bar', now=lambda: 2.0)
+        finally:
+            state.revoked.maxlen = state.REVOKES_MAX
+            state.revoked.expires = state.REVOKE_EXPIRES
+        self.assertListEqual(
+            self.journal(),
+            [['r', 1.0, 'foo'], ['x', 'foo'], ['r', 2.0, 'bar']],
+        )
+        p.close()
+
+    def test_sync_clock(self):
+        clock = Mock()
+        clock.forward.return_value = 313
+        p = state.JournalPersistent(self.filename, clock)
+        p.save()
+        self.assertListEqual(self.journal(), [['c', 313]])
+        self.assertFalse(p._is_open)
+
+    def test_revoked_versions(self):
+        p = state.JournalPersistent(self.filename)
+        state.revoked_versions['A@example.com'] = 10.0
+        p.save()
+        self.assertListEqual(self.journal(),
+                             [['v', {'A@example.com': 10.0}]])
+        state.revoked_versions.clear()
+        state.JournalPersistent(self.filename).close()
+        self.assertDictEqual(state.revoked_versions,
+                             {'A@example.com': 10.0})
+
+    def test_replay(self):
+        p = state.JournalPersistent(self.filename)
+        state.revoked.add('foo', now=lambda: 1.0)
+        state.revoked.add('bar', now=lambda: 2.0)
+        state.revoked.add('baz', now=lambda: 2.0)
+        state.revoked.discard('baz')
+        p.save()
+        with open(self.filename + '.journal', 'a') as fh:
+            fh.write('["c", 626]\n["r", 3.0, ')  # incomplete record
+        state.revoked.clear()
+        state.revoked.on_change = None
+
+        clock = Mock()
+        p = state.JournalPersistent(self.filename, clock)
+        self.assertEqual(state.revoked._data, {'foo': 1.0, 'bar': 2.0})
+        clock.adjust.assert_called_with(626)
+        self.assertEqual(p._records, 5)
+        self.assertEqual(state.revoked.on_change, p.on_revoked_change)
+        p.close()
+
+    def test_compact(self):
+        p = state.JournalPersistent(self.filename)
+        p.compact_min = 2
+        for i in range(2):
+            state.revoked.add('id{0}'.format(i), now=lambda: 1.0 + i)
+        self.assertEqual(p._records, 2)
+        p._records = 10
+        # too many records, so writes a snapshot instead.
+        state.revoked.add('id2', now=lambda: 3.0)
+        self.assertTrue(os.path.exists(self.filename))
+        self.assertListEqual(self.journal(), [])
+        self.assertEqual(p._records, 0)
+        state.revoked.add('id3', now=lambda: 10.0)
+        p.save()
+        state.revoked.clear()
+        state.revoked.on_change = None
+
+        p = state.JournalPersistent(self.filename)
+        self.assertItemsEqual(
+            list(state.revoked), ['id0', 'id1', 'id2', 'id3'],
+        )
+        p.close()
@@ -4,6 +4,7 @@ from collections import defaultdict
 from contextlib import contextmanager
 from mock import Mock, patch
 
+from kombu.serialization import dumps
 from kombu.utils.limits import TokenBucket
 
 from celery import Celery
@@ -28,6 +29,14 @@ class test_default_strategy(AppCase):
         def __call__(self, **kwargs):
             return self.s(self.message, self.body, self.message.ack, **kwargs)
 
+        def batch(self, revoked_ids=None, received=None):
+            requests = self.s.batch(
+                [(self.message, self.body, self.message.ack)],
+                revoked_ids, received,
+            )
+            self.s.dispatch(requests)
+            return requests
+
         def was_reserved(self):
             return self.reserved.called
 
@@ -63,7 +72,8 @@ class test_default_strategy(AppCase):
 
     @contextmanager
     def _context(self, sig,
-                 rate_limits=True, events=True, utc=True, limit=None):
+                 rate_limits=True, events=True, utc=True, limit=None,
+                 eta_spill=None, raw=False):
         self.assertTrue(sig.type.Strategy)
 
         reserved = Mock()
@@ -73,12 +83,19 @@ class test_default_strategy(AppCase):
             bucket = TokenBucket(rate(limit), capacity=1)
             consumer.task_buckets[sig.task] = bucket
         consumer.disable_rate_limits = not rate_limits
+        consumer.eta_spill = eta_spill
+        consumer.pool_raw_messages = raw
         consumer.event_dispatcher.enabled = events
         s = sig.type.start_strategy(self.c, consumer, task_reserved=reserved)
         self.assertTrue(s)
 
         message = Mock()
         body = body_from_sig(self.c, sig, utc=utc)
+        if raw:
+            (message.content_type, message.content_encoding,
+             message.body) = dumps(body, serializer='json')
+            body = dict((key, body[key]) for key in (
+                'task', 'id', 'eta', 'expires', 'utc'))
 
         yield self.Context(sig, s, reserved, consumer, message, body)
 
@@ -97,17 +114,88 @@ class test_default_strategy(AppCase):
             C.consumer.on_task.assert_called_with(req)
             self.assertTrue(C.event_sent())
 
+    def test_repr_maxlen(self):
+        prev, self.add.repr_maxlen = self.add.repr_maxlen, 5
+        try:
+            with self._context(self.add.s('x' * 100, 2)) as C:
+                C()
+                fields = C.event_sent()[1]
+                self.assertEqual(fields['args'], "('xxx...")
+                self.assertEqual(fields['kwargs'], '{}')
+        finally:
+            self.add.repr_maxlen = prev
+
+    def test_repr_maxlen_zero(self):
+        prev, self.add.repr_maxlen = self.add.repr_maxlen, 0
+        try:
+            with self._context(self.add.s(2, 2)) as C:
+                C()
+                fields = C.event_sent()[1]
+                self.assertNotIn('args', fields)
+                self.assertNotIn('kwargs', fields)
+        finally:
+            self.add.repr_maxlen = prev
+
     def test_when_events_disabled(self):
         with self._context(self.add.s(2, 2), events=False) as C:
             C()
             self.assertTrue(C.was_reserved())
             self.assertFalse(C.event_sent())
 
+    def test_raw_message(self):
+        with self._context(self.add.s(2, 2), events=False, raw=True) as C:
+            C()
+            self.assertTrue(C.was_reserved())
+            req = C.get_request()
+            self.assertEqual(req._payload[0], C.message.body)
+            self.assertEqual(req.args, [2, 2])
+            self.assertIsNone(req._payload)
+
+    def test_raw_message_events(self):
+        with self._context(self.add.s(2, 2), raw=True) as C:
+            C()
+            fields = C.event_sent()[1]
+            self.assertNotIn('args', fields)
+            self.assertNotIn('kwargs', fields)
+            self.assertFalse(C.get_request().decoded)
+
+    def test_batch_raw_message_not_decoded(self):
+        with self._context(self.add.s(2, 2), raw=True) as C:
+            # reported by the pool process when decoding the arguments.
+            C.message.body = '{"args": [2,'
+            received = []
+            C.batch(received=received)
+            self.assertTrue(C.was_reserved())
+            self.assertFalse(C.consumer.on_invalid_task.called)
+            self.assertNotIn('args', received[0])
+
     def test_eta_task(self):
         with self._context(self.add.s(2, 2).set(countdown=10)) as C:
             C()
             self.assertTrue(C.was_scheduled())
             C.consumer.qos.increment_eventually.assert_called_with()
+            # sent as received.
+            self.assertEqual(C.event_sent()[1]['eta'], C.body['eta'])
+
+    def test_eta_task_spilled(self):
+        spill = Mock(name='eta_spill')
+        spill.should_spill.return_value = True
+        spill.spill.return_value = True
+        with self._context(self.add.s(2, 2).set(countdown=3600),
+                           eta_spill=spill) as C:
+            C()
+            self.assertTrue(spill.spill.called)
+            self.assertFalse(C.consumer.timer.apply_at.called)
+            self.assertFalse(C.consumer.qos.increment_eventually.called)
+
+    def test_eta_task_spill_fails(self):
+        spill = Mock(name='eta_spill')
+        spill.should_spill.return_value = True
+        spill.spill.return_value = False
+        with self._context(self.add.s(2, 2).set(countdown=3600),
+                           eta_spill=spill) as C:
+            C()
+            self.assertTrue(C.was_scheduled())
 
     def test_eta_task_utc_disabled(self):
         with self._context(self.add.s(2, 2).set(countdown=10), utc=False) as C:
@@ -127,6 +215,75 @@ class test_default_strategy(AppCase):
             C()
             self.assertTrue(C.was_reserved())
 
+    def test_batch(self):
+        with self._context(self.add.s(2, 2)) as C:
+            received = []
+            C.batch(received=received)
+            self.assertTrue(C.was_reserved())
+            req = C.get_request()
+            C.consumer.on_task.assert_called_with(req)
+            self.assertFalse(C.event_sent())
+            self.assertEqual(received[0]['uuid'], req.id)
+
+    def test_batch_dispatched_separately(self):
+        with self._context(self.add.s(2, 2)) as C:
+            received = []
+            requests = C.s.batch(
+                [(C.message, C.body, C.message.ack)], None, received,
+            )
+            self.assertTrue(received)
+            self.assertFalse(C.was_reserved())
+            C.s.dispatch(requests)
+            self.assertTrue(C.was_reserved())
+
+    def test_batch_eta_task(self):
+        with self._context(self.add.s(2, 2).set(countdown=10)) as C:
+            C.batch()
+            self.assertTrue(C.was_scheduled())
+            C.consumer.qos.increment_eventually.assert_called_with(1)
+
+    def test_batch_eta_task_spilled(self):
+        spill = Mock(name='eta_spill')
+        spill.should_spill.return_value = True
+        spill.spill_many.return_value = []
+        with self._context(self.add.s(2, 2).set(countdown=3600),
+                           eta_spill=spill) as C:
+            req, = C.batch()
+            (spilled, ), _ = spill.spill_many.call_args
+            self.assertIs(spilled[0][0], req)
+            self.assertFalse(spill.spill.called)
+            self.assertFalse(C.consumer.timer.apply_at.called)
+            self.assertFalse(C.consumer.qos.increment_eventually.called)
+
+    def test_batch_eta_task_spill_fails(self):
+        spill = Mock(name='eta_spill')
+        spill.should_spill.return_value = True
+        spill.spill_many.side_effect = lambda spilled: spilled
+        with self._context(self.add.s(2, 2).set(countdown=3600),
+                           eta_spill=spill) as C:
+            C.batch()
+            self.assertTrue(C.was_scheduled())
+            C.consumer.qos.increment_eventually.assert_called_with(1)
+
+    def test_batch_when_revoked(self):
+        task = self.add.s(2, 2)
+        task.freeze()
+        state.revoked.add(task.id)
+        try:
+            with self._context(task) as C:
+                C.batch(revoked_ids=set([task.id]))
+                with self.assertRaises(ValueError):
+                    C.get_request()
+        finally:
+            state.revoked.discard(task.id)
+
+    def test_batch_invalid_task(self):
+        with self._context(self.add.s(2, 2)) as C:
+            C.body['kwargs'] = 'not a mapping'
+            C.batch()
+            self.assertFalse(C.was_reserved())
+            self.assertTrue(C.consumer.on_invalid_task.called)
+
     def test_when_revoked(self):
         task = self.add.s(2, 2)
         task.freeze()
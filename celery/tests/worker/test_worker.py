@@ -616,6 +616,7 @@ class test_Consumer(AppCase):
         l.steps.pop()
         l.event_dispatcher = Mock()
         l.event_dispatcher._outbound_buffer = deque()
+        l.event_dispatcher._batch = []
         backend = Mock()
         m = create_message(
             backend, task=foo_task.name,
@@ -1168,6 +1169,7 @@ class test_WorkController(AppCase):
         w.pool_cls = MockTaskPool
         w.use_eventloop = True
         w.consumer.restart_count = -1
+        w.max_memory_per_child = None
         pool = components.Pool(w)
         pool.create(w)
         self.assertIsInstance(w.semaphore, BoundedSemaphore)
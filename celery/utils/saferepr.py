@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.utils.saferepr
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Size bounded version of :func:`repr`.
+
+    The representation is built incrementally, so that converting
+    large data structures stops as soon as enough text has been
+    produced, instead of formatting everything just to truncate it
+    afterwards.
+
+"""
+from __future__ import absolute_import
+
+from kombu.utils.encoding import bytes_t, safe_repr
+
+from celery.five import items, string_t
+
+__all__ = ['saferepr', 'LazyRepr']
+
+#: Suffix added to representations that have been truncated.
+TRUNCATED = '...'
+
+
+def saferepr(o, maxlen=None):
+    """Safe version of :func:`repr`, returning at most ``maxlen``
+    characters (plus a ``...`` suffix if the text was truncated).
+    There is no limit if ``maxlen`` is :const:`None` or negative.
+
+    """
+    if maxlen is None or maxlen < 0:
+        return safe_repr(o)
+    parts, size = [], 0
+    for part in _saferepr(o, maxlen):
+        parts.append(part)
+        size += len(part)
+        if size > maxlen:
+            return ''.join(parts)[:maxlen] + TRUNCATED
+    return ''.join(parts)
+
+
+class _literal(str):
+    """Text yielded as-is by :func:`_saferepr`."""
+
+
+def _items(o, is_dict, end, sep=_literal(', '), colon=_literal(': ')):
+    for i, item in enumerate(items(o) if is_dict else o):
+        if i:
+            yield sep
+        if is_dict:
+            yield item[0]
+            yield colon
+            item = item[1]
+        yield item
+    yield _literal(end)
+
+
+def _saferepr(o, maxlen):
+    # containers are expanded using a stack instead of recursion,
+    # so that nesting depth is only limited by maxlen.
+    stack, seen = [(iter((o, )), None)], set()
+    while stack:
+        it, ident = stack[-1]
+        try:
+            o = next(it)
+        except StopIteration:
+            stack.pop()
+            seen.discard(ident)
+            continue
+        t = type(o)
+        if t is _literal:
+            yield o
+            continue
+        if isinstance(o, (string_t, bytes_t)):
+            # only the part of the string that can fit is formatted.
+            yield safe_repr(o[:maxlen + 1] if len(o) > maxlen else o)
+            continue
+        if t is dict:
+            begin, end = '{', '}'
+        elif t is list:
+            begin, end = '[', ']'
+        elif t is tuple:
+            begin, end = '(', ',)' if len(o) == 1 else ')'
+        else:
+            yield safe_repr(o)
+            continue
+        if not o:
+            yield begin + end
+            continue
+        ident = id(o)
+        if ident in seen:  # recursive
+            yield begin + TRUNCATED + end
+            continue
+        seen.add(ident)
+        yield begin
+        stack.append((_items(o, t is dict, end), ident))
+
+
+class LazyRepr(object):
+    """Object formatted using :func:`saferepr` (or a custom ``fun``) when
+    converted to string, used to only format values for log records
+    actually emitted."""
+    __slots__ = ('obj', 'maxlen', 'fun')
+
+    def __init__(self, obj, maxlen=None, fun=saferepr):
+        self.obj = obj
+        self.maxlen = maxlen
+        self.fun = fun
+
+    def __str__(self):
+        return self.fun(self.obj, self.maxlen)
+    __repr__ = __str__
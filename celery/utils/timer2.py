@@ -20,7 +20,8 @@ from itertools import count
 from time import time, sleep
 from weakref import proxy as weakrefproxy
 
-from celery.five import THREAD_TIMEOUT_MAX
+from celery.five import THREAD_TIMEOUT_MAX, values
+from celery.utils.imports import symbol_by_name
 from celery.utils.timeutils import timedelta_seconds, timezone
 from kombu.log import get_logger
 
@@ -43,7 +44,7 @@ class Entry(object):
     if not IS_PYPY:  # pragma: no cover
         __slots__ = (
             'fun', 'args', 'kwargs', 'tref', 'cancelled',
-            '_last_run', '__weakref__',
+            '_last_run', '_bucket', '__weakref__',
         )
 
     def __init__(self, fun, args=None, kwargs=None):
@@ -52,6 +53,7 @@ class Entry(object):
         self.kwargs = kwargs or {}
         self.tref = weakrefproxy(self)
         self._last_run = None
+        self._bucket = None
         self.cancelled = False
 
     def __call__(self):
@@ -62,6 +64,11 @@ class Entry(object):
             self.tref.cancelled = True
         except ReferenceError:  # pragma: no cover
             pass
+        # remove from timing wheel bucket (if any) right away.
+        bucket, self._bucket = self._bucket, None
+        if bucket is not None:
+            wheel, level, number = bucket
+            wheel.remove(self, level, number)
 
     def __repr__(self):
         return '<TimerEntry: {0}(*{1!r}, **{2!r})'.format(
@@ -103,6 +110,10 @@ class Schedule(object):
         self.max_interval = float(max_interval or DEFAULT_MAX_INTERVAL)
         self.on_error = on_error or self.on_error
         self._queue = []
+        #: Number of entries applied, and the number of seconds
+        #: they were applied after their eta (lag).
+        self.fired = 0
+        self.lag_total = self.lag_max = self.lag_last = 0.0
 
     def apply_entry(self, entry):
         try:
@@ -195,6 +206,7 @@ class Schedule(object):
 
                     if event is verify:
                         if not entry.cancelled:
+                            self._record_lag(now - eta)
                             yield None, entry
                         continue
                     else:
@@ -202,6 +214,23 @@ class Schedule(object):
             else:
                 yield None, None
 
+    def _record_lag(self, lag):
+        self.fired += 1
+        self.lag_total += lag
+        self.lag_last = lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+
+    def stats(self):
+        """Return dict with the number of entries applied, and
+        the average, max and last lag of applied entries."""
+        return {
+            'fired': self.fired,
+            'lag_avg': self.lag_total / self.fired if self.fired else 0.0,
+            'lag_max': self.lag_max,
+            'lag_last': self.lag_last,
+        }
+
     def empty(self):
         """Is the schedule empty?"""
         return not self._queue
@@ -224,6 +253,202 @@ class Schedule(object):
         return [_pop(v) for v in [events] * len(events)]
 
 
+class Wheel(object):
+    """Hierarchical timing wheel.
+
+    Time is divided into ticks of ``resolution`` seconds, and entries
+    are kept in buckets of ``slots ** level`` ticks, where the level is
+    chosen by how far into the future the entry is.  Entering and
+    removing an entry are O(1), and buckets are cascaded into the lower
+    levels as time advances.  Entries for the current tick are moved
+    into a small heap (:attr:`due`) so that they are still applied in
+    eta order.
+
+    """
+
+    def __init__(self, resolution=0.1, slots=64, levels=4, now=time):
+        self.resolution = resolution
+        self.slots = slots
+        self.widths = [slots ** i for i in range(levels)]
+        self.levels = [{} for _ in range(levels)]
+        self.due = []
+        self.current = int(now() / resolution)
+        #: First tick with a bucket that must be cascaded, or None.
+        self.next_tick = None
+        #: Number of entries in the wheel (including :attr:`due`).
+        self._count = 0
+
+    def __nonzero__(self):
+        return self._count > 0
+    __bool__ = __nonzero__
+
+    def __len__(self):
+        return self._count
+
+    def enter(self, eta, priority, entry):
+        self._count += 1
+        self._place(eta, priority, entry)
+
+    def pop(self, pop=heapq.heappop):
+        """Remove and return the first entry in :attr:`due`."""
+        item = pop(self.due)
+        self._count -= 1
+        return item
+
+    def remove(self, entry, level, number):
+        """Remove entry from the bucket it was entered into."""
+        bucket = level.get(number)
+        if bucket and bucket.pop(id(entry), None) is not None:
+            self._count -= 1
+            if not bucket:
+                level.pop(number, None)
+
+    def _place(self, eta, priority, entry, push=heapq.heappush):
+        tick = int(eta / self.resolution)
+        current = self.current
+        if tick <= current:
+            try:
+                entry._bucket = None
+            except AttributeError:
+                pass
+            return push(self.due, (eta, priority, entry))
+        slots, widths = self.slots, self.widths
+        if tick - current < slots:
+            i, number = 0, tick
+        else:
+            for i in range(1, len(widths)):
+                number = tick // widths[i]
+                if number - current // widths[i] < slots:
+                    break
+        level = self.levels[i]
+        bucket = level.get(number)
+        if bucket is None:
+            bucket = level[number] = {}
+        bucket[id(entry)] = (eta, priority, entry)
+        try:
+            entry._bucket = (self, level, number)
+        except AttributeError:
+            pass  # not a timer2 Entry, will be cancelled lazily.
+        start = number * widths[i]
+        if self.next_tick is None or start < self.next_tick:
+            self.next_tick = start
+
+    def advance(self, now):
+        """Cascade the buckets up to the current time."""
+        tick, next_tick = int(now / self.resolution), self.next_tick
+        if next_tick is not None and next_tick * self.resolution <= now:
+            # same as the time we told the caller to wake up at,
+            # which may differ from the tick because of rounding.
+            tick = max(tick, next_tick)
+        if tick <= self.current:
+            return
+        prev, self.current = self.current, tick
+        if next_tick is None or tick < next_tick:
+            return
+        for i in reversed(range(len(self.levels))):
+            level, width = self.levels[i], self.widths[i]
+            first, last = prev // width + 1, tick // width
+            if last < first or not level:
+                continue
+            if last - first < len(level):
+                numbers = range(first, last + 1)
+            else:
+                numbers = [n for n in list(level) if first <= n <= last]
+            for number in numbers:
+                bucket = level.pop(number, None)
+                if bucket:
+                    # list: bucket may be modified by cancel in other thread.
+                    for eta, priority, entry in list(values(bucket)):
+                        if getattr(entry, 'cancelled', False):
+                            self._count -= 1
+                        else:
+                            self._place(eta, priority, entry)
+        self.next_tick = min([
+            # list: buckets may be removed by cancel in other thread.
+            min(list(level)) * width
+            for level, width in zip(self.levels, self.widths) if level
+        ] or [None])
+
+    def clear(self):
+        self.due[:] = []
+        for level in self.levels:
+            level.clear()
+        self.next_tick = None
+        self._count = 0
+
+    def items(self):
+        items = list(self.due)
+        for level in self.levels:
+            for bucket in list(values(level)):
+                items.extend(list(values(bucket)))
+        return sorted(items, key=lambda item: item[:2])
+
+
+class TimingWheel(Schedule):
+    """ETA scheduler using a hierarchical timing wheel (:class:`Wheel`).
+
+    Unlike :class:`Schedule` cancelled entries are removed immediately,
+    and entering/cancelling entries does not depend on the number of
+    entries in the schedule, which is better suited for schedules with
+    a large number of entries (e.g. many ETA tasks and time limits).
+
+    :keyword resolution: Size of the smallest bucket in seconds.
+
+    """
+
+    def __init__(self, max_interval=None, on_error=None,
+                 resolution=0.1, **kwargs):
+        super(TimingWheel, self).__init__(max_interval, on_error, **kwargs)
+        self._queue = Wheel(resolution)
+
+    def _enter(self, eta, priority, entry):
+        self._queue.enter(eta, priority, entry)
+        return entry
+
+    def __iter__(self, min=min, nowfun=time):
+        max_interval = self.max_interval
+        wheel = self._queue
+        due = wheel.due
+
+        while 1:
+            now = nowfun()
+            wheel.advance(now)
+            if due:
+                eta, priority, entry = due[0]
+                if now < eta:
+                    yield min(eta - now, max_interval), None
+                else:
+                    wheel.pop()
+                    if not entry.cancelled:
+                        self._record_lag(now - eta)
+                        yield None, entry
+            elif wheel.next_tick is not None:
+                yield min(max(wheel.next_tick * wheel.resolution - now, 0),
+                          max_interval), None
+            else:
+                yield None, None
+
+    def clear(self):
+        self._queue.clear()
+
+    @property
+    def queue(self):
+        """Snapshot of underlying datastructure."""
+        return self._queue.items()
+
+
+SCHEDULE_ALIASES = {
+    'heap': 'celery.utils.timer2:Schedule',
+    'wheel': 'celery.utils.timer2:TimingWheel',
+}
+
+
+def get_schedule_cls(name):
+    """Return schedule class by name or alias
+    (``heap`` or ``wheel``)."""
+    return symbol_by_name(name, SCHEDULE_ALIASES)
+
+
 class Timer(threading.Thread):
     Entry = Entry
     Schedule = Schedule
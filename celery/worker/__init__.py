@@ -307,13 +307,21 @@ class WorkController(object):
     def setup_defaults(self, concurrency=None, loglevel=None, logfile=None,
                        send_events=None, pool_cls=None, consumer_cls=None,
                        timer_cls=None, timer_precision=None,
-                       autoscaler_cls=None, autoreloader_cls=None,
+                       timer_schedule=None,
+                       autoscaler_cls=None, autoscaler_policy=None,
+                       autoreloader_cls=None,
                        pool_putlocks=None, pool_restarts=None,
+                       pool_ring_size=None, pool_raw_messages=None,
+                       pool_spawner=None, pool_cpu_affinity=None,
+                       pool_reserved_cpus=None,
                        force_execv=None, state_db=None,
+                       state_db_format=None,
                        schedule_filename=None, scheduler_cls=None,
                        task_time_limit=None, task_soft_time_limit=None,
-                       max_tasks_per_child=None, prefetch_multiplier=None,
-                       disable_rate_limits=None, worker_lost_wait=None, **_kw):
+                       max_tasks_per_child=None, max_memory_per_child=None,
+                       prefetch_multiplier=None,
+                       disable_rate_limits=None, worker_lost_wait=None,
+                       task_batching=None, **_kw):
         self.concurrency = self._getopt('concurrency', concurrency)
         self.loglevel = self._getopt('log_level', loglevel)
         self.logfile = self._getopt('log_file', logfile)
@@ -322,12 +330,30 @@ class WorkController(object):
         self.consumer_cls = self._getopt('consumer', consumer_cls)
         self.timer_cls = self._getopt('timer', timer_cls)
         self.timer_precision = self._getopt('timer_precision', timer_precision)
+        self.timer_schedule = self._getopt('timer_schedule', timer_schedule)
         self.autoscaler_cls = self._getopt('autoscaler', autoscaler_cls)
+        self.autoscaler_policy = self._getopt(
+            'autoscaler_policy', autoscaler_policy,
+        )
         self.autoreloader_cls = self._getopt('autoreloader', autoreloader_cls)
         self.pool_putlocks = self._getopt('pool_putlocks', pool_putlocks)
         self.pool_restarts = self._getopt('pool_restarts', pool_restarts)
+        self.pool_ring_size = self._getopt('pool_ring_size', pool_ring_size)
+        self.pool_raw_messages = self._getopt(
+            'pool_raw_messages', pool_raw_messages,
+        )
+        self.pool_spawner = self._getopt('pool_spawner', pool_spawner)
+        self.pool_cpu_affinity = self._getopt(
+            'pool_cpu_affinity', pool_cpu_affinity,
+        )
+        self.pool_reserved_cpus = self._getopt(
+            'pool_reserved_cpus', pool_reserved_cpus,
+        )
         self.force_execv = self._getopt('force_execv', force_execv)
         self.state_db = self._getopt('state_db', state_db)
+        self.state_db_format = self._getopt(
+            'state_db_format', state_db_format,
+        )
         self.schedule_filename = self._getopt(
             'schedule_filename', schedule_filename,
         )
@@ -343,6 +369,9 @@ class WorkController(object):
         self.max_tasks_per_child = self._getopt(
             'max_tasks_per_child', max_tasks_per_child,
         )
+        self.max_memory_per_child = self._getopt(
+            'max_memory_per_child', max_memory_per_child,
+        )
         self.prefetch_multiplier = int(self._getopt(
             'prefetch_multiplier', prefetch_multiplier,
         ))
@@ -352,6 +381,7 @@ class WorkController(object):
         self.worker_lost_wait = self._getopt(
             'worker_lost_wait', worker_lost_wait,
         )
+        self.task_batching = self._getopt('task_batching', task_batching)
 
     def _getopt(self, key, value):
         if value is not None:
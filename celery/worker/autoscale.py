@@ -10,6 +10,9 @@
     The autoscale thread is only enabled if :option:`--autoscale`
     has been enabled on the command-line.
 
+    The number of processes wanted is decided by the autoscale policy,
+    see :setting:`CELERYD_AUTOSCALER_POLICY`.
+
 """
 from __future__ import absolute_import
 
@@ -17,8 +20,11 @@ import os
 import threading
 
 from functools import partial
+from math import ceil
 from time import sleep, time
 
+from kombu.utils import symbol_by_name
+
 from celery import bootsteps
 from celery.utils.log import get_logger
 from celery.utils.threads import bgThread
@@ -33,6 +39,192 @@ debug, info, error = logger.debug, logger.info, logger.error
 AUTOSCALE_KEEPALIVE = float(os.environ.get('AUTOSCALE_KEEPALIVE', 30))
 
 
+class Policy(object):
+    """Autoscale policy deciding the number of pool processes wanted.
+
+    :keyword app: The app of the worker.
+
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+
+    def target(self, processes):
+        """Return the number of processes wanted, ``processes``
+        is the current number of processes.  The result is limited to
+        the min/max concurrency by the autoscaler."""
+        raise NotImplementedError('subclass responsibility')
+
+    def start(self):
+        """Called when the autoscaler is started."""
+        pass
+
+    def close(self):
+        """Called when the autoscaler is stopped."""
+        pass
+
+    def info(self):
+        return {}
+
+
+class ReservedPolicy(Policy):
+    """Wants one process for every task reserved by the worker."""
+
+    def target(self, processes):
+        return len(state.reserved_requests)
+
+
+class PredictivePolicy(Policy):
+    """Policy using the task arrival rate, the average task runtime
+    and the backlog (reserved tasks plus messages waiting in the broker)
+    to predict the number of processes wanted.
+
+    The number of processes needed to keep up with the arrival rate
+    is the arrival rate multiplied by the average runtime, and
+    the backlog is to be processed within :attr:`drain_time` seconds.
+
+    To avoid oscillating, the pool is only scaled down when the target
+    is at least :attr:`hysteresis` lower than the current number
+    of processes, and it's never grown by more than :attr:`max_growth`
+    times in one step.
+
+    """
+
+    #: Smoothing factor of the arrival rate and runtime averages.
+    alpha = 0.3
+
+    #: Seconds wanted for processing the current backlog.
+    drain_time = 5.0
+
+    #: Relative decrease of the target needed to scale down.
+    hysteresis = 0.25
+
+    #: Max factor the number of processes is grown by in one step.
+    max_growth = 2.0
+
+    #: Minimum number of seconds between samples.
+    interval = 1.0
+
+    #: Number of seconds between checking the broker queue depth,
+    #: disabled if :const:`None`.
+    depth_interval = 10.0
+
+    #: Connection timeout used when checking the broker queue depth.
+    depth_timeout = 5.0
+
+    def __init__(self, app=None, queues=None):
+        super(PredictivePolicy, self).__init__(app)
+        self.queues = queues
+        self.mutex = threading.Lock()
+        self.rate = 0.0
+        self.runtime = None
+        self.depth = 0
+        self._completed = 0
+        self._last_reserved = len(state.reserved_requests)
+        self._last_sample = time()
+        self._last_depth = None
+        self._depth_thread = None
+        self._target = None
+
+    def start(self):
+        if self.on_task_ready not in state.task_ready_callbacks:
+            state.task_ready_callbacks.append(self.on_task_ready)
+
+    def on_task_ready(self, request):
+        time_start = getattr(request, 'time_start', None)
+        with self.mutex:
+            if time_start:
+                runtime = time() - time_start
+                self.runtime = (runtime if self.runtime is None
+                                else self._avg(self.runtime, runtime))
+            self._completed += 1
+
+    def target(self, processes):
+        now = time()
+        if self._target is None or now - self._last_sample >= self.interval:
+            self.sample(now)
+            self._target = self._limit(self.predict(), processes)
+        return self._target
+
+    def sample(self, now):
+        elapsed = max(now - self._last_sample, 1e-3)
+        reserved = len(state.reserved_requests)
+        with self.mutex:
+            completed, self._completed = self._completed, 0
+        # tasks arrived = tasks added to the reserved set + tasks completed.
+        arrived = max(reserved - self._last_reserved + completed, 0)
+        self.rate = self._avg(self.rate, arrived / elapsed)
+        self._last_reserved = reserved
+        self._last_sample = now
+        if self.depth_interval is not None and self.app is not None and (
+                self._last_depth is None or
+                now - self._last_depth >= self.depth_interval):
+            self._last_depth = now
+            self.update_depth()
+
+    def predict(self):
+        backlog = len(state.reserved_requests) + self.depth
+        if self.runtime is None:
+            # nothing to predict from yet.
+            return backlog
+        return int(ceil(self.rate * self.runtime +
+                        backlog * self.runtime / self.drain_time))
+
+    def _limit(self, target, processes):
+        if target > processes:
+            return min(target, max(int(processes * self.max_growth),
+                                   processes + 1))
+        elif target > processes * (1.0 - self.hysteresis):
+            return processes
+        return target
+
+    def update_depth(self):
+        """Update :attr:`depth` in a background thread, so the worker
+        is never blocked waiting for the broker."""
+        thread = self._depth_thread
+        if thread is None or not thread.is_alive():
+            thread = self._depth_thread = threading.Thread(
+                target=self._update_depth, name='AutoscaleDepth',
+            )
+            thread.daemon = True
+            thread.start()
+
+    def _update_depth(self):
+        depth = self.queue_depth()
+        if depth is not None:
+            self.depth = depth
+
+    def queue_depth(self):
+        """Return the number of messages waiting in the task queues
+        consumed from, or :const:`None` if it could not be retrieved
+        (tried again after :attr:`depth_interval` seconds)."""
+        queues = self.queues
+        if queues is None:
+            queues = list(self.app.amqp.queues.consume_from.values())
+        try:
+            with self.app.connection(
+                    connect_timeout=self.depth_timeout) as conn:
+                channel = conn.default_channel
+                return sum(queue(channel).queue_declare(passive=True)[1]
+                           for queue in queues)
+        except Exception as exc:
+            error('Autoscaler: cannot get queue depth: %r', exc,
+                  exc_info=True)
+
+    def _avg(self, avg, value):
+        return avg + self.alpha * (value - avg)
+
+    def close(self):
+        try:
+            state.task_ready_callbacks.remove(self.on_task_ready)
+        except ValueError:
+            pass
+
+    def info(self):
+        return {'rate': self.rate, 'runtime': self.runtime,
+                'depth': self.depth, 'target': self._target}
+
+
 class WorkerComponent(bootsteps.StartStopStep):
     label = 'Autoscaler'
     conditional = True
@@ -42,14 +234,20 @@ class WorkerComponent(bootsteps.StartStopStep):
         self.enabled = w.autoscale
         w.autoscaler = None
 
+    def create_policy(self, w):
+        if w.autoscaler_policy:
+            return symbol_by_name(w.autoscaler_policy)(app=w.app)
+
     def create_threaded(self, w):
         scaler = w.autoscaler = self.instantiate(
             w.autoscaler_cls,
             w.pool, w.max_concurrency, w.min_concurrency,
+            policy=self.create_policy(w),
         )
         return scaler
 
     def on_poll_init(self, scaler, hub):
+        scaler.policy.start()
         hub.on_task.append(scaler.maybe_scale)
         hub.timer.apply_interval(scaler.keepalive * 1000.0, scaler.maybe_scale)
 
@@ -57,7 +255,7 @@ class WorkerComponent(bootsteps.StartStopStep):
         scaler = w.autoscaler = self.instantiate(
             w.autoscaler_cls,
             w.pool, w.max_concurrency, w.min_concurrency,
-            mutex=DummyLock(),
+            mutex=DummyLock(), policy=self.create_policy(w),
         )
         w.hub.on_init.append(partial(self.on_poll_init, scaler))
 
@@ -65,21 +263,39 @@ class WorkerComponent(bootsteps.StartStopStep):
         return (self.create_ev if w.use_eventloop
                 else self.create_threaded)(w)
 
+    def stop(self, w):
+        super(WorkerComponent, self).stop(w)
+        if w.autoscaler is not None:
+            w.autoscaler.policy.close()
+
 
 class Autoscaler(bgThread):
+    Policy = PredictivePolicy
 
     def __init__(self, pool, max_concurrency,
-                 min_concurrency=0, keepalive=AUTOSCALE_KEEPALIVE, mutex=None):
+                 min_concurrency=0, keepalive=AUTOSCALE_KEEPALIVE, mutex=None,
+                 policy=None):
         super(Autoscaler, self).__init__()
         self.pool = pool
         self.mutex = mutex or threading.Lock()
         self.max_concurrency = max_concurrency
         self.min_concurrency = min_concurrency
         self.keepalive = keepalive
+        self.policy = policy or self.Policy()
         self._last_action = None
 
         assert self.keepalive, 'cannot scale down too fast.'
 
+    def start(self):
+        self.policy.start()
+        super(Autoscaler, self).start()
+
+    def stop(self):
+        try:
+            super(Autoscaler, self).stop()
+        finally:
+            self.policy.close()
+
     def body(self):
         with self.mutex:
             self.maybe_scale()
@@ -87,7 +303,7 @@ class Autoscaler(bgThread):
 
     def _maybe_scale(self):
         procs = self.processes
-        cur = min(self.qty, self.max_concurrency)
+        cur = min(self.policy.target(procs), self.max_concurrency)
         if cur > procs:
             self.scale_up(cur - procs)
             return True
@@ -153,7 +369,8 @@ class Autoscaler(bgThread):
         return {'max': self.max_concurrency,
                 'min': self.min_concurrency,
                 'current': self.processes,
-                'qty': self.qty}
+                'qty': self.qty,
+                'policy': self.policy.info()}
 
     @property
     def qty(self):
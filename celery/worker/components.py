@@ -16,7 +16,7 @@ from celery import bootsteps
 from celery.exceptions import ImproperlyConfigured
 from celery.five import string_t
 from celery.utils.log import worker_logger as logger
-from celery.utils.timer2 import Schedule
+from celery.utils.timer2 import get_schedule_cls
 
 from . import hub
 
@@ -39,10 +39,14 @@ class Hub(bootsteps.StartStopStep):
         return w.use_eventloop
 
     def create(self, w):
-        w.timer = Schedule(max_interval=10)
+        w.timer = get_schedule_cls(w.timer_schedule)(max_interval=10)
         w.hub = hub.Hub(w.timer)
         return w.hub
 
+    def info(self, w):
+        return {'timer': dict(w.timer.stats(),
+                              budget=w.hub.timer_budget)}
+
 
 class Queues(bootsteps.Step):
     """This bootstep initializes the internal queues
@@ -109,6 +113,7 @@ class Pool(bootsteps.StartStopStep):
             w.pool_cls, w.min_concurrency,
             initargs=(w.app, w.hostname),
             maxtasksperchild=w.max_tasks_per_child,
+            max_memory_per_child=w.max_memory_per_child,
             timeout=w.task_time_limit,
             soft_timeout=w.task_soft_time_limit,
             putlocks=w.pool_putlocks and threaded,
@@ -118,6 +123,10 @@ class Pool(bootsteps.StartStopStep):
             allow_restart=allow_restart,
             forking_enable=forking_enable,
             semaphore=semaphore,
+            ring_size=w.pool_ring_size,
+            spawner=w.pool_spawner,
+            cpu_affinity=w.pool_cpu_affinity,
+            reserved_cpus=w.pool_reserved_cpus,
         )
         if w.hub:
             w.hub.on_init.append(partial(pool.on_poll_init, w))
@@ -163,10 +172,20 @@ class Timer(bootsteps.Step):
             # Default Timer is set by the pool, as e.g. eventlet
             # needs a custom implementation.
             w.timer_cls = w.pool.Timer
+        options = {}
+        if not w.pool.is_green:
+            # green pools need the schedule provided by their timer.
+            options['schedule'] = get_schedule_cls(w.timer_schedule)(
+                max_interval=w.timer_precision,
+            )
         w.timer = self.instantiate(w.pool.Timer,
                                    max_interval=w.timer_precision,
                                    on_timer_error=self.on_timer_error,
-                                   on_timer_tick=self.on_timer_tick)
+                                   on_timer_tick=self.on_timer_tick,
+                                   **options)
+
+    def info(self, w):
+        return {'timer': w.timer.schedule.stats()}
 
     def on_timer_error(self, exc):
         logger.error('Timer error: %r', exc, exc_info=True)
@@ -183,7 +202,11 @@ class StateDB(bootsteps.Step):
         w._persistence = None
 
     def create(self, w):
-        w._persistence = w.state.Persistent(w.state_db, w.app.clock)
+        if w.state_db_format == 'journal':
+            Persistent = w.state.JournalPersistent
+        else:
+            Persistent = w.state.Persistent
+        w._persistence = Persistent(w.state_db, w.app.clock)
         atexit.register(w._persistence.save)
 
 
@@ -205,5 +228,7 @@ class Consumer(bootsteps.StartStopStep):
             hub=w.hub,
             worker_options=w.options,
             disable_rate_limits=w.disable_rate_limits,
+            task_batching=w.task_batching,
+            pool_raw_messages=w.pool_raw_messages,
         )
         return c
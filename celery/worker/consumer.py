@@ -16,9 +16,10 @@ import logging
 import os
 import socket
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import partial
 from heapq import heappush
+from itertools import groupby
 from operator import itemgetter
 from time import sleep
 
@@ -32,6 +33,7 @@ from kombu.utils.limits import TokenBucket
 
 from celery import bootsteps
 from celery.app import app_or_default
+from celery.app.amqp import ENVELOPE_HEADER
 from celery.canvas import subtask
 from celery.exceptions import InvalidTaskError
 from celery.five import items, values
@@ -44,6 +46,7 @@ from celery.utils.timeutils import humanize_seconds, rate
 
 from . import heartbeat, loops, pidbox
 from .state import task_reserved, maybe_shutdown, revoked, reserved_requests
+from .state import revoked_versions, unpack_revoked
 
 try:
     buffer_t = buffer
@@ -110,7 +113,24 @@ MESSAGE_REPORT = """\
 body: {0} {{content_type:{1} content_encoding:{2} delivery_info:{3}}}\
 """
 
-MINGLE_GET_FIELDS = itemgetter('clock', 'revoked')
+MINGLE_GET_FIELDS = itemgetter('clock', 'revoked_packed')
+
+
+class TaskBucket(TokenBucket):
+    """Token bucket used to rate limit a task type.
+
+    Requests that cannot be executed yet wait in the :attr:`contents`
+    FIFO, which is drained by a single timer entry for the bucket.
+
+    """
+
+    def __init__(self, fill_rate, capacity=1):
+        super(TaskBucket, self).__init__(fill_rate, capacity)
+        #: Pending ``(request, tokens)`` tuples, in the order received.
+        self.contents = deque()
+
+    def clear_pending(self):
+        self.contents.clear()
 
 
 def dump_body(m, body):
@@ -135,6 +155,10 @@ class Consumer(object):
     #: as sending heartbeats.
     timer = None
 
+    #: :class:`~celery.worker.spill.ETASpill` instance used to store
+    #: far-future ETA tasks on disk, if enabled.
+    eta_spill = None
+
     restart_count = -1  # first start is the same as a restart
 
     class Blueprint(bootsteps.Blueprint):
@@ -147,6 +171,8 @@ class Consumer(object):
             'celery.worker.consumer:Heart',
             'celery.worker.consumer:Control',
             'celery.worker.consumer:Tasks',
+            'celery.worker.prefetch:AdaptivePrefetch',
+            'celery.worker.spill:ETASpillStep',
             'celery.worker.consumer:Evloop',
             'celery.worker.consumer:Agent',
         ]
@@ -158,7 +184,8 @@ class Consumer(object):
                  init_callback=noop, hostname=None,
                  pool=None, app=None,
                  timer=None, controller=None, hub=None, amqheartbeat=None,
-                 worker_options=None, disable_rate_limits=False, **kwargs):
+                 worker_options=None, disable_rate_limits=False,
+                 task_batching=False, pool_raw_messages=False, **kwargs):
         self.app = app_or_default(app)
         self.controller = controller
         self.init_callback = init_callback
@@ -176,6 +203,8 @@ class Consumer(object):
         self.on_task = on_task
         self.amqheartbeat_rate = self.app.conf.BROKER_HEARTBEAT_CHECKRATE
         self.disable_rate_limits = disable_rate_limits
+        self.task_batching = task_batching
+        self.pool_raw_messages = pool_raw_messages
 
         # this contains a tokenbucket for each task type by name, used for
         # rate limits, or None if rate limits are disabled for that task.
@@ -209,7 +238,7 @@ class Consumer(object):
 
     def bucket_for_task(self, type):
         limit = rate(getattr(type, 'rate_limit', None))
-        return TokenBucket(limit, capacity=1) if limit else None
+        return TaskBucket(limit, capacity=1) if limit else None
 
     def reset_rate_limits(self):
         self.task_buckets.update(
@@ -217,15 +246,36 @@ class Consumer(object):
         )
 
     def _limit_task(self, request, bucket, tokens):
+        contents = bucket.contents
+        if contents:
+            # requests are already waiting for this bucket,
+            # and the timer draining them is already scheduled.
+            return contents.append((request, tokens))
         if not bucket.can_consume(tokens):
-            hold = bucket.expected_time(tokens)
-            self.timer.apply_after(
-                hold * 1000.0, self._limit_task, (request, bucket, tokens),
-            )
+            contents.append((request, tokens))
+            self._schedule_bucket(bucket, tokens)
         else:
             task_reserved(request)
             self.on_task(request)
 
+    def _schedule_bucket(self, bucket, tokens):
+        hold = bucket.expected_time(tokens)
+        self.timer.apply_after(
+            hold * 1000.0, self._drain_bucket, (bucket, ),
+        )
+
+    def _drain_bucket(self, bucket):
+        """Move the requests waiting for ``bucket`` to the pool,
+        in order, for as long as there are tokens available."""
+        contents = bucket.contents
+        while contents:
+            request, tokens = contents[0]
+            if not bucket.can_consume(tokens):
+                return self._schedule_bucket(bucket, tokens)
+            contents.popleft()
+            task_reserved(request)
+            self.on_task(request)
+
     def start(self):
         blueprint, loop = self.blueprint, self.loop
         while blueprint.state != CLOSE:
@@ -288,6 +338,32 @@ class Consumer(object):
              dump_body(message, message.body), exc_info=1)
         message.ack()
 
+    def on_task_message(self, message):
+        """Callback called for every task message received when
+        :setting:`CELERYD_POOL_RAW_MESSAGES` is enabled.
+
+        Only the envelope fields sent in the message headers are used
+        to create the request, and the message body is passed on
+        to the pool process undecoded.  Messages without these headers,
+        or for tasks using a custom strategy, are decoded as usual.
+
+        """
+        envelope = (message.headers or {}).get(ENVELOPE_HEADER)
+        accept = message.accept
+        body = None
+        if envelope and 'task' in envelope and 'id' in envelope and (
+                accept is None or message.content_type in accept):
+            strategy = self.strategies.get(envelope['task'])
+            if getattr(strategy, 'raw', False):
+                body = dict(envelope)
+        if body is None:
+            try:
+                body = message.decode()
+            except Exception as exc:
+                return self.on_decode_error(message, exc)
+        for callback in self.task_consumer.callbacks:
+            callback(body, message)
+
     def on_close(self):
         # Clear internal queues to get rid of old messages.
         # They can't be acked anyway, as a delivery tag is specific
@@ -296,6 +372,9 @@ class Consumer(object):
             self.controller.semaphore.clear()
         if self.timer:
             self.timer.clear()
+        for bucket in values(self.task_buckets):
+            if bucket:
+                bucket.clear_pending()
         reserved_requests.clear()
         if self.pool:
             self.pool.flush()
@@ -387,6 +466,8 @@ class Consumer(object):
             task.__trace__ = build_tracer(name, task, loader, self.hostname)
 
     def create_task_handler(self, callbacks):
+        if self.task_batching:
+            return self.create_batched_task_handler(callbacks)
         strategies = self.strategies
         on_unknown_message = self.on_unknown_message
         on_unknown_task = self.on_unknown_task
@@ -409,6 +490,85 @@ class Consumer(object):
 
         return on_task_received
 
+    def create_batched_task_handler(self, callbacks):
+        """Like :meth:`create_task_handler`, but messages are only
+        buffered until the ``flush`` attribute of the returned handler
+        is called, which the event loop does once every poll iteration.
+
+        The buffered messages are then handled as one batch: the revoked
+        set is only consulted once, ``task-received`` events are published
+        together before any of the tasks are dispatched, and the QoS
+        is only changed once.
+
+        """
+        strategies = self.strategies
+        on_unknown_message = self.on_unknown_message
+        on_unknown_task = self.on_unknown_task
+        on_invalid_task = self.on_invalid_task
+        pending = []
+
+        def on_task_received(body, message):
+            try:
+                name = body['task']
+            except (KeyError, TypeError):
+                return on_unknown_message(body, message)
+            pending.append((name, body, message))
+
+        def flush():
+            if not pending:
+                return
+            batch = pending[:]
+            del pending[:]
+            if callbacks:
+                [callback() for callback in callbacks]
+
+            revoked_ids = None
+            if revoked:
+                revoked_ids = set(
+                    body.get('id') for _, body, _ in batch
+                    if body.get('id') in revoked
+                )
+            dispatcher = self.event_dispatcher
+            received = [] if dispatcher and dispatcher.enabled else None
+
+            # consecutive messages for the same task type are handled
+            # by a single call to the strategy, keeping message order.
+            # Requests are only dispatched after the task-received events
+            # are sent, as the task may be executed right away.
+            dispatch = []
+            for name, run in groupby(batch, itemgetter(0)):
+                run = [(message, body, message.ack_log_error)
+                       for _, body, message in run]
+                try:
+                    strategy = strategies[name]
+                except KeyError as exc:
+                    for message, body, _ in run:
+                        on_unknown_task(body, message, exc)
+                    continue
+                handle_batch = getattr(strategy, 'batch', None)
+                if handle_batch is not None:
+                    requests = handle_batch(run, revoked_ids, received)
+                    dispatch.append((strategy.dispatch, (requests, )))
+                else:
+                    dispatch.append((handle_unbatched, (strategy, run)))
+
+            if received:
+                send_event = dispatcher.send
+                for fields in received:
+                    send_event('task-received', **fields)
+            for fun, args in dispatch:
+                fun(*args)
+
+        def handle_unbatched(strategy, run):
+            for message, body, ack in run:
+                try:
+                    strategy(message, body, ack)
+                except InvalidTaskError as exc:
+                    on_invalid_task(body, message, exc)
+        on_task_received.flush = flush
+
+        return on_task_received
+
 
 class Connection(bootsteps.StartStopStep):
 
@@ -438,6 +598,10 @@ class Events(bootsteps.StartStopStep):
     def __init__(self, c, send_events=None, **kwargs):
         self.send_events = True
         self.groups = None if send_events else ['worker']
+        conf = c.app.conf
+        self.batch_size = conf.CELERY_EVENT_BATCH_SIZE
+        self.batch_interval = conf.CELERY_EVENT_BATCH_INTERVAL
+        self._tref = None
         c.event_dispatcher = None
 
     def start(self, c):
@@ -446,12 +610,23 @@ class Events(bootsteps.StartStopStep):
         dis = c.event_dispatcher = c.app.events.Dispatcher(
             c.connection, hostname=c.hostname,
             enabled=self.send_events, groups=self.groups,
+            batch_size=self.batch_size, batch_interval=self.batch_interval,
         )
         if prev:
             dis.copy_buffer(prev)
             dis.flush()
+        if self.batch_size and self.batch_interval:
+            # the event loop flushes at the end of every iteration,
+            # this is for when the worker is idle.  Events are never
+            # buffered if the interval is zero.
+            self._tref = c.timer.apply_interval(
+                self.batch_interval * 1000.0, dis.flush_batch,
+            )
 
     def stop(self, c):
+        if self._tref is not None:
+            self._tref.cancel()
+            self._tref = None
         if c.event_dispatcher:
             ignore_errors(c, c.event_dispatcher.close)
             c.event_dispatcher = None
@@ -496,6 +671,7 @@ class Tasks(bootsteps.StartStopStep):
         c.update_strategies()
         c.task_consumer = c.app.amqp.TaskConsumer(
             c.connection, on_decode_error=c.on_decode_error,
+            on_message=c.on_task_message if c.pool_raw_messages else None,
         )
         c.qos = QoS(c.task_consumer.qos, self.initial_prefetch_count)
         c.qos.update()  # set initial prefetch count
@@ -529,29 +705,70 @@ class Agent(bootsteps.StartStopStep):
 
 
 class Mingle(bootsteps.StartStopStep):
+    """Synchronizes the logical clock and revoked tasks with the other
+    workers at startup.
+
+    All workers first reply with a summary of their revoked set,
+    and the revoked tasks are then only requested from the workers
+    whose revoked set changed since it was last received.  These workers
+    only reply with the tasks revoked since then, and the versions
+    received are kept in the worker state db (:option:`--statedb`),
+    so that also a restarted worker only receives the changes.
+
+    """
     label = 'Mingle'
     requires = (Connection, )
+    timeout = 1.0
 
     def __init__(self, c, enable_mingle=True, **kwargs):
         self.enabled = enable_mingle
 
     def start(self, c):
         info('mingle: searching for neighbors')
-        I = c.app.control.inspect(timeout=1.0, connection=c.connection)
-        replies = I.hello()
+        I = c.app.control.inspect(timeout=self.timeout,
+                                  connection=c.connection)
+        replies = I.hello(c.hostname, summary=True) or {}
+        replies.pop(c.hostname, None)
         if replies:
-            for reply in values(replies):
+            outdated = {}
+            for hostname, reply in items(replies):
                 try:
-                    other_clock, other_revoked = MINGLE_GET_FIELDS(reply)
-                except KeyError:  # reply from pre-3.1 worker
-                    pass
-                else:
-                    c.app.clock.adjust(other_clock)
-                    revoked.update(other_revoked)
+                    other_clock = reply['clock']
+                except (KeyError, TypeError):  # reply from pre-3.1 worker
+                    continue
+                c.app.clock.adjust(other_clock)
+                if 'revoked' in reply:
+                    # reply from older worker not supporting summaries.
+                    revoked.update(reply['revoked'])
+                elif reply['revoked_count'] and (
+                        reply['revoked_version'] !=
+                        revoked_versions.get(hostname)):
+                    outdated[hostname] = revoked_versions.get(hostname) or 0
+            if outdated:
+                self.sync_revoked(c, outdated)
             info('mingle: synced with %s', ', '.join(replies))
         else:
             info('mingle: no one here')
 
+    def sync_revoked(self, c, since):
+        """Merge the tasks revoked by other workers, ``since`` is
+        the version last received from each worker by hostname."""
+        I = c.app.control.inspect(destination=list(since),
+                                  timeout=self.timeout,
+                                  connection=c.connection)
+        replies = I.hello(c.hostname, revoked_since=since) or {}
+        for hostname, reply in items(replies):
+            try:
+                other_clock, packed = MINGLE_GET_FIELDS(reply)
+            except (KeyError, TypeError):
+                continue
+            c.app.clock.adjust(other_clock)
+            other_revoked = unpack_revoked(packed)
+            revoked.update(other_revoked)
+            revoked_versions[hostname] = reply.get('revoked_version')
+            debug('mingle: %s revoked tasks received from %s',
+                  len(other_revoked), hostname)
+
 
 class Gossip(bootsteps.ConsumerStep):
     label = 'Gossip'
@@ -10,7 +10,7 @@ from __future__ import absolute_import
 
 import tempfile
 
-from celery.five import UserDict, items, StringIO
+from celery.five import UserDict, items, values, StringIO
 from celery.platforms import signals as _signals
 from celery.utils import timeutils
 from celery.utils.log import get_logger
@@ -213,8 +213,30 @@ def dump_revoked(state, **kwargs):
 
 
 @Panel.register
-def hello(state, **kwargs):
-    return {'revoked': worker_state.revoked._data,
+def hello(state, from_node=None, revoked_since=None, summary=False,
+          **kwargs):
+    if from_node is not None and from_node == state.hostname:
+        return  # no need to sync with ourselves.
+    data = worker_state.revoked._data
+    # the insertion time of the most recently revoked task is used
+    # as the version of the revoked set.
+    version = max(values(data)) if data else 0
+    if summary:
+        return {'revoked_version': version,
+                'revoked_count': len(data),
+                'clock': state.app.clock.forward()}
+    if revoked_since is not None:
+        # revoked_since is the version last received from each worker,
+        # entries with the same insertion time are sent again
+        # as they may have been added after the version was taken.
+        since = revoked_since.get(state.hostname) or 0
+        logger.debug('mingle: sync with %s since %r', from_node, since)
+        return {'revoked_packed': worker_state.pack_revoked([
+                    id for id, inserted in items(data) if inserted >= since
+                ]),
+                'revoked_version': version,
+                'clock': state.app.clock.forward()}
+    return {'revoked': data,
             'clock': state.app.clock.forward()}
 
 
@@ -267,6 +289,14 @@ def pool_restart(state, modules=None, reload=False, reloader=None, **kwargs):
         raise ValueError('Pool restarts not enabled')
 
 
+@Panel.register
+def pool_max_memory(state, limit=None, **kwargs):
+    limit = int(limit or 0)
+    state.consumer.pool.set_max_memory_per_child(limit)
+    logger.info('New max memory per child: %s KiB', limit or 'no limit')
+    return {'ok': 'max memory per child set to {0}'.format(limit)}
+
+
 @Panel.register
 def autoscale(state, max=None, min=None):
     autoscaler = state.consumer.controller.autoscaler
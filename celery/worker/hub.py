@@ -8,6 +8,8 @@
 """
 from __future__ import absolute_import
 
+from time import time
+
 from kombu.utils import cached_property
 from kombu.utils import eventio
 from kombu.utils.eventio import READ, WRITE, ERR
@@ -141,6 +143,13 @@ class Hub(object):
     #: Takes no arguments.
     on_task = None
 
+    #: Max number of seconds :meth:`fire_timers` can spend applying
+    #: timers that are due.  This is doubled (up to
+    #: :attr:`max_timer_budget`) every time it is exceeded, and halved (down
+    #: to :attr:`min_timer_budget`) when all due timers were applied.
+    timer_budget = min_timer_budget = 0.02
+    max_timer_budget = 0.5
+
     def __init__(self, timer=None):
         self.timer = Schedule() if timer is None else timer
 
@@ -162,11 +171,22 @@ class Hub(object):
         for callback in self.on_init:
             callback(self)
 
-    def fire_timers(self, min_delay=1, max_delay=10, max_timers=10,
-                    propagate=()):
+    def fire_timers(self, min_delay=1, max_delay=10, max_timers=None,
+                    propagate=(), now=time):
+        """Apply timers that are due, and return the number of
+        seconds until the next timer is due (used as poll timeout).
+
+        Stops when :attr:`timer_budget` seconds have been spent
+        (or ``max_timers`` timers applied), in which case there may be
+        more timers due and zero is returned so that the next poll
+        does not block.
+
+        """
         delay = None
         if self.timer._queue:
-            for i in range(max_timers):
+            budget, fired = self.timer_budget, 0
+            time_start = now()
+            while 1:
                 delay, entry = next(self.scheduler)
                 if entry is None:
                     break
@@ -176,6 +196,11 @@ class Hub(object):
                     raise
                 except Exception as exc:
                     logger.error('Error in timer: %r', exc, exc_info=1)
+                fired += 1
+                if fired == max_timers or now() - time_start > budget:
+                    self.timer_budget = min(budget * 2, self.max_timer_budget)
+                    return 0
+            self.timer_budget = max(budget / 2, self.min_timer_budget)
         return min(max(delay or 0, min_delay), max_delay)
 
     def _add(self, fd, cb, flags):
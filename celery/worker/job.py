@@ -17,6 +17,7 @@ import sys
 from billiard.einfo import ExceptionInfo
 from datetime import datetime
 
+from kombu.serialization import loads
 from kombu.utils import kwdict, reprcall
 from kombu.utils.encoding import safe_repr, safe_str
 
@@ -29,12 +30,12 @@ from celery.exceptions import (
 )
 from celery.five import items
 from celery.platforms import signals as _signals
-from celery.task.trace import trace_task, trace_task_ret
+from celery.task.trace import trace_task, trace_task_ret, trace_task_message
 from celery.utils import fun_takes_kwargs
 from celery.utils.functional import noop
 from celery.utils.log import get_logger
+from celery.utils.saferepr import LazyRepr, saferepr
 from celery.utils.serialization import get_pickled_exception
-from celery.utils.text import truncate
 from celery.utils.timeutils import maybe_iso8601, timezone, maybe_make_aware
 
 from . import state
@@ -67,17 +68,32 @@ revoked_tasks = state.revoked
 
 NEEDS_KWDICT = sys.version_info <= (2, 6)
 
+#: Marks a lazily decoded request field that has not been accessed yet.
+NOT_DECODED = object()
+
 
 class Request(object):
-    """A request for task execution."""
+    """A request for task execution.
+
+    To keep reserved requests cheap the ``eta``, ``expires``
+    and ``delivery_info`` attributes are decoded lazily,
+    when first accessed.
+
+    If ``payload`` is set the body only contains the envelope fields,
+    and ``args`` and ``kwargs`` are decoded from the payload
+    when first accessed.  Unless that happens the payload is passed on
+    to the pool as-is.
+
+    """
     if not IS_PYPY:  # pragma: no cover
         __slots__ = (
-            'app', 'name', 'id', 'args', 'kwargs', 'on_ack', 'delivery_info',
-            'hostname', 'eventer', 'connection_errors', 'task', 'eta',
-            'expires', 'request_dict', 'acknowledged',
-            'utc', 'time_start', 'worker_pid', '_already_revoked',
-            '_terminate_on_ack',
-            '_tzlocal', '__weakref__',
+            'app', 'name', 'id', 'on_ack',
+            'hostname', 'eventer', 'connection_errors', 'request_dict',
+            'acknowledged', 'utc', 'time_start', 'worker_pid',
+            '_already_revoked', '_terminate_on_ack', '_tzlocal',
+            'task', '_eta', '_expires', '_delivery_info',
+            '_message_delivery_info', '_args', '_kwargs', '_payload',
+            '__weakref__',
         )
 
     #: Format string used to log task success.
@@ -105,61 +121,134 @@ class Request(object):
     def __init__(self, body, on_ack=noop,
                  hostname=None, eventer=None, app=None,
                  connection_errors=None, request_dict=None,
-                 delivery_info=None, task=None, **opts):
+                 delivery_info=None, task=None, payload=None, **opts):
         self.app = app or app_or_default(app)
         name = self.name = body['task']
         self.id = body['id']
-        self.args = body.get('args', [])
-        self.kwargs = body.get('kwargs', {})
-        try:
-            self.kwargs.items
-        except AttributeError:
-            raise InvalidTaskError(
-                'Task keyword arguments is not a mapping')
-        if NEEDS_KWDICT:
-            self.kwargs = kwdict(self.kwargs)
-        eta = body.get('eta')
-        expires = body.get('expires')
-        utc = self.utc = body.get('utc', False)
+        self._payload = payload
+        if payload is None:
+            self._set_arguments(body)
+        else:
+            self._args = self._kwargs = NOT_DECODED
+        self.utc = body.get('utc', False)
         self.on_ack = on_ack
         self.hostname = hostname or socket.gethostname()
         self.eventer = eventer
         self.connection_errors = connection_errors or ()
-        self.task = task or self.app.tasks[name]
         self.acknowledged = self._already_revoked = False
         self.time_start = self.worker_pid = self._terminate_on_ack = None
         self._tzlocal = None
+        self.task = task or self.app.tasks[name]
 
-        # timezone means the message is timezone-aware, and the only timezone
-        # supported at this point is UTC.
-        if eta is not None:
-            try:
-                self.eta = maybe_iso8601(eta)
-            except (AttributeError, ValueError, TypeError) as exc:
-                raise InvalidTaskError(
-                    'invalid eta value {0!r}: {1}'.format(eta, exc))
-            if utc:
-                self.eta = maybe_make_aware(self.eta, self.tzlocal)
-        else:
-            self.eta = None
-        if expires is not None:
+        # these are decoded when first accessed, the raw values are
+        # kept in the request dict and the message delivery info.
+        self._eta = self._expires = self._delivery_info = NOT_DECODED
+        self._message_delivery_info = delivery_info
+        self.request_dict = body
+
+    def _set_arguments(self, body):
+        self._args = body.get('args', [])
+        kwargs = body.get('kwargs', {})
+        try:
+            kwargs.items
+        except AttributeError:
+            raise InvalidTaskError(
+                'Task keyword arguments is not a mapping')
+        if NEEDS_KWDICT:
+            kwargs = kwdict(kwargs)
+        self._kwargs = kwargs
+
+    def decode(self):
+        """Decode the task arguments and the rest of the message body
+        from the raw payload, if the request was created with one."""
+        payload, self._payload = self._payload, None
+        if payload is not None:
             try:
-                self.expires = maybe_iso8601(expires)
-            except (AttributeError, ValueError, TypeError) as exc:
+                body = loads(*payload)
+                body.update(self.request_dict)
+            except Exception as exc:
+                self._args, self._kwargs = [], {}
                 raise InvalidTaskError(
-                    'invalid expires value {0!r}: {1}'.format(expires, exc))
-            if utc:
-                self.expires = maybe_make_aware(self.expires, self.tzlocal)
-        else:
-            self.expires = None
+                    'Cannot decode task message: {0!r}'.format(exc))
+            self.request_dict = body
+            self._set_arguments(body)
 
-        delivery_info = {} if delivery_info is None else delivery_info
-        self.delivery_info = {
-            'exchange': delivery_info.get('exchange'),
-            'routing_key': delivery_info.get('routing_key'),
-            'priority': delivery_info.get('priority'),
-        }
-        self.request_dict = body
+    @property
+    def decoded(self):
+        """False if the arguments are still to be decoded
+        from the raw payload."""
+        return self._payload is None
+
+    @property
+    def args(self):
+        if self._args is NOT_DECODED:
+            self.decode()
+        return self._args
+
+    @args.setter  # noqa
+    def args(self, value):
+        self._args = value
+
+    @property
+    def kwargs(self):
+        if self._kwargs is NOT_DECODED:
+            self.decode()
+        return self._kwargs
+
+    @kwargs.setter  # noqa
+    def kwargs(self, value):
+        self._kwargs = value
+
+    def _decode_time(self, field):
+        value = self.request_dict.get(field)
+        if value is None:
+            return
+        try:
+            value = maybe_iso8601(value)
+        except (AttributeError, ValueError, TypeError) as exc:
+            raise InvalidTaskError(
+                'invalid {0} value {1!r}: {2}'.format(field, value, exc))
+        # timezone means the message is timezone-aware, and the only
+        # timezone supported at this point is UTC.
+        if self.utc:
+            value = maybe_make_aware(value, self.tzlocal)
+        return value
+
+    @property
+    def eta(self):
+        if self._eta is NOT_DECODED:
+            self._eta = self._decode_time('eta')
+        return self._eta
+
+    @eta.setter  # noqa
+    def eta(self, value):
+        self._eta = value
+
+    @property
+    def expires(self):
+        if self._expires is NOT_DECODED:
+            self._expires = self._decode_time('expires')
+        return self._expires
+
+    @expires.setter  # noqa
+    def expires(self, value):
+        self._expires = value
+
+    @property
+    def delivery_info(self):
+        if self._delivery_info is NOT_DECODED:
+            delivery_info = self._message_delivery_info or {}
+            self._delivery_info = {
+                'exchange': delivery_info.get('exchange'),
+                'routing_key': delivery_info.get('routing_key'),
+                'priority': delivery_info.get('priority'),
+            }
+            self._message_delivery_info = None
+        return self._delivery_info
+
+    @delivery_info.setter  # noqa
+    def delivery_info(self, value):
+        self._delivery_info = value
 
     @classmethod
     def from_message(cls, message, body, **kwargs):
@@ -210,9 +299,11 @@ class Request(object):
             raise TaskRevokedError(self.id)
 
         hostname = self.hostname
-        kwargs = self.kwargs
-        if task.accept_magic_kwargs:
-            kwargs = self.extend_with_default_kwargs()
+        payload = self._payload
+        if payload is None or task.accept_magic_kwargs:
+            payload, kwargs = None, self.kwargs
+            if task.accept_magic_kwargs:
+                kwargs = self.extend_with_default_kwargs()
         request = self.request_dict
         request.update({'hostname': hostname, 'is_eager': False,
                         'delivery_info': self.delivery_info,
@@ -220,9 +311,14 @@ class Request(object):
         timeout, soft_timeout = request.get('timeouts', (None, None))
         timeout = timeout or task.time_limit
         soft_timeout = soft_timeout or task.soft_time_limit
-        result = pool.apply_async(trace_task_ret,
-                                  args=(self.name, self.id,
-                                        self.args, kwargs, request),
+        if payload is not None:
+            # the arguments are decoded by the pool process.
+            fun, args = trace_task_message, (self.name, self.id,
+                                             payload, request)
+        else:
+            fun, args = trace_task_ret, (self.name, self.id,
+                                         self.args, kwargs, request)
+        result = pool.apply_async(fun, args=args,
                                   accept_callback=self.on_accepted,
                                   timeout_callback=self.on_timeout,
                                   callback=self.on_success,
@@ -347,15 +443,18 @@ class Request(object):
         if self.eventer and self.eventer.enabled:
             now = time.time()
             runtime = self.time_start and (time.time() - self.time_start) or 0
-            self.send_event('task-succeeded',
-                            result=safe_repr(ret_value), runtime=runtime)
+            if self.repr_maxlen == 0:
+                self.send_event('task-succeeded', runtime=runtime)
+            else:
+                self.send_event('task-succeeded', runtime=runtime,
+                                result=saferepr(ret_value, self.repr_maxlen))
 
         if _does_info:
             now = now or time.time()
             runtime = self.time_start and (time.time() - self.time_start) or 0
             info(self.success_msg.strip(), {
                 'id': self.id, 'name': self.name,
-                'return_value': self.repr_result(ret_value),
+                'return_value': LazyRepr(ret_value, 46, self.repr_result),
                 'runtime': runtime})
 
     def on_retry(self, exc_info):
@@ -398,13 +497,17 @@ class Request(object):
 
     def _log_error(self, einfo, send_failed_event=True):
         einfo.exception = get_pickled_exception(einfo.exception)
+        try:
+            self.decode()
+        except InvalidTaskError:
+            pass  # the pool process reported this, logged without args.
         exception, traceback, exc_info, internal, sargs, skwargs = (
             safe_repr(einfo.exception),
             safe_str(einfo.traceback),
             einfo.exc_info,
             einfo.internal,
-            safe_repr(self.args),
-            safe_repr(self.kwargs),
+            saferepr(self.args, self.repr_maxlen),
+            saferepr(self.kwargs, self.repr_maxlen),
         )
         format = self.error_msg
         description = 'raised exception'
@@ -459,7 +562,14 @@ class Request(object):
     def repr_result(self, result, maxlen=46):
         # 46 is the length needed to fit
         #     'the quick brown fox jumps over the lazy dog' :)
-        return truncate(safe_repr(result), maxlen)
+        repr_maxlen = self.repr_maxlen
+        if repr_maxlen is not None and repr_maxlen >= 0:
+            maxlen = min(maxlen, repr_maxlen)
+        return saferepr(result, maxlen)
+
+    @property
+    def repr_maxlen(self):
+        return self.task.repr_maxlen
 
     def info(self, safe=False):
         return {'id': self.id,
@@ -25,6 +25,12 @@ logger = get_logger(__name__)
 error = logger.error
 
 
+def _event_flusher(obj):
+    dispatcher = obj.event_dispatcher
+    if dispatcher is not None and dispatcher.batch_size:
+        return dispatcher.flush_batch
+
+
 def asynloop(obj, connection, consumer, blueprint, hub, qos,
              heartbeat, clock, hbrate=2.0,
              sleep=sleep, min=min, Empty=Empty):
@@ -51,6 +57,8 @@ def asynloop(obj, connection, consumer, blueprint, hub, qos,
     hub_add, hub_remove = hub.add, hub.remove
 
     on_task_received = obj.create_task_handler(on_task_callbacks)
+    flush_tasks = getattr(on_task_received, 'flush', None)
+    flush_events = _event_flusher(obj)
 
     if heartbeat and connection.supports_heartbeats:
         hub.timer.apply_interval(
@@ -129,6 +137,12 @@ def asynloop(obj, connection, consumer, blueprint, hub, qos,
                         poll_timeout = 0
                     else:
                         connection.more_to_read = False
+                    if flush_tasks is not None:
+                        # handle the task messages received in this
+                        # iteration as a single batch.
+                        flush_tasks()
+                    if flush_events is not None:
+                        flush_events()
             else:
                 # no sockets yet, startup is probably not done.
                 sleep(min(poll_timeout, 0.1))
@@ -146,6 +160,8 @@ def synloop(obj, connection, consumer, blueprint, hub, qos,
     """Fallback blocking eventloop for transports that doesn't support AIO."""
 
     on_task_received = obj.create_task_handler([])
+    flush_tasks = getattr(on_task_received, 'flush', None)
+    flush_events = _event_flusher(obj)
     consumer.register_callback(on_task_received)
     consumer.consume()
 
@@ -162,3 +178,7 @@ def synloop(obj, connection, consumer, blueprint, hub, qos,
         except socket.error:
             if blueprint.state != CLOSE:
                 raise
+        if flush_tasks is not None:
+            flush_tasks()
+        if flush_events is not None:
+            flush_events()
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.worker.prefetch
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    This module implements the adaptive prefetch controller,
+    resizing the prefetch window (QoS) of the consumer based on
+    observed task runtimes.
+
+    The controller is only enabled if the
+    :setting:`CELERYD_PREFETCH_BUFFER_TIME` setting is set.
+
+"""
+from __future__ import absolute_import, division
+
+from collections import defaultdict
+from math import ceil
+from time import time
+
+from celery import bootsteps
+from celery.five import items, values
+from celery.utils.log import get_logger
+
+from . import state
+from .consumer import Tasks
+
+logger = get_logger(__name__)
+debug = logger.debug
+
+
+def ewma(prev, value, alpha):
+    """Exponentially weighted moving average, where ``prev``
+    can be :const:`None` if there is no previous value."""
+    if prev is None:
+        return value
+    return prev + alpha * (value - prev)
+
+
+class PrefetchController(object):
+    """Keeps the prefetch count at a level where every pool process
+    has roughly ``buffer_time`` seconds of work buffered.
+
+    The runtime and queue wait time (time from being reserved
+    until accepted by a pool process) is tracked for every task type
+    as an exponentially weighted moving average.  The prefetch count
+    is decided by the runtime, and reduced if tasks are waiting
+    longer than ``buffer_time`` to be accepted by a pool process.
+
+    :param qos: :class:`kombu.common.QoS` instance to control.
+    :param pool: The worker pool, used to find the current concurrency.
+    :param buffer_time: Seconds of work to keep buffered for every process.
+    :keyword alpha: Smoothing factor used for the moving averages.
+    :keyword min_per_process: Never prefetch less than this
+        many messages for every process.
+    :keyword max_per_process: Never prefetch more than this
+        many messages for every process.
+
+    """
+
+    def __init__(self, qos, pool, buffer_time, alpha=0.2,
+                 min_per_process=1, max_per_process=256):
+        self.qos = qos
+        self.pool = pool
+        self.buffer_time = buffer_time
+        self.alpha = alpha
+        self.min_per_process = min_per_process
+        self.max_per_process = max_per_process
+
+        #: Moving average of the runtime of every task type.
+        self.runtime = defaultdict(lambda: None)
+
+        #: Moving average of the queue wait time of every task type.
+        self.wait = defaultdict(lambda: None)
+
+        #: Tasks completed since the last update, by task type.
+        self.completed = defaultdict(int)
+
+        # time of reservation by task id.
+        self._reserved_at = {}
+
+        # the part of the prefetch count this controller is responsible
+        # for, the rest is increments made for ETA tasks.
+        self.prefetch_count = qos.value if qos is not None else None
+
+    def on_task_reserved(self, request, now=time):
+        self._reserved_at[request.id] = now()
+
+    def on_task_ready(self, request, now=time):
+        reserved_at = self._reserved_at.pop(request.id, None)
+        time_start = request.time_start
+        if time_start is None:  # never executed (e.g. revoked)
+            return
+        name, alpha = request.name, self.alpha
+        self.runtime[name] = ewma(
+            self.runtime[name], now() - time_start, alpha,
+        )
+        if reserved_at is not None:
+            self.wait[name] = ewma(
+                self.wait[name], max(time_start - reserved_at, 0), alpha,
+            )
+        self.completed[name] += 1
+
+    def expected(self):
+        """Return ``(runtime, wait)`` tuple with the average runtime
+        and queue wait time of the tasks completed since the last update,
+        or :const:`None` if none completed.
+
+        The wait time is :const:`None` if not known.
+
+        """
+        completed, self.completed = self.completed, defaultdict(int)
+        total = sum(values(completed))
+        if not total:
+            return
+        runtime, wait = self.runtime, self.wait
+        waits = [(count, wait.get(name)) for name, count in items(completed)
+                 if wait.get(name) is not None]
+        waited = sum(count for count, _ in waits)
+        return (
+            sum(count * runtime[name]
+                for name, count in items(completed)) / total,
+            sum(count * w for count, w in waits) / waited if waited else None,
+        )
+
+    def target(self, runtime, concurrency, wait=None):
+        buffer_time = self.buffer_time
+        per_process = buffer_time / runtime if runtime else 0
+        if wait and wait > buffer_time:
+            # messages are held for longer than the buffer time
+            # before a process is free to execute them.
+            per_process *= buffer_time / wait
+        per_process = max(min(per_process, self.max_per_process),
+                          self.min_per_process)
+        return int(ceil(concurrency * per_process))
+
+    def update(self):
+        expected = self.expected()
+        if expected is None:
+            return
+        runtime, wait = expected
+        new = self.target(runtime, max(self.pool.num_processes, 1), wait)
+        prev = self.prefetch_count
+        if prev and new == prev:
+            return
+        if prev and abs(new - prev) < max(prev * 0.1, 1):
+            return  # ignore small changes to avoid flapping.
+        debug('prefetch: %s -> %s (expected runtime: %.4fs, wait: %r)',
+              prev, new, runtime, wait)
+        if not prev:
+            self.qos.set(new)
+        elif new > prev:
+            self.qos.increment_eventually(new - prev)
+        else:
+            self.qos.decrement_eventually(prev - new)
+        self.prefetch_count = new
+
+    def clear(self):
+        self._reserved_at.clear()
+        self.completed.clear()
+
+    def info(self):
+        return {'prefetch_count': self.prefetch_count,
+                'buffer_time': self.buffer_time,
+                'runtime': dict(self.runtime),
+                'wait': dict(self.wait)}
+
+
+class AdaptivePrefetch(bootsteps.StartStopStep):
+    """Bootstep resizing the prefetch window using
+    :class:`PrefetchController`."""
+    label = 'Adaptive prefetch'
+    conditional = True
+    requires = (Tasks, )
+
+    #: How often the prefetch count is updated (in seconds).
+    interval = 1.0
+
+    def __init__(self, c, prefetch_buffer_time=None, **kwargs):
+        self.buffer_time = (prefetch_buffer_time or
+                            c.app.conf.CELERYD_PREFETCH_BUFFER_TIME)
+        self.enabled = bool(self.buffer_time)
+        self.controller = None
+        self._tref = None
+
+    def create(self, c):
+        controller = self.controller = c.prefetch_controller = (
+            PrefetchController(None, c.pool, self.buffer_time)
+        )
+        on_task, on_task_reserved = c.on_task, controller.on_task_reserved
+
+        def on_task_with_stats(request):
+            on_task_reserved(request)
+            return on_task(request)
+        c.on_task = on_task_with_stats
+
+    def start(self, c):
+        controller = self.controller
+        controller.qos = c.qos
+        controller.prefetch_count = c.qos.value
+        state.task_ready_callbacks.append(controller.on_task_ready)
+        self._tref = c.timer.apply_interval(
+            self.interval * 1000.0, controller.update,
+        )
+
+    def stop(self, c):
+        if self._tref is not None:
+            self._tref.cancel()
+            self._tref = None
+        try:
+            state.task_ready_callbacks.remove(self.controller.on_task_ready)
+        except ValueError:
+            pass
+        self.controller.clear()
+    shutdown = stop
+
+    def info(self, c):
+        return {'adaptive_prefetch': self.controller.info()}
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.worker.spill
+    ~~~~~~~~~~~~~~~~~~~
+
+    Disk-backed store for tasks with a far-future ETA/countdown.
+
+    Instead of keeping these in memory (and in the prefetch window)
+    until they are due, tasks with an ETA beyond the
+    :setting:`CELERYD_ETA_SPILL_HORIZON` are written to a local
+    sqlite database and acknowledged.  They are loaded back into
+    the timer as they approach their due time, and the database
+    is recovered when the worker restarts.
+
+"""
+from __future__ import absolute_import
+
+import sqlite3
+import threading
+
+from functools import partial
+from time import time
+
+from kombu.serialization import pickle, pickle_protocol
+
+from celery import bootsteps
+from celery.utils.log import get_logger
+
+from .consumer import Tasks
+from .job import Request
+
+logger = get_logger(__name__)
+debug, error = logger.debug, logger.error
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS eta (
+    id TEXT PRIMARY KEY,
+    eta REAL NOT NULL,
+    data BLOB NOT NULL
+)\
+"""
+INDEX = 'CREATE INDEX IF NOT EXISTS eta_by_time ON eta (eta)'
+
+
+class ETAStore(object):
+    """Persistent index of task messages ordered by ETA.
+
+    :param filename: Path to the sqlite database.
+
+    """
+    protocol = pickle_protocol
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.mutex = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute(SCHEMA)
+        self.db.execute(INDEX)
+        self.db.commit()
+
+    def add(self, id, eta, body, delivery_info=None):
+        self.add_many([(id, eta, body, delivery_info)])
+
+    def add_many(self, items):
+        """Store ``(id, eta, body, delivery_info)`` tuples,
+        committed in a single transaction."""
+        protocol = self.protocol
+        rows = [(id, eta, sqlite3.Binary(pickle.dumps(
+                    (body, delivery_info), protocol=protocol)))
+                for id, eta, body, delivery_info in items]
+        with self.mutex:
+            # commits, or rolls back if any of the rows fail.
+            with self.db:
+                self.db.executemany(
+                    'INSERT OR REPLACE INTO eta (id, eta, data) '
+                    'VALUES (?, ?, ?)', rows,
+                )
+
+    def discard(self, id):
+        with self.mutex:
+            self.db.execute('DELETE FROM eta WHERE id = ?', (id, ))
+            self.db.commit()
+
+    def due(self, before):
+        """Return list of ``(id, eta, body, delivery_info)`` tuples
+        for the tasks due before the ``before`` timestamp,
+        ordered by ETA."""
+        with self.mutex:
+            rows = self.db.execute(
+                'SELECT id, eta, data FROM eta WHERE eta <= ? ORDER BY eta',
+                (before, ),
+            ).fetchall()
+        return [(id, eta) + tuple(pickle.loads(bytes(data)))
+                for id, eta, data in rows]
+
+    def __len__(self):
+        with self.mutex:
+            return self.db.execute('SELECT COUNT(*) FROM eta').fetchone()[0]
+
+    def close(self):
+        with self.mutex:
+            self.db.close()
+
+
+class ETASpill(object):
+    """Moves far-future ETA tasks between the consumer and
+    an :class:`ETAStore`.
+
+    :param consumer: The worker consumer.
+    :param store: The :class:`ETAStore` instance to use.
+    :param horizon: Tasks due further than this number of seconds
+        into the future are spilled to the store.
+
+    """
+    Request = Request
+
+    def __init__(self, consumer, store, horizon):
+        self.consumer = consumer
+        self.store = store
+        self.horizon = horizon
+        # ids of the stored tasks currently loaded into the timer.
+        self.loaded = set()
+
+    def should_spill(self, eta, now=time):
+        return eta > now() + self.horizon
+
+    def spill(self, request, eta):
+        """Write request to the store and acknowledge the message,
+        returns :const:`False` if the request could not be stored."""
+        return not self.spill_many([(request, eta)])
+
+    def spill_many(self, requests):
+        """Write ``(request, eta)`` pairs to the store in a single
+        transaction, and acknowledge the messages once committed.
+
+        Returns the list of pairs that could not be stored.
+
+        """
+        failed, items, stored = [], [], []
+        for request, eta in requests:
+            try:
+                request.decode()
+            except Exception as exc:
+                error('Cannot spill ETA task %s to disk: %r',
+                      request.id, exc, exc_info=True)
+                failed.append((request, eta))
+                continue
+            items.append((request.id, eta, request.request_dict,
+                          request.delivery_info))
+            stored.append((request, eta))
+        if items:
+            try:
+                self.store.add_many(items)
+            except Exception as exc:
+                error('Cannot spill %s ETA tasks to disk: %r',
+                      len(items), exc, exc_info=True)
+                return failed + stored
+        for request, _ in stored:
+            request.acknowledge()
+        return failed
+
+    def load(self, now=time):
+        """Move tasks that are due within the horizon to the timer."""
+        c = self.consumer
+        loaded = self.loaded
+        for id, eta, body, delivery_info in self.store.due(
+                now() + self.horizon):
+            if id in loaded:
+                continue
+            try:
+                request = self.Request(
+                    body, on_ack=partial(self.on_ack, id),
+                    app=c.app, hostname=c.hostname,
+                    eventer=c.event_dispatcher,
+                    connection_errors=c.connection_errors,
+                    delivery_info=delivery_info,
+                    task=c.app.tasks[body['task']],
+                )
+            except Exception as exc:
+                error('Discarding stored ETA task %s: %r',
+                      id, exc, exc_info=True)
+                self.store.discard(id)
+                continue
+            loaded.add(id)
+            c.qos.increment_eventually()
+            c.timer.apply_at(eta, c.apply_eta_task, (request, ), priority=6)
+        if loaded:
+            debug('eta spill: %s tasks loaded', len(loaded))
+
+    def on_ack(self, id, *args):
+        self.loaded.discard(id)
+        self.store.discard(id)
+
+    def clear(self):
+        self.loaded.clear()
+
+    def info(self):
+        return {'horizon': self.horizon,
+                'loaded': len(self.loaded),
+                'stored': len(self.store)}
+
+
+class ETASpillStep(bootsteps.StartStopStep):
+    """Bootstep enabling the ETA spill store if the
+    :setting:`CELERYD_ETA_SPILL_HORIZON` setting is set."""
+    label = 'ETA spill'
+    conditional = True
+    requires = (Tasks, )
+
+    def __init__(self, c, eta_spill_horizon=None, eta_spill_db=None,
+                 **kwargs):
+        conf = c.app.conf
+        self.horizon = eta_spill_horizon or conf.CELERYD_ETA_SPILL_HORIZON
+        self.filename = (eta_spill_db or conf.CELERYD_ETA_SPILL_DB or
+                         '{0}.eta.db'.format(c.hostname))
+        self.enabled = bool(self.horizon)
+        self._tref = None
+        c.eta_spill = None
+
+    def create(self, c):
+        c.eta_spill = ETASpill(c, ETAStore(self.filename), self.horizon)
+
+    def start(self, c):
+        # check for due tasks at least four times within the horizon.
+        interval = min(self.horizon / 4.0, 60.0)
+        c.eta_spill.load()
+        self._tref = c.timer.apply_interval(
+            interval * 1000.0, c.eta_spill.load,
+        )
+
+    def stop(self, c):
+        if self._tref is not None:
+            self._tref.cancel()
+            self._tref = None
+        if c.eta_spill:
+            # the timer is cleared when the connection is lost,
+            # so everything must be loaded again at restart.
+            c.eta_spill.clear()
+
+    def shutdown(self, c):
+        self.stop(c)
+        if c.eta_spill:
+            c.eta_spill.store.close()
+
+    def info(self, c):
+        return {'eta_spill': c.eta_spill.info()}
@@ -11,18 +11,24 @@
 """
 from __future__ import absolute_import
 
+import json
 import os
 import sys
 import platform
 import shelve
 
-from kombu.serialization import pickle_protocol
+from base64 import b64decode, b64encode
+from heapq import heapify
+from uuid import UUID
+
+from kombu.serialization import pickle, pickle_protocol
 from kombu.utils import cached_property
+from kombu.utils.encoding import bytes_to_str
 
 from celery import __version__
 from celery.datastructures import LimitedSet
 from celery.exceptions import SystemTerminate
-from celery.five import Counter
+from celery.five import Counter, items
 
 #: Worker software/platform information.
 SOFTWARE_INFO = {'sw_ident': 'py-celery',
@@ -48,9 +54,16 @@ total_count = Counter()
 #: the list of currently revoked tasks.  Persistent if statedb set.
 revoked = LimitedSet(maxlen=REVOKES_MAX, expires=REVOKE_EXPIRES)
 
+#: Version of the revoked set last received from other workers,
+#: by hostname.  Persistent if statedb set.
+revoked_versions = {}
+
 #: Updates global state when a task has been reserved.
 task_reserved = reserved_requests.add
 
+#: List of callbacks applied with the request when a task is ready.
+task_ready_callbacks = []
+
 should_stop = False
 should_terminate = False
 
@@ -68,10 +81,38 @@ def task_accepted(request):
     total_count[request.name] += 1
 
 
+def pack_revoked(ids):
+    """Encode a list of revoked task ids compactly, task ids that
+    are UUIDs are stored as 16 bytes each (see :func:`unpack_revoked`)."""
+    uuids, other = [], []
+    for id in ids:
+        try:
+            uuid = UUID(id)
+        except (AttributeError, TypeError, ValueError):
+            other.append(id)
+            continue
+        if str(uuid) == id:
+            uuids.append(uuid.bytes)
+        else:
+            other.append(id)
+    return {'uuids': bytes_to_str(b64encode(b''.join(uuids))),
+            'other': other}
+
+
+def unpack_revoked(packed):
+    """Decode task ids encoded by :func:`pack_revoked`."""
+    uuids = b64decode(packed['uuids'])
+    return [str(UUID(bytes=uuids[i:i + 16]))
+            for i in range(0, len(uuids), 16)] + packed['other']
+
+
 def task_ready(request):
     """Updates global state when a task is ready."""
     active_requests.discard(request)
     reserved_requests.discard(request)
+    if task_ready_callbacks:
+        for callback in task_ready_callbacks:
+            callback(request)
 
 
 C_BENCH = os.environ.get('C_BENCH') or os.environ.get('CELERY_BENCH')
@@ -135,7 +176,8 @@ class Persistent(object):
     """This is the persistent data stored by the worker when
     :option:`--statedb` is enabled.
 
-    It currently only stores revoked task id's.
+    It currently only stores revoked task id's, and the versions of the
+    revoked sets received from other workers.
 
     """
     storage = shelve
@@ -160,6 +202,7 @@ class Persistent(object):
             # (pre 3.0.18) used to be stored as dict
             for item in saved:
                 revoked.add(item)
+        revoked_versions.update(d.get('revoked_versions') or {})
         if self.clock:
             d['clock'] = self.clock.adjust(d.get('clock') or 0)
         return d
@@ -167,6 +210,7 @@ class Persistent(object):
     def sync(self, d):
         revoked.purge()
         d['revoked'] = revoked
+        d['revoked_versions'] = dict(revoked_versions)
         if self.clock:
             d['clock'] = self.clock.forward()
         return d
@@ -188,3 +232,131 @@ class Persistent(object):
     def db(self):
         self._is_open = True
         return self.open()
+
+
+class JournalPersistent(Persistent):
+    """Persistent worker state stored as a snapshot and
+    an append-only journal.
+
+    Used instead of :class:`Persistent` when the
+    :setting:`CELERYD_STATE_DB_FORMAT` setting is ``"journal"``.
+
+    Every change to the revoked set (task revoked, discarded or expired)
+    is appended to the journal (:file:`<filename>.journal`) as it
+    happens, and the clock and the versions of the revoked sets of
+    other workers (see :class:`~celery.worker.consumer.Mingle`)
+    are appended when the state is saved.
+    The journal is compacted into a new snapshot (:file:`<filename>`)
+    when it has more records than twice the number of revoked tasks
+    in memory.  Both files are replayed when the worker starts.
+
+    """
+    #: Never compact a journal with fewer records than this.
+    compact_min = 1000
+
+    #: Journal record types by :attr:`LimitedSet.on_change` operation.
+    record_types = {'add': 'r', 'discard': 'd', 'expire': 'x'}
+
+    def __init__(self, filename, clock=None):
+        self.snapshot_filename = filename
+        self.journal_filename = filename + '.journal'
+        self._journal = None
+        self._records = 0
+        super(JournalPersistent, self).__init__(filename, clock)
+        revoked.on_change = self.on_revoked_change
+
+    def on_revoked_change(self, op, id, inserted):
+        if op == 'add':
+            self.append(['r', inserted, id])
+        else:
+            self.append([self.record_types[op], id])
+
+    def save(self):
+        self.sync()
+        self.close()
+
+    def sync(self, d=None):
+        if self.clock:
+            self.append(['c', self.clock.forward()])
+        if revoked_versions:
+            self.append(['v', revoked_versions])
+
+    def append(self, *records):
+        """Append records to the journal, compacting it
+        if it has grown too large."""
+        if self._records + len(records) > max(self.compact_min,
+                                              2 * len(revoked)):
+            self.compact()
+        else:
+            self._append(records)
+
+    def compact(self):
+        """Write a new snapshot and truncate the journal."""
+        snapshot = {'revoked': revoked._data,
+                    'revoked_versions': revoked_versions,
+                    'clock': self.clock.forward() if self.clock else 0}
+        tmp = self.snapshot_filename + '.tmp'
+        with open(tmp, 'wb') as fh:
+            pickle.dump(snapshot, fh, protocol=self.protocol)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(tmp, self.snapshot_filename)
+        # a crash before the journal is truncated only means
+        # the same records are replayed twice.
+        self.close()
+        open(self.journal_filename, 'w').close()
+        self._records = 0
+
+    def _append(self, records):
+        if self._journal is None:
+            self._journal = open(self.journal_filename, 'a')
+            self._is_open = True
+        self._journal.write(''.join(
+            json.dumps(record) + '\n' for record in records
+        ))
+        self._journal.flush()
+        self._records += len(records)
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._is_open = False
+
+    def _load(self):
+        data, versions, clock = {}, {}, 0
+        try:
+            with open(self.snapshot_filename, 'rb') as fh:
+                snapshot = pickle.load(fh)
+            data, clock = snapshot['revoked'], snapshot['clock']
+            versions = snapshot.get('revoked_versions') or {}
+        except (IOError, OSError):
+            pass
+        data, clock = self._replay(data, versions, clock)
+        heap = [(inserted, id) for id, inserted in items(data)]
+        heapify(heap)
+        self.merge({'revoked': LimitedSet(data=data, heap=heap),
+                    'revoked_versions': versions,
+                    'clock': clock})
+
+    def _replay(self, data, versions, clock):
+        try:
+            fh = open(self.journal_filename)
+        except (IOError, OSError):
+            return data, clock
+        with fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # incomplete record written at crash.
+                if record[0] == 'r':
+                    data[record[2]] = record[1]
+                elif record[0] in ('d', 'x'):
+                    data.pop(record[1], None)
+                elif record[0] == 'c':
+                    clock = max(clock, record[1])
+                elif record[0] == 'v':
+                    versions.update(record[1])
+                self._records += 1
+        return data, clock
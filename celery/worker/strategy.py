@@ -10,9 +10,11 @@ from __future__ import absolute_import
 
 import logging
 
-from kombu.utils.encoding import safe_repr
+from datetime import datetime
 
+from celery.exceptions import InvalidTaskError
 from celery.utils.log import get_logger
+from celery.utils.saferepr import saferepr
 from celery.utils.timer2 import to_timestamp
 from celery.utils.timeutils import timezone
 
@@ -38,12 +40,75 @@ def default(task, app, consumer,
     bucket = consumer.task_buckets[task.name]
     handle = consumer.on_task
     limit_task = consumer._limit_task
+    on_invalid_task = consumer.on_invalid_task
+    eta_spill = consumer.eta_spill
+    repr_maxlen = task.repr_maxlen
+    raw_messages = consumer.pool_raw_messages
+
+    def received_fields(req):
+        body = req.request_dict
+        fields = dict(
+            uuid=req.id, name=req.name,
+            retries=body.get('retries', 0),
+            # sent as received, so that these are not decoded for
+            # the event only.
+            eta=_isoformat(body.get('eta')),
+            expires=_isoformat(body.get('expires')),
+        )
+        # the arguments of raw messages are only decoded by
+        # the pool process, so these are not included.
+        if repr_maxlen != 0 and req.decoded:
+            fields.update(args=saferepr(req.args, repr_maxlen),
+                          kwargs=saferepr(req.kwargs, repr_maxlen))
+        return fields
+
+    def payload(message, body):
+        # raw messages only have the envelope fields decoded,
+        # see Consumer.on_task_message.
+        if raw_messages and 'args' not in body:
+            return (message.body, message.content_type,
+                    message.content_encoding)
+
+    def eta_timestamp(req, to_timestamp=to_timestamp):
+        try:
+            if req.utc:
+                return to_timestamp(to_system_tz(req.eta))
+            return to_timestamp(req.eta, timezone.local)
+        except OverflowError as exc:
+            error("Couldn't convert eta %s to timestamp: %r. Task: %r",
+                  req.eta, exc, req.info(safe=True), exc_info=True)
+            req.acknowledge()
+
+    def apply_eta(req, eta):
+        timer_apply_at(
+            eta, apply_eta_task, (req, ), priority=6,
+        )
+
+    def schedule_eta(req, to_timestamp=to_timestamp):
+        eta = eta_timestamp(req, to_timestamp)
+        if eta is None:
+            return False
+        if eta_spill is not None and eta_spill.should_spill(eta):
+            # far-future tasks are written to disk and acknowledged,
+            # to be loaded back into the timer later.
+            if eta_spill.spill(req, eta):
+                return False
+        apply_eta(req, eta)
+        return True
+
+    def reserve(req):
+        if rate_limits_enabled:
+            if bucket:
+                return limit_task(req, bucket, 1)
+        task_reserved(req)
+        handle(req)
 
     def task_message_handler(message, body, ack, to_timestamp=to_timestamp):
         req = Req(body, on_ack=ack, app=app, hostname=hostname,
                   eventer=eventer, task=task,
                   connection_errors=connection_errors,
-                  delivery_info=message.delivery_info)
+                  delivery_info=message.delivery_info,
+                  payload=payload(message, body))
         if req.revoked():
             return
 
@@ -51,35 +116,83 @@ def default(task, app, consumer,
             info('Got task from broker: %s', req)
 
         if events:
-            send_event(
-                'task-received',
-                uuid=req.id, name=req.name,
-                args=safe_repr(req.args), kwargs=safe_repr(req.kwargs),
-                retries=req.request_dict.get('retries', 0),
-                eta=req.eta and req.eta.isoformat(),
-                expires=req.expires and req.expires.isoformat(),
-            )
+            send_event('task-received', **received_fields(req))
 
         if req.eta:
+            if schedule_eta(req, to_timestamp):
+                consumer.qos.increment_eventually()
+        else:
+            reserve(req)
+
+    def task_batch_handler(messages, revoked_ids=None, received=None):
+        """Create requests for a batch of ``(message, body, ack)`` tuples
+        received in the same event loop iteration.
+
+        Returns the list of requests to pass to :func:`dispatch_batch`,
+        which should be called after the :event:`task-received` events
+        have been sent.
+
+        :keyword revoked_ids: Ids in this batch found in the revoked set,
+            only these (and expiring tasks) need a revocation check.
+        :keyword received: List to add :event:`task-received` event fields
+            to, so that the caller can publish them together.
+
+        """
+        requests = []
+        for message, body, ack in messages:
             try:
-                if req.utc:
-                    eta = to_timestamp(to_system_tz(req.eta))
+                req = Req(body, on_ack=ack, app=app, hostname=hostname,
+                          eventer=eventer, task=task,
+                          connection_errors=connection_errors,
+                          delivery_info=message.delivery_info,
+                          payload=payload(message, body))
+                # decoded here, so that invalid fields are handled.
+                eta, expires = req.eta, req.expires
+            except InvalidTaskError as exc:
+                on_invalid_task(body, message, exc)
+                continue
+            if expires or (revoked_ids and req.id in revoked_ids):
+                if req.revoked():
+                    continue
+
+            if _does_info:
+                info('Got task from broker: %s', req)
+
+            if events and received is not None:
+                received.append(received_fields(req))
+            requests.append(req)
+        return requests
+
+    def dispatch_batch(requests):
+        """Schedule or reserve the requests returned by
+        :func:`task_batch_handler`."""
+        etas, spilled = 0, []
+        for req in requests:
+            if req.eta:
+                eta = eta_timestamp(req)
+                if eta is None:
+                    continue
+                if eta_spill is not None and eta_spill.should_spill(eta):
+                    spilled.append((req, eta))
                 else:
-                    eta = to_timestamp(req.eta, timezone.local)
-            except OverflowError as exc:
-                error("Couldn't convert eta %s to timestamp: %r. Task: %r",
-                      req.eta, exc, req.info(safe=True), exc_info=True)
-                req.acknowledge()
+                    apply_eta(req, eta)
+                    etas += 1
             else:
-                consumer.qos.increment_eventually()
-                timer_apply_at(
-                    eta, apply_eta_task, (req, ), priority=6,
-                )
-        else:
-            if rate_limits_enabled:
-                if bucket:
-                    return limit_task(req, bucket, 1)
-            task_reserved(req)
-            handle(req)
+                reserve(req)
+        if spilled:
+            # written to disk in a single transaction,
+            # the requests that could not be stored stay in the timer.
+            for req, eta in eta_spill.spill_many(spilled):
+                apply_eta(req, eta)
+                etas += 1
+        if etas:
+            consumer.qos.increment_eventually(etas)
+    task_message_handler.batch = task_batch_handler
+    task_message_handler.dispatch = dispatch_batch
+    task_message_handler.raw = True
 
     return task_message_handler
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
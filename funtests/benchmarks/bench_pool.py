@@ -0,0 +1,97 @@
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import time
+
+from types import GeneratorType
+
+from celery import Celery
+from celery.concurrency import processes
+from celery.datastructures import AttributeDict
+from celery.five import range
+from celery.worker.hub import Hub, READ, WRITE
+
+DEFAULT_ITS = 100000
+DEFAULT_CONCURRENCY = 4
+
+#: Set to 1 to compare with writing a single job at a time.
+JOBS_PER_WRITE = os.environ.get('BENCH_JOBS_PER_WRITE')
+if JOBS_PER_WRITE:
+    processes.MAX_JOBS_PER_WRITE = int(JOBS_PER_WRITE)
+
+app = Celery(__name__, set_as_current=False)
+
+
+def noop(i):
+    return i
+
+
+def start_pool(concurrency):
+    pool = processes.TaskPool(concurrency, threads=False, putlocks=False,
+                              initargs=(app, 'bench_pool'))
+    pool.start()
+    hub = Hub()
+    hub.start()
+    pool.on_poll_init(AttributeDict(consumer=AttributeDict(restart_count=0)),
+                      hub)
+    return pool, hub
+
+
+def loop(pool, hub, until):
+    readers, writers = hub.readers, hub.writers
+    poll = hub.poller.poll
+    while not until():
+        pool.on_poll_start(hub)
+        for fileno, event in poll(hub.fire_timers()) or ():
+            if event & READ:
+                cb = readers.get(fileno)
+            elif event & WRITE:
+                cb = writers.get(fileno)
+            else:
+                cb = readers.get(fileno) or writers.get(fileno)
+            if cb is None:
+                continue
+            if isinstance(cb, GeneratorType):
+                try:
+                    next(cb)
+                except StopIteration:
+                    hub.remove(fileno)
+            else:
+                cb(fileno, event)
+
+
+def bench_apply(n=DEFAULT_ITS, concurrency=DEFAULT_CONCURRENCY):
+    pool, hub = start_pool(concurrency)
+    done = [0]
+
+    def on_ready(result):
+        done[0] += 1
+
+    try:
+        time_start = time.time()
+        for i in range(n):
+            pool.apply_async(noop, (i, ), callback=on_ready)
+        loop(pool, hub, lambda: done[0] >= n)
+        total = time.time() - time_start
+        print('-- {0} tasks, {1} processes, {2} jobs/write: '
+              '{3:.2f}s total, {4:.0f} tasks/s'.format(
+                  n, concurrency, processes.MAX_JOBS_PER_WRITE,
+                  total, n / total))
+    finally:
+        pool.terminate()
+        hub.close()
+
+
+def main(argv=sys.argv):
+    if len(argv) > 1 and argv[1] in ('-h', '--help'):
+        print('Usage: {0} [n={1}] [concurrency={2}]'.format(
+            os.path.basename(argv[0]), DEFAULT_ITS, DEFAULT_CONCURRENCY))
+        return sys.exit(1)
+    n = int(argv[1]) if len(argv) > 1 else DEFAULT_ITS
+    concurrency = int(argv[2]) if len(argv) > 2 else DEFAULT_CONCURRENCY
+    bench_apply(n, concurrency)
+
+
+if __name__ == '__main__':
+    main()
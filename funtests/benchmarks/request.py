@@ -0,0 +1,145 @@
+"""Compares the time spent receiving task messages in the worker,
+and the memory used by the requests reserved.
+
+The messages are passed to the task strategy (as done by the consumer
+for every task message received), and the :class:`EagerRequest` below
+decodes all fields when created, like the worker did before fields
+were decoded lazily.
+
+Usage::
+
+    $ python funtests/benchmarks/request.py [N]
+
+"""
+from __future__ import absolute_import, print_function
+
+import gc
+import socket
+import sys
+
+from datetime import datetime, timedelta
+from time import time
+
+from celery import Celery, uuid
+from celery.five import range
+from celery.utils.debug import humanbytes, ps
+from celery.utils.functional import noop
+from celery.worker import strategy
+from celery.worker.job import Request
+
+DEFAULT_ITS = 100000
+
+app = Celery(set_as_current=False)
+
+
+@app.task()
+def T(x, y):
+    pass
+
+
+class EagerRequest(Request):
+    __slots__ = ()
+
+    def __init__(self, body, delivery_info=None, **kwargs):
+        super(EagerRequest, self).__init__(
+            body, delivery_info=delivery_info, **kwargs
+        )
+        self.eta, self.expires, self.delivery_info = (
+            self.eta, self.expires, dict(self.delivery_info),
+        )
+
+
+class Message(object):
+    delivery_info = {'exchange': 'celery', 'routing_key': 'celery',
+                     'priority': 0, 'redelivered': False}
+
+    def __init__(self, body):
+        self.body = body
+
+
+class Dispatcher(object):
+    """Event dispatcher not sending the events."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+
+    def send(self, type, **fields):
+        pass
+
+
+class Consumer(object):
+    """The parts of the worker consumer used by the task strategy."""
+    hostname = socket.gethostname()
+    connection_errors = ()
+    disable_rate_limits = True
+    eta_spill = None
+    pool_raw_messages = False
+
+    def __init__(self, events=False):
+        self.reserved = []
+        self.event_dispatcher = Dispatcher(events)
+        self.task_buckets = {T.name: None}
+        self.timer = self
+        self.qos = self
+        self.on_task = self.reserved.append
+        self.apply_eta_task = self._limit_task = noop
+        self.on_invalid_task = noop
+
+    def apply_at(self, eta, fun, args, priority=0):
+        self.reserved.append(args[0])
+
+    def increment_eventually(self, n=1):
+        pass
+
+
+def body(i, now=datetime.utcnow()):
+    # every third task has an ETA and every other task expires.
+    body = {'task': T.name, 'id': uuid(), 'args': (i, i), 'kwargs': {},
+            'utc': True}
+    if not i % 3:
+        body['eta'] = (now + timedelta(seconds=i)).isoformat()
+    if not i % 2:
+        body['expires'] = (now + timedelta(days=1)).isoformat()
+    return body
+
+
+def rss():
+    p = ps()
+    return p.get_memory_info().rss if p is not None else 0
+
+
+def bench(Req, n, events=False):
+    consumer = Consumer(events=events)
+    prev, strategy.Request = strategy.Request, Req
+    try:
+        handle = T.start_strategy(app, consumer)
+    finally:
+        strategy.Request = prev
+    messages = [Message(body(i)) for i in range(n)]
+    gc.collect()
+    mem_before = rss()
+    time_start = time()
+    for message in messages:
+        handle(message, message.body, noop)
+    time_spent = time() - time_start
+    gc.collect()
+    mem_used = rss() - mem_before
+    print('{0} (events={1}): {2} messages in {3:.4f}s ({4:.2f}us/msg), '
+          'memory: {5} ({6}/req)'.format(
+              Req.__name__, events, n, time_spent,
+              time_spent / n * 1e6, humanbytes(mem_used),
+              humanbytes(mem_used / n) if mem_used else 'N/A'))
+    return consumer.reserved
+
+
+def main(argv=sys.argv):
+    n = int(argv[1]) if len(argv) > 1 else DEFAULT_ITS
+    if ps() is None:
+        print('psutil not installed: memory usage not available')
+    for events in (False, True):
+        bench(EagerRequest, n, events)
+        bench(Request, n, events)
+
+
+if __name__ == '__main__':
+    main()